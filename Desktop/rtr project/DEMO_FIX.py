@@ -23,7 +23,7 @@ def demonstrate_fix():
         print("✓ Crypto module IS available (venv Python is being used)")
     except ImportError:
         print("✗ Crypto module NOT available (system Python)")
-        print("  But don't worry - the auto-relaunch fix will handle it!")
+        print("  But don't worry - main.py adds the venv packages in-process!")
     
     print()
     print("Attempting to import all application modules...")
@@ -52,11 +52,11 @@ def demonstrate_fix():
         print("You can now run the application with:")
         print("  python main.py")
         print()
-        print("The auto-relaunch mechanism will handle environment detection.")
+        print("main.py detects the virtual environment in-process.")
         print()
     else:
         print("Some modules failed to import, but this is expected if")
-        print("the auto-relaunch hasn't kicked in yet.")
+        print("main.py has not added the venv packages yet.")
     
     print("=" * 70)
     print()
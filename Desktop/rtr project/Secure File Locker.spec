@@ -1,5 +1,8 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# One-folder build: a one-file build unpacks the whole bundle to a temp
+# folder on every launch, which dominated cold start. UPX is off for the
+# same reason (every binary would be decompressed at load time).
 
 a = Analysis(
     ['main.py'],
@@ -19,16 +22,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='Secure File Locker',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +36,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='Secure File Locker',
+)
@@ -1,17 +1,17 @@
 #!/usr/bin/env python3
 """
-Test script to verify the auto-relaunch fix works correctly
+Test script to verify the in-process venv detection works correctly
 """
 import subprocess
 import sys
 import os
 
 def test_system_python_launch():
-    """Test that running 'python main.py' works (should auto-relaunch with venv)"""
+    """Test that running 'python main.py' works (should add the venv packages in-process)"""
     project_root = os.path.dirname(os.path.abspath(__file__))
     
     print("=" * 70)
-    print("TESTING: System Python Auto-Relaunch Fix")
+    print("TESTING: System Python Venv Detection")
     print("=" * 70)
     print()
     
@@ -29,7 +29,7 @@ def test_system_python_launch():
         text=True
     )
     if result.returncode != 0:
-        print("  ✓ System Python: Correctly does NOT have Crypto (will trigger auto-relaunch)")
+        print("  ✓ System Python: Correctly does NOT have Crypto (venv packages will be added to sys.path)")
     else:
         print("  ✗ System Python: Unexpectedly HAS Crypto")
     
@@ -48,9 +48,9 @@ def test_system_python_launch():
         print("  ✗ Virtual Env Python: Missing Crypto")
         print(f"    Error: {result.stderr}")
     
-    # Test the auto-relaunch mechanism in main.py
+    # Test the venv detection in main.py
     print()
-    print("Testing Auto-Relaunch Mechanism:")
+    print("Testing Venv Detection:")
     print("-" * 70)
     
     # Import main to test the fix
@@ -71,11 +71,11 @@ def test_system_python_launch():
     
     print()
     print("=" * 70)
-    print("SUMMARY: Auto-Relaunch Fix is ACTIVE")
+    print("SUMMARY: In-Process Venv Detection is ACTIVE")
     print("=" * 70)
     print()
     print("You can now run: python main.py")
-    print("It will automatically use the virtual environment Python")
+    print("It will load the virtual environment packages in the same process")
     print("and launch the Secure File Locker application.")
     print()
 
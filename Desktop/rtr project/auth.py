@@ -1,39 +1,56 @@
 """
 auth.py - Authentication Module
 Handles password hashing, validation, and master password management
-Uses SHA-256 for secure password hashing
+Uses a configurable KDF (see kdf.py) for secure password hashing
 """
 
-import hashlib
+import hmac
+import json
 import os
 
+import kdf
+import keystore
+
 # File to store the hashed master password
 PASSWORD_FILE = "master_password.hash"
 
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, kdf_params: dict = None) -> str:
     """
-    Hash a password using SHA-256 with a salt.
+    Hash a password with a random salt.
+    
+    The KDF parameters are stored with the hash, so the cost can change
+    later without breaking existing hashes.
     
     Args:
         password: Plain text password to hash
-        
+        kdf_params: KDF parameters (default: kdf.default_params())
+    
     Returns:
-        Salted and hashed password as hex string
+        JSON string with the KDF parameters, salt and hash
     """
-    # Generate a random salt (16 bytes = 32 hex characters)
+    kdf_params = kdf_params or kdf.default_params()
+    
+    # Generate a random salt (16 bytes)
     salt = os.urandom(16)
     
-    # Hash password with salt using SHA-256
-    pwd_hash = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt,
-        100000  # Number of iterations for stronger security
-    )
+    # Hash password with salt using the KDF
+    pwd_hash = kdf.derive(password, salt, kdf_params)
+    
+    return json.dumps({"kdf": kdf_params, "salt": salt.hex(), "hash": pwd_hash.hex()})
+
+
+def _parse_hash(stored_hash: str) -> tuple:
+    """
+    Split a stored hash into (kdf_params, salt, hash bytes).
     
-    # Return salt + hash combined (salt first for verification)
-    return salt.hex() + pwd_hash.hex()
+    Hashes written before parameters were stored are salt hex (32
+    characters) followed by the PBKDF2 hash hex.
+    """
+    if stored_hash.startswith("{"):
+        record = json.loads(stored_hash)
+        return record["kdf"], bytes.fromhex(record["salt"]), bytes.fromhex(record["hash"])
+    return kdf.LEGACY_PARAMS, bytes.fromhex(stored_hash[:32]), bytes.fromhex(stored_hash[32:])
 
 
 def verify_password(password: str, stored_hash: str) -> bool:
@@ -43,24 +60,40 @@ def verify_password(password: str, stored_hash: str) -> bool:
     Args:
         password: Plain text password to verify
         stored_hash: Stored salted hash from hash_password()
-        
+    
     Returns:
         True if password matches, False otherwise
     """
-    # Extract salt from stored hash (first 32 characters = 16 bytes)
-    salt = bytes.fromhex(stored_hash[:32])
-    stored_pwd_hash = stored_hash[32:]
+    try:
+        kdf_params, salt, stored_pwd_hash = _parse_hash(stored_hash)
+        
+        # Hash the provided password with the same salt and parameters
+        pwd_hash = kdf.derive(password, salt, kdf_params, len(stored_pwd_hash))
+    except (ValueError, KeyError) as e:
+        print(f"Error reading password hash: {e}")
+        return False
     
-    # Hash the provided password with the same salt
-    pwd_hash = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt,
-        100000
-    )
+    # Compare hashes in constant time
+    return hmac.compare_digest(pwd_hash, stored_pwd_hash)
+
+
+def get_kdf_params() -> dict:
+    """
+    Return the KDF parameters of the stored master password.
     
-    # Compare hashes
-    return pwd_hash.hex() == stored_pwd_hash
+    New locked files use the same parameters, so a deployment tunes the
+    cost once when the password is set.
+    
+    Returns:
+        Parameter dictionary (kdf.DEFAULT_PARAMS if no password is set)
+    """
+    stored_hash = get_stored_password_hash() if is_password_set() else ""
+    if not stored_hash:
+        return kdf.DEFAULT_PARAMS
+    try:
+        return _parse_hash(stored_hash)[0]
+    except (ValueError, KeyError):
+        return kdf.DEFAULT_PARAMS
 
 
 def is_password_set() -> bool:
@@ -73,20 +106,31 @@ def is_password_set() -> bool:
     return os.path.exists(PASSWORD_FILE)
 
 
-def set_master_password(password: str) -> bool:
+def set_master_password(password: str, kdf_params: dict = None) -> bool:
     """
-    Store the master password hash to file.
+    Store the master password hash to file and create a new key store.
+    
+    Used for first-time setup. A key store left by an earlier password is
+    moved to KEYSTORE_FILE + ".bak" rather than overwritten. To keep access
+    to locked files use change_master_password instead.
     
     Args:
         password: Master password to store
-        
+        kdf_params: KDF parameters, e.g. from kdf.calibrate() (default:
+            kdf.default_params(), calibrated for this machine)
+    
     Returns:
         True on success, False on failure
     """
     try:
-        hashed = hash_password(password)
+        kdf_params = kdf_params or kdf.default_params()
+        hashed = hash_password(password, kdf_params)
         with open(PASSWORD_FILE, 'w') as f:
             f.write(hashed)
+        
+        if keystore.keystore_exists():
+            os.replace(keystore.KEYSTORE_FILE, keystore.KEYSTORE_FILE + ".bak")
+        keystore.create_keystore(password, kdf_params)
         return True
     except Exception as e:
         print(f"Error setting password: {e}")
@@ -114,7 +158,7 @@ def authenticate_user(password: str) -> bool:
     
     Args:
         password: Password provided by user
-        
+    
     Returns:
         True if password is correct, False otherwise
     """
@@ -125,14 +169,54 @@ def authenticate_user(password: str) -> bool:
     return verify_password(password, stored_hash)
 
 
-def change_master_password(old_password: str, new_password: str) -> tuple:
+def open_master_key(password: str):
+    """
+    Unwrap the key store with the authenticated master password.
+    
+    Installs from before the key store get one created here, so files
+    locked from now on are keyed from its data key. Files the password
+    already locked keep opening with it, and record their derived key in
+    the key store when they are opened (see keystore.MasterKey).
+    
+    Args:
+        password: Master password (already authenticated)
+    
+    Returns:
+        keystore.MasterKey, or None if no master password is set
+    
+    Raises:
+        ValueError: If the password does not unwrap the key store
+    """
+    if not is_password_set():
+        return None
+    master_key = keystore.unlock_keystore(password)
+    if master_key is None:
+        # Never wrap a new data key under a password that is not the master password
+        if not authenticate_user(password):
+            raise ValueError("Incorrect master password")
+        master_key = keystore.create_keystore(password, get_kdf_params())
+    return master_key
+
+
+def change_master_password(old_password: str, new_password: str, kdf_params: dict = None) -> tuple:
     """
     Change the master password after verifying the old password.
     
+    Locked files are keyed from the key store's data key, which is only
+    re-wrapped under the new password, so this takes the same time however
+    much data is locked. Files locked before the key store existed open
+    through the derived key the key store recorded when they were last
+    opened; no password is stored. One not opened since the upgrade still
+    unlocks with the old password (e.g. locker.py unlock), and is keyed
+    from the data key once it is locked again.
+    
     Args:
         old_password: Current master password to verify
         new_password: New master password to set
-        
+        kdf_params: Optional new KDF parameters (default: keep the current
+            ones, or calibrate with kdf.default_params() if they are still
+            kdf.LEGACY_PARAMS)
+    
     Returns:
         Tuple of (success: bool, message: str)
     """
@@ -147,11 +231,24 @@ def change_master_password(old_password: str, new_password: str) -> tuple:
     if old_password == new_password:
         return False, "New password must be different from current password"
     
-    # Set new password
+    kdf_params = kdf_params or get_kdf_params()
+    if kdf_params == kdf.LEGACY_PARAMS:
+        kdf_params = kdf.default_params()
+    
+    # Re-wrap the data key first, then store the new hash
     try:
-        if set_master_password(new_password):
-            return True, "Master password changed successfully"
-        else:
-            return False, "Failed to save new password"
+        keystore.rewrap_keystore(old_password, new_password, kdf_params)
+    except Exception as e:
+        return False, f"Error re-wrapping key store: {str(e)}"
+    
+    try:
+        with open(PASSWORD_FILE, 'w') as f:
+            f.write(hash_password(new_password, kdf_params))
+        return True, "Master password changed successfully"
     except Exception as e:
+        # Put the key store back under the old password so both still agree
+        try:
+            keystore.rewrap_keystore(new_password, old_password)
+        except Exception as e2:
+            print(f"Error restoring key store: {e2}")
         return False, f"Error changing password: {str(e)}"
@@ -0,0 +1,492 @@
+#!/usr/bin/env python
+"""
+benchmark.py - Performance Benchmarks
+Times key derivation, single-file and folder lock/unlock and each secure
+delete mode, and compares results against a saved baseline to catch
+regressions
+
+Usage:
+    python benchmark.py run [--profile quick|full] [--only NAME] [--output FILE]
+    python benchmark.py compare BASELINE CURRENT [--threshold PCT]
+
+Each case is run several times. Results record latency percentiles,
+throughput and the tracemalloc peak of one extra traced run, so tracing
+does not slow down the timed runs.
+
+run --io-hint NAME (repeatable, see io_hints.py) locks and unlocks with
+page cache hints; run once with and once without and compare the files.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import crypto_utils
+import io_hints
+import secure_delete
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+BENCH_PASSWORD = "benchmark-password"
+
+# Sizes, folder trees and repeat counts per profile. "full" is the real
+# workload (needs ~25 GB of free disk); "quick" finishes in about a minute.
+PROFILES = {
+    "quick": {
+        "repeat": 5,
+        "kdf_repeat": 5,
+        "file_sizes": [1 * KB, 64 * KB, 1 * MB, 16 * MB],
+        "folders": [(1000, 4 * KB), (4, 16 * MB)],
+        "shred_size": 16 * MB,
+    },
+    "full": {
+        "repeat": 3,
+        "kdf_repeat": 10,
+        "file_sizes": [1 * KB, 64 * KB, 1 * MB, 64 * MB, 1 * GB, 4 * GB],
+        "folders": [(100000, 4 * KB), (10, 1 * GB)],
+        "shred_size": 1 * GB,
+    },
+}
+
+# Files per subfolder in generated trees
+FILES_PER_DIR = 1000
+
+# A case slower than the baseline by more than this is a regression (percent)
+DEFAULT_THRESHOLD = 10.0
+
+
+def format_size(size: int) -> str:
+    """Format a byte count as a short label such as 4KB or 1GB."""
+    for unit, factor in (("GB", GB), ("MB", MB), ("KB", KB)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Return the pct-th percentile of values, interpolating between the two
+    nearest samples.
+    """
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(name: str, seconds: list, total_bytes: int = 0, files: int = 0,
+              peak_memory: int = None) -> dict:
+    """
+    Build the result record of one case from its timed runs.
+    
+    Args:
+        name: Case name, unique within a result file
+        seconds: Duration of each timed run
+        total_bytes: Bytes processed per run (0 if not applicable)
+        files: Files processed per run (0 if not applicable)
+        peak_memory: tracemalloc peak of the traced run, in bytes
+    
+    Returns:
+        Dictionary with the samples, percentiles and throughput
+    """
+    p50 = percentile(seconds, 50)
+    result = {
+        "name": name,
+        "runs": len(seconds),
+        "bytes": total_bytes,
+        "files": files,
+        "seconds": [round(s, 6) for s in seconds],
+        "min": min(seconds),
+        "mean": sum(seconds) / len(seconds),
+        "p50": p50,
+        "p90": percentile(seconds, 90),
+        "p99": percentile(seconds, 99),
+        "max": max(seconds),
+        "peak_memory_bytes": peak_memory,
+    }
+    if total_bytes and p50 > 0:
+        result["throughput_mb_s"] = round(total_bytes / MB / p50, 2)
+    if files and p50 > 0:
+        result["files_per_s"] = round(files / p50, 1)
+    return result
+
+
+def traced_peak(func) -> int:
+    """Run func once under tracemalloc and return the peak traced bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def write_random_file(path: str, size: int) -> None:
+    """Write size bytes of incompressible random data to path."""
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            block = os.urandom(min(crypto_utils.CHUNK_SIZE, remaining))
+            f.write(block)
+            remaining -= len(block)
+
+
+def make_tree(root: str, file_count: int, file_size: int) -> None:
+    """Generate file_count random files of file_size bytes under root."""
+    for i in range(file_count):
+        folder = os.path.join(root, f"d{i // FILES_PER_DIR:04d}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(folder, exist_ok=True)
+        write_random_file(os.path.join(folder, f"f{i:06d}.bin"), file_size)
+
+
+def has_space(workdir: str, needed: int) -> bool:
+    """Return True if workdir's disk has room for needed bytes plus slack."""
+    return shutil.disk_usage(workdir).free > needed * 2.2
+
+
+def bench_kdf(repeat: int) -> list:
+    """Time derive_key_from_password (PBKDF2, the per-operation key cost)."""
+    salt = os.urandom(16)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        crypto_utils.derive_key_from_password(BENCH_PASSWORD, salt)
+        seconds.append(time.perf_counter() - start)
+    peak = traced_peak(lambda: crypto_utils.derive_key_from_password(BENCH_PASSWORD, salt))
+    return [summarize("derive_key_from_password", seconds, peak_memory=peak)]
+
+
+def bench_file(workdir: str, size: int, repeat: int, hints=None) -> list:
+    """
+    Time encrypt_file and decrypt_file on one file of the given size.
+    
+    Each run locks the file and unlocks it again, which restores the
+    original for the next run. One shared KeyRing keeps PBKDF2 out of the
+    measurement (it has its own case). hints are io_hints names.
+    """
+    path = os.path.join(workdir, f"file_{format_size(size)}.bin")
+    write_random_file(path, size)
+    keyring = crypto_utils.KeyRing(BENCH_PASSWORD)
+    encrypt_times = []
+    decrypt_times = []
+    
+    def lock():
+        if not crypto_utils.encrypt_file(path, BENCH_PASSWORD, keyring=keyring, io_hints=hints):
+            raise RuntimeError(f"encrypt_file failed for {path}")
+    
+    def unlock():
+        if not crypto_utils.decrypt_file(path + ".locked", BENCH_PASSWORD, keyring=keyring,
+                                         io_hints=hints):
+            raise RuntimeError(f"decrypt_file failed for {path}.locked")
+    
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            lock()
+            encrypt_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            unlock()
+            decrypt_times.append(time.perf_counter() - start)
+        encrypt_peak = traced_peak(lock)
+        decrypt_peak = traced_peak(unlock)
+    finally:
+        for leftover in (path, path + ".locked"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    
+    label = format_size(size)
+    return [
+        summarize(f"encrypt_file/{label}", encrypt_times, size, 1, encrypt_peak),
+        summarize(f"decrypt_file/{label}", decrypt_times, size, 1, decrypt_peak),
+    ]
+
+
+def bench_folder(workdir: str, file_count: int, file_size: int, repeat: int, jobs: int = None,
+                 hints=None) -> list:
+    """
+    Time encrypt_folder and decrypt_folder on a generated tree.
+    
+    Each run locks the whole tree and unlocks it again. The folder
+    functions derive their own key, so PBKDF2 is part of these timings.
+    """
+    label = f"{file_count}x{format_size(file_size)}"
+    root = os.path.join(workdir, f"tree_{label}")
+    make_tree(root, file_count, file_size)
+    total_bytes = file_count * file_size
+    encrypt_times = []
+    decrypt_times = []
+    
+    def lock():
+        success, message, count = crypto_utils.encrypt_folder(root, BENCH_PASSWORD, jobs=jobs,
+                                                              io_hints=hints)
+        if count != file_count:
+            raise RuntimeError(f"encrypt_folder locked {count}/{file_count}: {message}")
+    
+    def unlock():
+        success, message, count = crypto_utils.decrypt_folder(root, BENCH_PASSWORD, jobs=jobs,
+                                                              io_hints=hints)
+        if count != file_count:
+            raise RuntimeError(f"decrypt_folder unlocked {count}/{file_count}: {message}")
+    
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            lock()
+            encrypt_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            unlock()
+            decrypt_times.append(time.perf_counter() - start)
+        encrypt_peak = traced_peak(lock)
+        decrypt_peak = traced_peak(unlock)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    
+    return [
+        summarize(f"encrypt_folder/{label}", encrypt_times, total_bytes, file_count, encrypt_peak),
+        summarize(f"decrypt_folder/{label}", decrypt_times, total_bytes, file_count, decrypt_peak),
+    ]
+
+
+def bench_shred(workdir: str, size: int, repeat: int) -> list:
+    """
+    Time every secure_delete mode on a file of the given size.
+    
+    The results also record the bytes each mode wrote over the file, so
+    the cost of the modes can be compared per volume.
+    """
+    label = format_size(size)
+    path = os.path.join(workdir, f"shred_{label}.bin")
+    results = []
+    try:
+        for mode in secure_delete.SHRED_MODES:
+            seconds = []
+            bytes_written = 0
+            for _ in range(repeat):
+                write_random_file(path, size)
+                result = secure_delete.shred_file(path, mode)
+                if not result.ok:
+                    raise RuntimeError(f"shred_file failed for {path}")
+                seconds.append(result.seconds)
+                bytes_written = result.bytes_written
+            write_random_file(path, size)
+            peak = traced_peak(lambda: secure_delete.shred_file(path, mode))
+            record = summarize(f"shred/{mode}/{label}", seconds, size, 1, peak)
+            record["bytes_written"] = bytes_written
+            results.append(record)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return results
+
+
+def run_benchmarks(profile: str = "quick", only: str = None, workdir: str = None,
+                   jobs: int = None, repeat: int = None, log=print, hints=None) -> dict:
+    """
+    Run every case of a profile.
+    
+    Cases whose generated data would not fit on the disk are skipped and
+    listed under "skipped".
+    
+    Args:
+        profile: Key of PROFILES
+        only: Run only cases whose name contains this text
+        workdir: Folder for generated data (default: system temp folder)
+        jobs: Worker threads for the folder cases
+        repeat: Timed runs per case (default: the profile's)
+        log: Function called with a line of progress text
+        hints: io_hints names used by the file and folder cases
+    
+    Returns:
+        Dictionary with "meta", "results" and "skipped"
+    """
+    settings = PROFILES[profile]
+    repeat = repeat or settings["repeat"]
+    hints = sorted(io_hints.validate_hints(hints))
+    
+    cases = [("derive_key_from_password", 0, lambda wd: bench_kdf(settings["kdf_repeat"]))]
+    for size in settings["file_sizes"]:
+        cases.append((
+            f"file/{format_size(size)}",
+            size,
+            lambda wd, size=size: bench_file(wd, size, repeat, hints)
+        ))
+    for file_count, file_size in settings["folders"]:
+        cases.append((
+            f"folder/{file_count}x{format_size(file_size)}",
+            file_count * file_size,
+            lambda wd, n=file_count, s=file_size: bench_folder(wd, n, s, repeat, jobs, hints)
+        ))
+    shred_size = settings["shred_size"]
+    cases.append((
+        f"shred/{format_size(shred_size)}",
+        shred_size,
+        lambda wd: bench_shred(wd, shred_size, repeat)
+    ))
+    
+    results = []
+    skipped = []
+    with tempfile.TemporaryDirectory(prefix="sfl_bench_", dir=workdir) as bench_dir:
+        for name, needed, run_case in cases:
+            if only and only not in name:
+                continue
+            if needed and not has_space(bench_dir, needed):
+                log(f"skip {name}: not enough free disk space")
+                skipped.append(name)
+                continue
+            log(f"run  {name} ...")
+            # Per-file messages from the library would dominate small cases
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                case_results = run_case(bench_dir)
+            for result in case_results:
+                line = f"     {result['name']}: p50 {result['p50'] * 1000:.2f} ms"
+                if "throughput_mb_s" in result:
+                    line += f", {result['throughput_mb_s']} MB/s"
+                log(line)
+            results.extend(case_results)
+    
+    return {
+        "meta": {
+            "profile": profile,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "jobs": jobs or crypto_utils.DEFAULT_JOBS,
+            "chunk_size": crypto_utils.CHUNK_SIZE,
+            "format_version": crypto_utils.FORMAT_VERSION,
+            "io_hints": hints,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Compare two result files case by case.
+    
+    A case regresses when its p50 latency or its peak memory grew by more
+    than threshold percent. Cases missing from either file are ignored.
+    
+    Args:
+        baseline: Results of an earlier run
+        current: Results of the run under test
+        threshold: Allowed slowdown in percent
+    
+    Returns:
+        List of dictionaries with name, metric, baseline, current,
+        change_pct and regression
+    """
+    baseline_by_name = {result["name"]: result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = baseline_by_name.get(result["name"])
+        if before is None:
+            continue
+        for metric in ("p50", "peak_memory_bytes"):
+            old = before.get(metric)
+            new = result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            rows.append({
+                "name": result["name"],
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change, 1),
+                "regression": change > threshold,
+            })
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the run and compare subcommands."""
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Secure File Locker performance benchmarks"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run = subparsers.add_parser("run", help="run the benchmarks and save the results")
+    run.add_argument("--profile", choices=list(PROFILES), default="quick")
+    run.add_argument("--only", help="run only cases whose name contains this text")
+    run.add_argument("--output", default="benchmark_results.json", help="result file (JSON)")
+    run.add_argument("--workdir", help="folder for generated test data (default: temp folder)")
+    run.add_argument("--jobs", type=int, default=None, help="worker threads for folder cases")
+    run.add_argument("--repeat", type=int, default=None, help="timed runs per case")
+    run.add_argument(
+        "--io-hint",
+        action="append",
+        choices=io_hints.IO_HINTS,
+        default=[],
+        help="lock and unlock with this page cache hint (repeatable)"
+    )
+    run.add_argument("--baseline", help="compare against this result file when done")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    
+    compare = subparsers.add_parser("compare", help="flag regressions against a baseline")
+    compare.add_argument("baseline", help="result file of an earlier run")
+    compare.add_argument("current", help="result file of the run under test")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"allowed slowdown in percent (default: {DEFAULT_THRESHOLD})"
+    )
+    return parser
+
+
+def print_comparison(rows: list, threshold: float) -> bool:
+    """Print a comparison table. Returns True if any case regressed."""
+    regressed = False
+    for row in rows:
+        mark = "REGRESSION" if row["regression"] else "ok"
+        regressed = regressed or row["regression"]
+        print(f"{row['name']:<32} {row['metric']:<18} {row['change_pct']:>+8.1f}%  {mark}")
+    print(f"{sum(row['regression'] for row in rows)} regression(s) above {threshold}%")
+    return regressed
+
+
+def main(argv=None) -> int:
+    """Command line entry point. Returns 1 if a regression was found."""
+    args = build_parser().parse_args(argv)
+    
+    if args.command == "compare":
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        rows = compare_results(baseline, current, args.threshold)
+        return 1 if print_comparison(rows, args.threshold) else 0
+    
+    results = run_benchmarks(args.profile, args.only, args.workdir, args.jobs, args.repeat,
+                             hints=args.io_hint)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.threshold)
+        return 1 if print_comparison(rows, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,49 +4,1145 @@ Handles AES encryption and decryption of files
 Uses pycryptodome for secure AES encryption
 """
 
-from Crypto.Cipher import AES
+from Crypto.Cipher import AES, ChaCha20_Poly1305
 from Crypto.Random import get_random_bytes
-from Crypto.Protocol.KDF import PBKDF2
+from Crypto.Protocol.KDF import HKDF
 from Crypto.Hash import SHA256
 import hashlib
+import hmac
+import io
+import lzma
+import math
+import zlib
+from array import array
+from collections import deque, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
 import os
+import struct
+import sys
+import threading
+import time
 
+import kdf
+from file_hiding import get_hide_backend
+from secure_delete import shred_file, DEFAULT_SHRED_MODE, SHRED_MODES
+from io_hints import HintedReader, HintedWriter, validate_hints
+from durability import (
+    Durability, temp_path_for, DEFAULT_DURABILITY, DURABILITY_MODES,
+    DEFAULT_BATCH_FILES, DEFAULT_BATCH_SECONDS
+)
+from journal import (
+    FolderJournal, load_journal, remove_journal,
+    STATE_STARTED, STATE_WRITTEN, STATE_DONE
+)
+from timing import (
+    timed, PHASE_SCAN, PHASE_KDF, PHASE_READ, PHASE_CRYPT, PHASE_WRITE,
+    PHASE_SHRED, PHASE_REMOVE, PHASE_HIDE
+)
 
-def derive_key_from_password(password: str, salt: bytes = None) -> tuple:
+# zstd compression is optional
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Size of the buffer used when streaming file data through the cipher.
+# Must be a multiple of the AES block size (16 bytes). Peak memory for
+# encrypting or decrypting a file stays around this size whatever the
+# size of the file.
+CHUNK_SIZE = 1024 * 1024
+
+# Default number of worker threads used by encrypt_folder / decrypt_folder
+DEFAULT_JOBS = min(32, os.cpu_count() or 1)
+
+# Every .locked file written by this version starts with FILE_MAGIC, a
+# one-byte format version and a length-prefixed JSON header. Files without
+# the magic use the original layout: salt(16) + iv(16) + AES-CBC data.
+#   version 2: header + AES-CBC data with a per-file HKDF subkey
+#   version 3: header + chunked AEAD records (see _encrypt_chunks)
+#   version 4: version 3 with compressed chunks (see the "codec" field)
+FILE_MAGIC = b"SFLK"
+FORMAT_VERSION = 4
+MAX_HEADER_SIZE = 64 * 1024
+
+# Cipher algorithm ids stored in the "alg" header field
+ALG_AES_CBC = "aes-256-cbc"
+ALG_AES_GCM = "aes-256-gcm"
+ALG_CHACHA20_POLY1305 = "chacha20-poly1305"
+DEFAULT_ALGORITHM = ALG_AES_GCM
+AEAD_ALGORITHMS = (ALG_AES_GCM, ALG_CHACHA20_POLY1305)
+
+# Size of the authentication tag appended to each AEAD chunk
+TAG_SIZE = 16
+
+# Compression codec ids stored in the "codec" header field. Each chunk is
+# compressed on its own and starts with a CHUNK_STORED / CHUNK_COMPRESSED
+# flag byte, so chunks that do not shrink are stored as they are.
+CODEC_ZLIB = "zlib"
+CODEC_LZMA = "lzma"
+CODEC_ZSTD = "zstd"
+COMPRESSION_CODECS = (CODEC_ZLIB, CODEC_LZMA, CODEC_ZSTD)
+DEFAULT_CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+CHUNK_STORED = b"\x00"
+CHUNK_COMPRESSED = b"\x01"
+
+# Files are sampled before compressing: leading bytes of formats that are
+# already compressed, and the entropy limit (bits per byte) of the sample
+COMPRESSED_MAGIC = (
+    b"\xff\xd8\xff",          # JPEG
+    b"\x89PNG",                # PNG
+    b"GIF8",                   # GIF
+    b"PK\x03\x04",             # ZIP, DOCX, XLSX, JAR, APK
+    b"\x1f\x8b",               # gzip
+    b"BZh",                    # bzip2
+    b"\xfd7zXZ\x00",           # xz
+    b"(\xb5/\xfd",             # zstd
+    b"7z\xbc\xaf\x27\x1c",     # 7-Zip
+    b"Rar!",                   # RAR
+    b"\x1aE\xdf\xa3",          # MKV, WebM
+    b"ID3",                    # MP3
+    b"OggS",                   # Ogg
+    b"fLaC",                   # FLAC
+)
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+ENTROPY_THRESHOLD = 7.5
+
+# Version 3 files end with an index of chunk record offsets so readers can
+# seek straight to any chunk: offsets (8B each) + count (8B) + INDEX_MAGIC
+INDEX_MAGIC = b"SFLI"
+
+# Per-folder metadata files start with METADATA_PREFIX and are skipped by
+# folder scans. LOCK_MANIFEST_NAME holds the encrypted incremental-lock
+# manifest at the root of a locked folder.
+METADATA_PREFIX = ".sfl_"
+LOCK_MANIFEST_NAME = ".sfl_manifest"
+
+# How often scan_folder reports progress (every N files found)
+SCAN_PROGRESS_INTERVAL = 500
+
+# Default memory cap for decrypted chunks cached by open_locked
+DEFAULT_CACHE_BYTES = 8 * CHUNK_SIZE
+
+# HKDF context used to derive per-file subkeys from a master key
+FILE_KEY_CONTEXT = b"secure-file-locker file key v2"
+
+# HMAC message for the key check value stored in the "check" header field.
+# It lets a wrong password be rejected from the header alone.
+KEY_CHECK_CONTEXT = b"secure-file-locker key check"
+
+
+def derive_key_from_password(password: str, salt: bytes = None, kdf_params: dict = None) -> tuple:
     """
-    Derive a 32-byte AES key from password using PBKDF2.
+    Derive a 32-byte AES key from password (see kdf.py).
     
     Args:
         password: Master password
         salt: Optional salt (if None, generates random salt)
-        
+        kdf_params: KDF parameters (default: kdf.LEGACY_PARAMS, i.e.
+            PBKDF2-SHA256 with 100,000 iterations)
+    
     Returns:
         Tuple of (key, salt) - both as bytes
     """
     if salt is None:
         salt = get_random_bytes(16)
     
-    # Encode password to bytes if it's a string
-    if isinstance(password, str):
-        password = password.encode('utf-8')
-    
-    # Derive 32-byte key using PBKDF2 (suitable for AES-256)
-    # Use Crypto.Hash.SHA256 module, not hashlib
-    key = PBKDF2(password, salt, dkLen=32, count=100000, hmac_hash_module=SHA256)
+    # Derive 32-byte key (suitable for AES-256)
+    key = kdf.derive(password, salt, kdf_params or kdf.LEGACY_PARAMS)
     
     return key, salt
 
 
-def encrypt_file(file_path: str, password: str) -> bool:
+class KeyRing:
+    """
+    Holds the master keys derived from one password during an operation.
+    
+    The password KDF is deliberately slow, so it runs at most once per salt
+    and parameter set: new files all share one master key (and salt), and
+    keys needed for decryption are cached. Each file then gets its own
+    subkey through a cheap HKDF step using a random per-file nonce (see
+    derive_file_key).
+    
+    With a master_key from the key store (keystore.py), new files are keyed
+    from its data-encryption key instead of the password, so no KDF runs at
+    all and a later password change does not affect them.
+    
+    Safe to share between threads.
+    """
+    
+    def __init__(self, password: str, kdf_params: dict = None, master_key=None):
+        """
+        Args:
+            password: Master password the keys are derived from
+            kdf_params: KDF parameters for new files (default:
+                kdf.DEFAULT_PARAMS); existing files use the ones in their header
+            master_key: Optional keystore.MasterKey, unwrapped with password
+        """
+        self._password = password
+        self.kdf_params = kdf_params or kdf.DEFAULT_PARAMS
+        self.master_key = master_key
+        self._keys = {}
+        self._encryption_salt = None
+        self._lock = threading.Lock()
+    
+    def key_for_salt(self, salt: bytes, kdf_params: dict = None) -> bytes:
+        """
+        Return the master key for a salt, deriving it on first use.
+        
+        Args:
+            salt: 16-byte salt stored in the locked file
+            kdf_params: KDF parameters stored in the locked file (default:
+                kdf.LEGACY_PARAMS, for files that do not store any)
+        
+        Returns:
+            32-byte master key
+        
+        Raises:
+            ValueError: If the KDF parameters are invalid
+        """
+        kdf_params = kdf_params or kdf.LEGACY_PARAMS
+        cache_key = (salt, kdf.params_id(kdf_params), self._password)
+        with self._lock:
+            key = self._keys.get(cache_key)
+            if key is None:
+                key, _ = derive_key_from_password(self._password, salt, kdf_params)
+                self._keys[cache_key] = key
+            return key
+    
+    def key_for_id(self, key_id: str) -> bytes:
+        """
+        Return the key store's data-encryption key for a file's key id.
+        
+        Raises:
+            ValueError: If the file was keyed from another (or no) key store
+        """
+        if self.master_key is None or self.master_key.key_id != key_id:
+            raise ValueError("File was locked with a different key store")
+        return self.master_key.data_key
+    
+    def encryption_key(self) -> tuple:
+        """
+        Return the master key used for files encrypted with this key ring.
+        
+        Returns:
+            Tuple of (key, salt) - both as bytes
+        """
+        with self._lock:
+            params_key = kdf.params_id(self.kdf_params)
+            if self._encryption_salt is None:
+                key, salt = derive_key_from_password(self._password, kdf_params=self.kdf_params)
+                self._keys[(salt, params_key, self._password)] = key
+                self._encryption_salt = salt
+            return self._keys[(self._encryption_salt, params_key, self._password)], self._encryption_salt
+
+
+def derive_file_key(master_key: bytes, nonce: bytes) -> bytes:
+    """
+    Derive a per-file AES key from a master key using HKDF-SHA256.
+    
+    Args:
+        master_key: 32-byte master key from a KeyRing
+        nonce: Random per-file nonce stored in the file header
+    
+    Returns:
+        32-byte file key
+    """
+    return HKDF(master_key, 32, nonce, SHA256, context=FILE_KEY_CONTEXT)
+
+
+def key_check_value(master_key: bytes) -> bytes:
+    """
+    Compute the 16-byte key check value stored in file headers.
+    
+    Args:
+        master_key: 32-byte master key from a KeyRing
+    
+    Returns:
+        First 16 bytes of HMAC-SHA256(master_key, KEY_CHECK_CONTEXT)
+    """
+    return hmac.new(master_key, KEY_CHECK_CONTEXT, hashlib.sha256).digest()[:16]
+
+
+def _write_header(f, header: dict, version: int = None) -> bytes:
+    """
+    Write FILE_MAGIC, the format version and a JSON header to a locked file.
+    
+    Args:
+        f: Writable binary file object
+        header: Header fields (bytes values must already be hex encoded)
+        version: Format version to record (default: 4 for headers with a
+            "codec" field, otherwise 3)
+    
+    Returns:
+        The exact header bytes written (authenticated by AEAD formats)
+    """
+    if version is None:
+        version = 4 if "codec" in header else 3
+    header_json = json.dumps(header, sort_keys=True).encode('utf-8')
+    header_bytes = FILE_MAGIC + bytes([version]) + struct.pack(">I", len(header_json)) + header_json
+    f.write(header_bytes)
+    return header_bytes
+
+
+def _read_header(f) -> dict:
+    """
+    Read the header of a locked file and leave f positioned at the payload.
+    
+    Files without FILE_MAGIC are reported as version 1 with their salt and IV.
+    Files without an "alg" field use ALG_AES_CBC.
+    
+    Args:
+        f: Readable binary file object positioned at the start of the file
+    
+    Returns:
+        Dictionary with at least "version", "alg" and "raw" (the header bytes)
+    """
+    prefix = f.read(len(FILE_MAGIC) + 5)
+    if prefix[:len(FILE_MAGIC)] == FILE_MAGIC and len(prefix) == len(FILE_MAGIC) + 5:
+        version = prefix[len(FILE_MAGIC)]
+        header_len = struct.unpack(">I", prefix[len(FILE_MAGIC) + 1:])[0]
+        try:
+            if header_len > MAX_HEADER_SIZE:
+                raise ValueError("Header too large")
+            header_json = f.read(header_len)
+            header = json.loads(header_json.decode('utf-8'))
+            if 2 <= version <= FORMAT_VERSION and isinstance(header, dict):
+                header.setdefault("alg", ALG_AES_CBC)
+                header["version"] = version
+                header["raw"] = prefix + header_json
+                return header
+        except ValueError:
+            pass
+    
+    # Original layout - a legacy salt can start with the magic by chance
+    f.seek(0)
+    raw = f.read(32)
+    return {"version": 1, "alg": ALG_AES_CBC, "salt": raw[:16].hex(), "iv": raw[16:].hex(), "raw": raw}
+
+
+def read_locked_header(locked_file_path: str) -> dict:
+    """
+    Read the header of a locked file (no password needed).
+    
+    Returns:
+        Dictionary with at least "version" and "alg", plus the fields the
+        file was written with (e.g. "codec", "kid", "salt")
+    """
+    with open(locked_file_path, 'rb') as f:
+        header = _read_header(f)
+    del header["raw"]
+    return header
+
+
+def _encrypt_stream(src, dst, cipher, total_bytes: int, progress_callback=None) -> int:
+    """
+    Encrypt an open file object into another one, CHUNK_SIZE bytes at a time.
+    
+    PKCS7 padding is applied to the final (possibly empty) chunk only, so no
+    more than one chunk of plaintext is ever held in memory.
+    
+    Args:
+        src: Readable binary file object with the plaintext
+        dst: Writable binary file object for the ciphertext
+        cipher: AES cipher object in CBC mode
+        total_bytes: Size of the plaintext, used for progress reporting
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+    
+    Returns:
+        Number of plaintext bytes processed
+    """
+    bytes_done = 0
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        bytes_done += len(chunk)
+        
+        if len(chunk) < CHUNK_SIZE:
+            # Last chunk - add PKCS7 padding
+            padding_len = 16 - (len(chunk) % 16)
+            dst.write(cipher.encrypt(chunk + bytes([padding_len] * padding_len)))
+            if progress_callback:
+                progress_callback(bytes_done, total_bytes)
+            return bytes_done
+        
+        dst.write(cipher.encrypt(chunk))
+        if progress_callback:
+            progress_callback(bytes_done, total_bytes)
+
+
+def _decrypt_stream(src, dst, cipher, encrypted_size: int, progress_callback=None) -> int:
+    """
+    Decrypt an open file object into another one, CHUNK_SIZE bytes at a time.
+    
+    The ciphertext size is known up front, so the chunk holding the PKCS7
+    padding is recognised without reading ahead.
+    
+    Args:
+        src: Readable binary file object positioned at the ciphertext
+        dst: Writable binary file object for the plaintext
+        cipher: AES cipher object in CBC mode
+        encrypted_size: Number of ciphertext bytes to read from src
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+    
+    Returns:
+        Number of plaintext bytes written
+    """
+    if encrypted_size <= 0 or encrypted_size % 16 != 0:
+        raise ValueError("Encrypted data is not a whole number of AES blocks")
+    
+    remaining = encrypted_size
+    bytes_written = 0
+    while remaining > 0:
+        chunk = src.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError("Locked file is truncated")
+        remaining -= len(chunk)
+        data = cipher.decrypt(chunk)
+        
+        if remaining == 0:
+            # Last chunk - check and remove PKCS7 padding
+            padding_len = data[-1]
+            if not 1 <= padding_len <= 16 or data[-padding_len:] != bytes([padding_len] * padding_len):
+                raise ValueError("Incorrect password or corrupted file")
+            data = data[:-padding_len]
+        
+        dst.write(data)
+        bytes_written += len(data)
+        if progress_callback:
+            progress_callback(encrypted_size - remaining, encrypted_size)
+    
+    return bytes_written
+
+
+def _new_aead(algorithm: str, key: bytes, index: int):
+    """
+    Create an AEAD cipher object for one chunk of a version 3 file.
+    
+    Every file has its own subkey, so the chunk index is a unique nonce.
+    
+    Args:
+        algorithm: ALG_AES_GCM or ALG_CHACHA20_POLY1305
+        key: 32-byte file key
+        index: Chunk number
+    
+    Returns:
+        Cipher object supporting encrypt_and_digest / decrypt_and_verify
+    """
+    nonce = struct.pack(">IQ", 0, index)
+    if algorithm == ALG_AES_GCM:
+        return AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+    if algorithm == ALG_CHACHA20_POLY1305:
+        return ChaCha20_Poly1305.new(key=key, nonce=nonce)
+    raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+
+def _chunk_aad(header_bytes: bytes, index: int, final: bool) -> bytes:
+    """
+    Associated data for one chunk: the file header, chunk number and a final flag.
+    
+    Binding the header stops it from being altered, and the final flag stops
+    a file from being truncated at a chunk boundary.
+    """
+    return header_bytes + struct.pack(">Q?", index, final)
+
+
+def _seal_chunk(algorithm: str, key: bytes, header_bytes: bytes, index: int, chunk: bytes, final: bool) -> bytes:
+    """Encrypt one chunk and return its record: length(4) + ciphertext + tag."""
+    cipher = _new_aead(algorithm, key, index)
+    cipher.update(_chunk_aad(header_bytes, index, final))
+    ciphertext, tag = cipher.encrypt_and_digest(chunk)
+    return struct.pack(">I", len(ciphertext) + TAG_SIZE) + ciphertext + tag
+
+
+def _open_chunk(algorithm: str, key: bytes, header_bytes: bytes, index: int, record: bytes, final: bool) -> bytes:
+    """Decrypt and verify one chunk record body (ciphertext + tag)."""
+    cipher = _new_aead(algorithm, key, index)
+    cipher.update(_chunk_aad(header_bytes, index, final))
+    return cipher.decrypt_and_verify(record[:-TAG_SIZE], record[-TAG_SIZE:])
+
+
+def is_compressible(sample: bytes) -> bool:
+    """
+    Guess from the first bytes of a file whether compressing it is worthwhile.
+    
+    Known compressed formats (JPEG, ZIP, MP4, ...) are recognised by their
+    magic bytes; anything else is rejected if the sample's byte entropy is
+    close to random data.
+    
+    Args:
+        sample: Leading bytes of the file (up to COMPRESSION_SAMPLE_SIZE)
+    
+    Returns:
+        True if the data looks compressible
+    """
+    if not sample:
+        return False
+    if sample.startswith(COMPRESSED_MAGIC) or sample[4:8] == b"ftyp":  # MP4, MOV, HEIC
+        return False
+    
+    # Shannon entropy of the sample in bits per byte
+    total = len(sample)
+    entropy = -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+    return entropy < ENTROPY_THRESHOLD
+
+
+def _compress_chunk(codec: str, chunk: bytes) -> bytes:
+    """Compress one chunk, storing it unchanged if it does not shrink."""
+    if codec == CODEC_ZLIB:
+        packed = zlib.compress(chunk, 6)
+    elif codec == CODEC_LZMA:
+        packed = lzma.compress(chunk, preset=1)
+    elif codec == CODEC_ZSTD:
+        packed = zstandard.ZstdCompressor(level=3).compress(chunk)
+    else:
+        raise ValueError(f"Unsupported codec: {codec}")
+    if len(packed) < len(chunk):
+        return CHUNK_COMPRESSED + packed
+    return CHUNK_STORED + chunk
+
+
+def _decompress_chunk(codec: str, data: bytes, chunk_size: int) -> bytes:
+    """Undo _compress_chunk, refusing output larger than chunk_size."""
+    flag, body = data[:1], data[1:]
+    if flag == CHUNK_STORED:
+        return body
+    if flag != CHUNK_COMPRESSED:
+        raise ValueError("Locked file is corrupted")
+    
+    if codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj()
+        chunk = decompressor.decompress(body, chunk_size)
+        if not decompressor.eof:
+            raise ValueError("Locked file is corrupted")
+    elif codec == CODEC_LZMA:
+        decompressor = lzma.LZMADecompressor()
+        chunk = decompressor.decompress(body, max_length=chunk_size)
+        if not decompressor.eof:
+            raise ValueError("Locked file is corrupted")
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd support is not installed (pip install zstandard)")
+        chunk = zstandard.ZstdDecompressor().decompress(body, max_output_size=chunk_size)
+    else:
+        raise ValueError(f"Unsupported codec: {codec}")
+    return chunk
+
+
+def _seal_record(codec, algorithm: str, key: bytes, header_bytes: bytes, index: int,
+                 chunk: bytes, final: bool) -> tuple:
+    """Compress (if codec is set) and seal one chunk. Returns (record, plaintext length)."""
+    data = _compress_chunk(codec, chunk) if codec else chunk
+    return _seal_chunk(algorithm, key, header_bytes, index, data, final), len(chunk)
+
+
+def _open_record(codec, algorithm: str, key: bytes, header_bytes: bytes, index: int,
+                 record: bytes, final: bool, chunk_size: int) -> tuple:
+    """Verify, decrypt and decompress one record. Returns (plaintext, record length)."""
+    data = _open_chunk(algorithm, key, header_bytes, index, record, final)
+    if codec:
+        data = _decompress_chunk(codec, data, chunk_size)
+    return data, len(record)
+
+
+def _record_limit(chunk_size: int, codec) -> int:
+    """Largest valid record body for a chunk size (compressed chunks add a flag byte)."""
+    return chunk_size + TAG_SIZE + (1 if codec else 0)
+
+
+def _map_ordered(func, items, jobs: int):
+    """
+    Yield func(*item) for each item in order, running up to jobs calls at once.
+    
+    Only 2 * jobs items are in flight, so memory stays bounded. With one job
+    everything runs inline on the calling thread.
+    """
+    if jobs <= 1:
+        for item in items:
+            yield func(*item)
+        return
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(executor.submit(func, *item))
+            if len(in_flight) >= jobs * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _encrypt_chunks(src, dst, algorithm: str, key: bytes, header_bytes: bytes, chunk_size: int,
+                    total_bytes: int, progress_callback=None, jobs: int = 1, codec: str = None) -> int:
+    """
+    Encrypt an open file object into length-prefixed AEAD chunk records.
+    
+    Each chunk is compressed (optionally) and sealed independently, so
+    chunks are processed in parallel when jobs > 1. The records are
+    followed by a zero length end marker and the chunk index (see
+    _write_chunk_index).
+    
+    Args:
+        src: Readable binary file object with the plaintext
+        dst: Writable binary file object for the records
+        algorithm: ALG_AES_GCM or ALG_CHACHA20_POLY1305
+        key: 32-byte file key
+        header_bytes: Header bytes bound to every chunk
+        chunk_size: Plaintext bytes per chunk
+        total_bytes: Size of the plaintext, used for progress reporting
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+        jobs: Number of chunks encrypted at once
+        codec: Compression codec from the header, or None
+    
+    Returns:
+        Number of plaintext bytes processed
+    """
+    def read_chunks():
+        # Read one chunk ahead so the last one can be flagged as final
+        index = 0
+        chunk = src.read(chunk_size)
+        while True:
+            next_chunk = src.read(chunk_size) if len(chunk) == chunk_size else b""
+            final = not next_chunk
+            yield codec, algorithm, key, header_bytes, index, chunk, final
+            if final:
+                return
+            chunk = next_chunk
+            index += 1
+    
+    bytes_done = 0
+    offsets = array('Q')
+    for record, chunk_length in _map_ordered(_seal_record, read_chunks(), jobs):
+        offsets.append(dst.tell())
+        dst.write(record)
+        bytes_done += chunk_length
+        if progress_callback:
+            progress_callback(bytes_done, total_bytes)
+    
+    dst.write(struct.pack(">I", 0))
+    _write_chunk_index(dst, offsets)
+    return bytes_done
+
+
+def _write_chunk_index(dst, offsets: array) -> None:
+    """
+    Append the chunk index trailer to a version 3 file.
+    
+    The index is not authenticated, but a wrong offset can only point at a
+    record whose tag fails to verify for that chunk number.
+    """
+    if sys.byteorder == 'little':
+        offsets = array('Q', offsets)
+        offsets.byteswap()
+    dst.write(offsets.tobytes())
+    dst.write(struct.pack(">Q", len(offsets)) + INDEX_MAGIC)
+
+
+def _read_chunk_index(f, data_start: int) -> array:
+    """
+    Load the record offsets of a version 3 file from its index trailer.
+    
+    Args:
+        f: Readable binary file object
+        data_start: Offset of the first chunk record
+    
+    Returns:
+        array of record offsets, one per chunk
+    
+    Raises:
+        ValueError: If the file has no valid index trailer
+    """
+    file_size = f.seek(0, io.SEEK_END)
+    if file_size - data_start >= 16:
+        f.seek(file_size - 12)
+        trailer = f.read(12)
+        count = struct.unpack(">Q", trailer[:8])[0]
+        if trailer[8:] == INDEX_MAGIC and data_start + 4 + count * 8 + 12 <= file_size:
+            f.seek(file_size - 12 - count * 8)
+            offsets = array('Q')
+            offsets.frombytes(f.read(count * 8))
+            if sys.byteorder == 'little':
+                offsets.byteswap()
+            return offsets
+    raise ValueError("Locked file has no chunk index (truncated or damaged)")
+
+
+def _decrypt_chunks(src, dst, algorithm: str, key: bytes, header_bytes: bytes, chunk_size: int,
+                    total_bytes: int, progress_callback=None, jobs: int = 1, codec: str = None) -> int:
     """
-    Encrypt a file using AES-256 in CBC mode.
+    Decrypt and verify the AEAD chunk records written by _encrypt_chunks.
+    
+    Args:
+        src: Readable binary file object positioned at the first record
+        dst: Writable binary file object for the plaintext
+        algorithm: ALG_AES_GCM or ALG_CHACHA20_POLY1305
+        key: 32-byte file key
+        header_bytes: Header bytes bound to every chunk
+        chunk_size: Plaintext bytes per chunk, from the header
+        total_bytes: Size of the records, used for progress reporting
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+        jobs: Number of chunks decrypted at once
+        codec: Compression codec from the header, or None
+    
+    Returns:
+        Number of plaintext bytes written
+    """
+    max_length = _record_limit(chunk_size, codec)
+    
+    def read_length():
+        raw = src.read(4)
+        if len(raw) != 4:
+            raise ValueError("Locked file is truncated")
+        length = struct.unpack(">I", raw)[0]
+        if length and not TAG_SIZE <= length <= max_length:
+            raise ValueError("Locked file is corrupted")
+        return length
+    
+    def read_records():
+        # Read one length ahead so the last record can be flagged as final
+        index = 0
+        length = read_length()
+        if length == 0:
+            raise ValueError("Locked file has no data")
+        while length:
+            record = src.read(length)
+            if len(record) != length:
+                raise ValueError("Locked file is truncated")
+            length = read_length()
+            yield codec, algorithm, key, header_bytes, index, record, length == 0, chunk_size
+            index += 1
+    
+    bytes_done = 0
+    bytes_written = 0
+    for data, record_length in _map_ordered(_open_record, read_records(), jobs):
+        dst.write(data)
+        bytes_written += len(data)
+        bytes_done += record_length + 4
+        if progress_callback:
+            progress_callback(min(bytes_done, total_bytes), total_bytes)
+    
+    return bytes_written
+
+
+def _secure_delete(file_path: str, shred_mode: str = DEFAULT_SHRED_MODE, timings=None,
+                   shred_queue=None) -> bool:
+    """
+    Delete a plaintext original with secure_delete.shred_file.
+    
+    Args:
+        file_path: File to delete
+        shred_mode: One of secure_delete.SHRED_MODES
+        timings: Optional timing.TimingObserver told the shred time and
+            the bytes overwritten
+        shred_queue: Optional shred_queue.ShredQueue. The file is only
+            renamed out of sight and shredded later by its worker; if it
+            cannot be queued it is shredded here.
+    
+    Returns:
+        True if the file was removed or queued (even if the overwrite failed)
+    """
+    if shred_queue is not None:
+        start = time.perf_counter()
+        if shred_queue.enqueue(file_path, shred_mode):
+            if timings is not None:
+                timings.phase(PHASE_SHRED, time.perf_counter() - start, 0, file_path)
+            return True
+    
+    result = shred_file(file_path, shred_mode)
+    if timings is not None:
+        timings.phase(PHASE_SHRED, result.seconds, result.bytes_written, file_path)
+    return result.ok
+
+
+def delete_original(file_path: str, shred_mode: str = DEFAULT_SHRED_MODE, timings=None,
+                    shred_queue=None) -> bool:
+    """
+    Delete a plaintext original the way encrypt_file does, for callers that
+    write their own encrypted copy (e.g. vault.pack_folder).
+    
+    Args and return value as for the shred step of encrypt_file: shred_mode
+    is one of secure_delete.SHRED_MODES, shred_queue an optional
+    shred_queue.ShredQueue.
+    
+    Returns:
+        True if the file was removed or queued
+    """
+    return _secure_delete(file_path, shred_mode, timings, shred_queue)
+
+
+def _check_matches(master_key: bytes, header: dict) -> bool:
+    """Compare a master key against the key check value in a header."""
+    return hmac.compare_digest(key_check_value(master_key), bytes.fromhex(header["check"]))
+
+
+def _new_file_header(keyring, algorithm: str) -> tuple:
+    """
+    Build the header fields and file key for a new locked file.
+    
+    With a key store the file is keyed from its data-encryption key and the
+    header records the key id ("kid"); otherwise it is keyed from the
+    password and the header records the salt (and non-legacy KDF parameters).
+    
+    Args:
+        keyring: KeyRing supplying the master key
+        algorithm: Cipher algorithm id for the "alg" field
+    
+    Returns:
+        Tuple of (header: dict, key: bytes)
+    """
+    header = {"alg": algorithm}
+    if keyring.master_key is not None:
+        master_key = keyring.master_key.data_key
+        header["kid"] = keyring.master_key.key_id
+    else:
+        master_key, salt = keyring.encryption_key()
+        header["salt"] = salt.hex()
+        # Files using the legacy parameters stay readable by older versions
+        if keyring.kdf_params != kdf.LEGACY_PARAMS:
+            header["kdf"] = keyring.kdf_params
+    nonce = get_random_bytes(16)
+    header["nonce"] = nonce.hex()
+    header["check"] = key_check_value(master_key).hex()
+    return header, derive_file_key(master_key, nonce)
+
+
+def _master_key_for_header(header: dict, keyring) -> bytes:
+    """
+    Return the master key a locked file was keyed from.
+    
+    Files with a key id use the key store's data-encryption key. Files
+    keyed from a password use the key the key store recorded for their
+    salt, or the key ring's password. A key the password opens is recorded
+    in the key store, so the file still opens after a password change.
+    
+    Raises:
+        ValueError: If no key matches the header's key check value
+    """
+    if "kid" in header:
+        key = keyring.key_for_id(header["kid"])
+        if not _check_matches(key, header):
+            raise ValueError("Incorrect password")
+        return key
+    
+    salt = bytes.fromhex(header["salt"])
+    master_key = keyring.master_key
+    if master_key is not None and "check" in header:
+        key = master_key.legacy_key(salt, header.get("kdf"))
+        if key is not None and _check_matches(key, header):
+            return key
+    
+    key = keyring.key_for_salt(salt, header.get("kdf"))
+    if "check" not in header:
+        return key
+    if not _check_matches(key, header):
+        raise ValueError("Incorrect password")
+    if master_key is not None:
+        master_key.remember_legacy_key(salt, header.get("kdf"), key)
+    return key
+
+
+def _key_from_header(header: dict, keyring) -> bytes:
+    """
+    Return the key for a locked file described by its header.
+    
+    Raises:
+        ValueError: If the header's key check value does not match
+    """
+    # Rejects a wrong password before any data is read
+    key = _master_key_for_header(header, keyring)
+    
+    if header["version"] >= 2:
+        key = derive_file_key(key, bytes.fromhex(header["nonce"]))
+    return key
+
+
+# Building blocks for other containers with the version 3 chunk format
+# (vault.py). Files written with them are keyed like .locked files.
+
+def new_file_header(keyring, algorithm: str) -> tuple:
+    """
+    Build the key fields of a new header and the key to seal its chunks.
+    
+    Returns:
+        Tuple of (header: dict, key: bytes)
+    """
+    return _new_file_header(keyring, algorithm)
+
+
+def key_from_header(header: dict, keyring) -> bytes:
+    """
+    Return the chunk key for a header built by new_file_header (with
+    "version" set to FORMAT_VERSION).
+    
+    Raises:
+        ValueError: If the password or key store does not match the header
+    """
+    return _key_from_header(header, keyring)
+
+
+def seal_chunk(algorithm: str, key: bytes, header_bytes: bytes, index: int, chunk: bytes,
+               final: bool) -> bytes:
+    """
+    Encrypt one chunk bound to header_bytes and its index.
+    
+    Every index must be used only once per key.
+    
+    Returns:
+        The record: length (4 bytes) + ciphertext + tag
+    """
+    return _seal_chunk(algorithm, key, header_bytes, index, chunk, final)
+
+
+def open_chunk(algorithm: str, key: bytes, header_bytes: bytes, index: int, record: bytes,
+               final: bool) -> bytes:
+    """
+    Decrypt one record body (ciphertext + tag, without the length field).
+    
+    Raises:
+        ValueError: If the record fails authentication
+    """
+    return _open_chunk(algorithm, key, header_bytes, index, record, final)
+
+
+class OperationCancelled(Exception):
+    """Raised when a JobControl is cancelled while a job is running."""
+
+
+class JobControl:
+    """
+    Cooperative cancel / pause token for long-running jobs.
+    
+    Jobs call checkpoint() between chunks and between files. While the
+    token is paused checkpoint() blocks; once it is cancelled checkpoint()
+    raises OperationCancelled. All methods are safe to call from any thread
+    (e.g. the UI thread while a worker runs the job).
+    """
+    
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+    
+    def cancel(self):
+        """Stop the job at its next checkpoint (also wakes a paused job)."""
+        self._cancelled.set()
+        self._running.set()
+    
+    def pause(self):
+        """Hold the job at its next checkpoint until resume() or cancel()."""
+        if not self._cancelled.is_set():
+            self._running.clear()
+    
+    def resume(self):
+        """Let a paused job continue."""
+        self._running.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+    
+    def checkpoint(self):
+        """
+        Block while paused.
+        
+        Raises:
+            OperationCancelled: If the job was cancelled
+        """
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+
+
+class _ControlledReader:
+    """Wraps a readable file and calls control.checkpoint() before each read."""
+    
+    def __init__(self, f, control):
+        self._file = f
+        self._control = control
+    
+    def read(self, size=-1):
+        self._control.checkpoint()
+        return self._file.read(size)
+
+
+class _HashingReader:
+    """Wraps a readable file and feeds everything read into a hash object."""
+    
+    def __init__(self, f, content_hash):
+        self._file = f
+        self._hash = content_hash
+    
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._hash.update(data)
+        return data
+
+
+class _HashingWriter:
+    """Wraps a writable file and feeds everything written into a hash object."""
+    
+    def __init__(self, f, content_hash):
+        self._file = f
+        self._hash = content_hash
+    
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+
+def _expected_locked_size(file_size: int) -> int:
+    """Upper estimate of a locked file's size, for preallocation."""
+    chunks = file_size // CHUNK_SIZE + 1
+    # Header, then per chunk a length, a flag byte and a tag, plus the index
+    return file_size + 1024 + chunks * (4 + 1 + TAG_SIZE + 8) + 16
+
+
+class _TimedReader:
+    """Wraps a readable file and adds up the time and bytes of its reads."""
+    
+    def __init__(self, f):
+        self._file = f
+        self.seconds = 0.0
+        self.bytes = 0
+    
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self._file.read(size)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return data
+
+
+class _TimedWriter:
+    """Wraps a writable file and adds up the time and bytes of its writes."""
+    
+    def __init__(self, f):
+        self._file = f
+        self.seconds = 0.0
+        self.bytes = 0
+    
+    def write(self, data):
+        start = time.perf_counter()
+        written = self._file.write(data)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return written
+    
+    def tell(self):
+        return self._file.tell()
+
+
+def _report_stream(timings, file_path: str, reader, writer, seconds: float, nbytes: int) -> None:
+    """
+    Report the read, write and crypt phases of one streamed file.
+    
+    Crypt is the stream's wall time minus the time spent in reads and
+    writes, i.e. cipher, compression and hashing work (and, with parallel
+    chunks, waiting on the pool).
+    """
+    timings.phase(PHASE_READ, reader.seconds, reader.bytes, file_path)
+    timings.phase(PHASE_CRYPT, max(0.0, seconds - reader.seconds - writer.seconds), nbytes, file_path)
+    timings.phase(PHASE_WRITE, writer.seconds, writer.bytes, file_path)
+
+
+def encrypt_bytes(data: bytes, keyring, algorithm: str = DEFAULT_ALGORITHM) -> bytes:
+    """
+    Encrypt a small in-memory blob into the version 3 locked file format.
+    
+    Used for metadata such as folder manifests.
+    
+    Args:
+        data: Plaintext bytes
+        keyring: KeyRing supplying the master key
+        algorithm: ALG_AES_GCM or ALG_CHACHA20_POLY1305
+    
+    Returns:
+        Encrypted bytes
+    """
+    header, key = _new_file_header(keyring, algorithm)
+    header["chunk_size"] = CHUNK_SIZE
+    dst = io.BytesIO()
+    header_bytes = _write_header(dst, header)
+    _encrypt_chunks(io.BytesIO(data), dst, algorithm, key, header_bytes, CHUNK_SIZE, len(data))
+    return dst.getvalue()
+
+
+def decrypt_bytes(blob: bytes, keyring) -> bytes:
+    """
+    Decrypt bytes produced by encrypt_bytes.
+    
+    Raises:
+        ValueError: If the password is wrong or the data was modified
+    """
+    src = io.BytesIO(blob)
+    header = _read_header(src)
+    if header["alg"] not in AEAD_ALGORITHMS:
+        raise ValueError("Not an encrypted blob")
+    key = _key_from_header(header, keyring)
+    dst = io.BytesIO()
+    _decrypt_chunks(src, dst, header["alg"], key, header["raw"], header["chunk_size"],
+                    len(blob) - src.tell(), codec=header.get("codec"))
+    return dst.getvalue()
+
+
+def encrypt_file(file_path: str, password: str, progress_callback=None, keyring=None,
+                 algorithm: str = DEFAULT_ALGORITHM, chunk_jobs: int = None, content_hash=None,
+                 compression: str = None, on_written=None, control=None,
+                 timings=None, shred_mode: str = DEFAULT_SHRED_MODE, shred_queue=None,
+                 durability=None, io_hints=None, on_done=None) -> bool:
+    """
+    Encrypt a file using AES-256-GCM (or another supported algorithm).
+    
+    The file is streamed through the cipher in CHUNK_SIZE pieces, so memory
+    use does not grow with the size of the file. The key is a per-file
+    subkey of the key ring's master key, so passing the same KeyRing for
+    many files runs the expensive PBKDF2 step only once.
+    
+    AEAD algorithms write a version 3 file of independently authenticated
+    chunks; ALG_AES_CBC writes the older version 2 layout.
+    
+    With compression set, AEAD files are compressed chunk by chunk before
+    encryption (version 4). A sample of the file is checked first with
+    is_compressible(), and already-compressed data is stored as it is.
     
     Args:
         file_path: Path to the file to encrypt
         password: Master password for encryption
-        
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+        keyring: Optional KeyRing to reuse (default: a new one for password)
+        algorithm: One of ALG_AES_GCM, ALG_CHACHA20_POLY1305 or ALG_AES_CBC
+        chunk_jobs: Chunks encrypted in parallel (default: DEFAULT_JOBS for
+            files spanning several chunks, otherwise 1)
+        content_hash: Optional hashlib object updated with the plaintext
+        compression: Optional codec from COMPRESSION_CODECS, or "auto" for
+            DEFAULT_CODEC (ignored for ALG_AES_CBC)
+        on_written: Optional callback() run once the locked file is complete,
+            before the original is deleted
+        on_done: Optional callback() run after the original is deleted. It
+            only runs once the locked file is durable, which with a batching
+            durability can be after encrypt_file returns.
+        control: Optional JobControl checked between chunks
+        timings: Optional timing.TimingObserver told how long the kdf,
+            read, crypt, write and shred phases took
+        shred_mode: How the original is deleted, one of
+            secure_delete.SHRED_MODES
+        shred_queue: Optional shred_queue.ShredQueue to hand the original
+            to instead of shredding it before returning
+        durability: Optional durability.Durability that publishes the
+            locked file and decides when it is synced (default: fsync it
+            before the original is deleted)
+        io_hints: Optional collection of io_hints.IO_HINTS names (read-ahead,
+            page cache drop, preallocation) for bulk jobs
+    
     Returns:
         True on success, False on failure
+    
+    Raises:
+        OperationCancelled: If control was cancelled (the partial locked
+            file is removed and the original is left untouched)
     """
     try:
         import traceback
@@ -61,68 +1157,123 @@ def encrypt_file(file_path: str, password: str) -> bool:
             print(f"File is not readable: {file_path}")
             return False
         
-        # Read original file
+        if algorithm != ALG_AES_CBC and algorithm not in AEAD_ALGORITHMS:
+            print(f"Unsupported algorithm: {algorithm}")
+            return False
+        
+        if compression == "auto":
+            compression = DEFAULT_CODEC
+        if compression and (compression not in COMPRESSION_CODECS or
+                            (compression == CODEC_ZSTD and zstandard is None)):
+            print(f"Unsupported compression codec: {compression}")
+            return False
+        
+        if shred_mode not in SHRED_MODES:
+            print(f"Unknown secure delete mode: {shred_mode}")
+            return False
+        
         try:
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-        except Exception as e:
-            print(f"Error reading file: {e}")
-            traceback.print_exc()
+            io_hints = validate_hints(io_hints)
+        except ValueError as e:
+            print(e)
             return False
         
-        # Derive key and salt from password
+        # Get the master key and derive this file's subkey from a fresh nonce
         try:
-            key, salt = derive_key_from_password(password)
+            if keyring is None:
+                keyring = KeyRing(password)
+            with timed(timings, PHASE_KDF, file_path):
+                header, key = _new_file_header(keyring, algorithm)
         except Exception as e:
             print(f"Error deriving key: {e}")
             traceback.print_exc()
             return False
         
-        # Generate random IV (Initialization Vector)
-        iv = get_random_bytes(16)
+        file_size = os.path.getsize(file_path)
+        if chunk_jobs is None:
+            chunk_jobs = DEFAULT_JOBS if file_size > 2 * CHUNK_SIZE else 1
         
-        # Create cipher and encrypt
+        # Stream the original file into a temporary locked file (header +
+        # encrypted_data), published under its final name once complete
+        locked_file_path = file_path + ".locked"
+        temp_path = temp_path_for(locked_file_path)
         try:
-            cipher = AES.new(key, AES.MODE_CBC, iv)
-            
-            # Add PKCS7 padding
-            padding_len = 16 - (len(file_data) % 16)
-            padded_data = file_data + bytes([padding_len] * padding_len)
-            
-            # Encrypt the data
-            encrypted_data = cipher.encrypt(padded_data)
+            with open(file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                # Only compress data that a quick sample says will shrink
+                codec = None
+                if compression and algorithm != ALG_AES_CBC:
+                    if is_compressible(src.read(COMPRESSION_SAMPLE_SIZE)):
+                        codec = compression
+                        header["codec"] = codec
+                    src.seek(0)
+                
+                if io_hints:
+                    src = hinted_src = HintedReader(src, io_hints)
+                    dst = hinted_dst = HintedWriter(dst, io_hints, _expected_locked_size(file_size))
+                if timings is not None:
+                    src = timed_src = _TimedReader(src)
+                    dst = timed_dst = _TimedWriter(dst)
+                    stream_start = time.perf_counter()
+                if content_hash is not None:
+                    src = _HashingReader(src, content_hash)
+                if control is not None:
+                    src = _ControlledReader(src, control)
+                if algorithm == ALG_AES_CBC:
+                    # Generate random IV (Initialization Vector)
+                    iv = get_random_bytes(16)
+                    header["iv"] = iv.hex()
+                    _write_header(dst, header, version=2)
+                    cipher = AES.new(key, AES.MODE_CBC, iv)
+                    _encrypt_stream(src, dst, cipher, file_size, progress_callback)
+                else:
+                    header["chunk_size"] = CHUNK_SIZE
+                    header_bytes = _write_header(dst, header)
+                    _encrypt_chunks(src, dst, algorithm, key, header_bytes, CHUNK_SIZE,
+                                    file_size, progress_callback, chunk_jobs, codec)
+                if io_hints:
+                    hinted_dst.finish()
+                    hinted_src.finish()
+                if timings is not None:
+                    _report_stream(timings, file_path, timed_src, timed_dst,
+                                   time.perf_counter() - stream_start, file_size)
         except Exception as e:
+            # Don't leave a partial locked file behind
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            if isinstance(e, OperationCancelled):
+                raise
             print(f"Error during encryption: {e}")
             traceback.print_exc()
             return False
         
-        # Create locked file with salt and IV prepended (salt + iv + encrypted_data)
-        locked_file_path = file_path + ".locked"
-        try:
-            with open(locked_file_path, 'wb') as f:
-                f.write(salt + iv + encrypted_data)
-        except Exception as e:
-            print(f"Error writing encrypted file: {e}")
-            traceback.print_exc()
-            return False
+        def on_durable():
+            if on_written:
+                on_written()
+            # Securely delete the original file
+            _secure_delete(file_path, shred_mode, timings, shred_queue)
+            if on_done:
+                on_done()
         
-        # Securely delete original file (overwrite with random data)
+        # The original is only deleted once the locked file is on disk
         try:
-            file_size = os.path.getsize(file_path)
-            with open(file_path, 'wb') as f:
-                f.write(os.urandom(file_size))
-            os.remove(file_path)
-        except Exception as e:
-            print(f"Warning: Could not securely delete original file: {e}")
-            # Still attempt to remove the file
+            if durability is None:
+                durability = Durability(timings=timings)
+            durability.publish(temp_path, locked_file_path, on_durable)
+        except OSError as e:
             try:
-                os.remove(file_path)
-            except Exception as e2:
-                print(f"Warning: Could not remove original file: {e2}")
+                os.remove(temp_path)
+            except OSError:
+                pass
+            print(f"Error saving locked file: {e}")
+            return False
         
         print(f"File encrypted successfully: {locked_file_path}")
         return True
-        
+    
+    except OperationCancelled:
+        raise
     except Exception as e:
         print(f"Encryption error: {e}")
         import traceback
@@ -130,17 +1281,79 @@ def encrypt_file(file_path: str, password: str) -> bool:
         return False
 
 
-def decrypt_file(locked_file_path: str, password: str, output_path: str = None) -> bool:
+def verify_file_key(locked_file_path: str, password: str, keyring=None):
     """
-    Decrypt a .locked file using AES-256.
+    Check a password against a locked file using only its header.
+    
+    Nothing past the header is read, so this costs one key derivation
+    (none if the key ring already holds the key) whatever the file size.
+    
+    Args:
+        locked_file_path: Path to the .locked file
+        password: Master password to check
+        keyring: Optional KeyRing to reuse (default: a new one for password)
+    
+    Returns:
+        True if the password matches, False if it does not, None if the
+        file has no key check value (older formats)
+    """
+    with open(locked_file_path, 'rb') as f:
+        header = _read_header(f)
+    
+    if "check" not in header:
+        return None
+    
+    if keyring is None:
+        keyring = KeyRing(password)
+    try:
+        _master_key_for_header(header, keyring)
+    except ValueError:
+        return False
+    return True
+
+
+def decrypt_file(locked_file_path: str, password: str, output_path: str = None,
+                 progress_callback=None, keyring=None, chunk_jobs: int = None,
+                 content_hash=None, keep_locked: bool = False, on_written=None,
+                 control=None, timings=None, durability=None, io_hints=None,
+                 on_done=None) -> bool:
+    """
+    Decrypt a .locked file.
+    
+    The ciphertext is streamed through the cipher in chunks, so memory use
+    does not grow with the size of the file. The algorithm is taken from
+    the file header; files in the original salt + IV layout are decrypted
+    with AES-256-CBC.
     
     Args:
         locked_file_path: Path to the .locked file
         password: Master password for decryption
         output_path: Optional output path (default: remove .locked extension)
-        
+        progress_callback: Optional callback function(bytes_done, total_bytes)
+        keyring: Optional KeyRing to reuse (default: a new one for password)
+        chunk_jobs: Chunks decrypted in parallel (default: DEFAULT_JOBS for
+            files spanning several chunks, otherwise 1)
+        content_hash: Optional hashlib object updated with the plaintext
+        keep_locked: Keep the .locked file after decrypting it
+        on_written: Optional callback() run once the output file is complete,
+            before the locked file is deleted
+        on_done: Optional callback() run after the locked file is deleted
+            (see encrypt_file)
+        control: Optional JobControl checked between chunks
+        timings: Optional timing.TimingObserver told how long the kdf,
+            read, crypt, write, sync and remove phases took
+        durability: Optional durability.Durability that publishes the
+            output and decides when it is synced (default: fsync it before
+            the locked file is deleted)
+        io_hints: Optional collection of io_hints.IO_HINTS names (read-ahead,
+            page cache drop, preallocation) for bulk jobs
+    
     Returns:
         True on success, False on failure
+    
+    Raises:
+        OperationCancelled: If control was cancelled (the partial output
+            file is removed and the locked file is left untouched)
     """
     try:
         # Verify file exists
@@ -148,26 +1361,6 @@ def decrypt_file(locked_file_path: str, password: str, output_path: str = None)
             print(f"Locked file not found: {locked_file_path}")
             return False
         
-        # Read locked file
-        with open(locked_file_path, 'rb') as f:
-            file_contents = f.read()
-        
-        # Extract salt (first 16 bytes) and IV (next 16 bytes)
-        salt = file_contents[:16]
-        iv = file_contents[16:32]
-        encrypted_data = file_contents[32:]
-        
-        # Derive key using same password and extracted salt
-        key, _ = derive_key_from_password(password, salt)
-        
-        # Create cipher and decrypt
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        padded_data = cipher.decrypt(encrypted_data)
-        
-        # Remove PKCS7 padding
-        padding_len = padded_data[-1]
-        file_data = padded_data[:-padding_len]
-        
         # Determine output path
         if output_path is None:
             if locked_file_path.endswith('.locked'):
@@ -175,38 +1368,349 @@ def decrypt_file(locked_file_path: str, password: str, output_path: str = None)
             else:
                 output_path = locked_file_path + ".decrypted"
         
-        # Write decrypted file
-        with open(output_path, 'wb') as f:
-            f.write(file_data)
+        if keyring is None:
+            keyring = KeyRing(password)
+        io_hints = validate_hints(io_hints)
+        
+        with open(locked_file_path, 'rb') as src:
+            # Read the header (or the salt and IV of an original-layout file)
+            header = _read_header(src)
+            encrypted_size = os.path.getsize(locked_file_path) - src.tell()
+            algorithm = header["alg"]
+            if algorithm != ALG_AES_CBC and algorithm not in AEAD_ALGORITHMS:
+                raise ValueError(f"Unsupported algorithm: {algorithm}")
+            
+            # Derive key using same password and extracted salt. A wrong
+            # password is rejected here, before any output is written.
+            try:
+                with timed(timings, PHASE_KDF, locked_file_path):
+                    key = _key_from_header(header, keyring)
+            except ValueError:
+                print(f"Incorrect password for: {locked_file_path}")
+                return False
+            
+            if chunk_jobs is None:
+                chunk_jobs = DEFAULT_JOBS if encrypted_size > 2 * CHUNK_SIZE else 1
+            
+            stream = src
+            if io_hints:
+                stream = hinted_src = HintedReader(src, io_hints)
+            if timings is not None:
+                stream = timed_src = _TimedReader(stream)
+            if control is not None:
+                stream = _ControlledReader(stream, control)
+            
+            # Stream the decrypted file to a temporary name
+            temp_path = temp_path_for(output_path)
+            try:
+                with open(temp_path, 'wb') as dst:
+                    if io_hints:
+                        # The plaintext is about as large as the ciphertext
+                        dst = hinted_dst = HintedWriter(dst, io_hints, encrypted_size)
+                    if timings is not None:
+                        dst = timed_dst = _TimedWriter(dst)
+                        stream_start = time.perf_counter()
+                    if content_hash is not None:
+                        dst = _HashingWriter(dst, content_hash)
+                    if algorithm == ALG_AES_CBC:
+                        cipher = AES.new(key, AES.MODE_CBC, bytes.fromhex(header["iv"]))
+                        _decrypt_stream(stream, dst, cipher, encrypted_size, progress_callback)
+                    else:
+                        _decrypt_chunks(stream, dst, algorithm, key, header["raw"], header["chunk_size"],
+                                        encrypted_size, progress_callback, chunk_jobs,
+                                        header.get("codec"))
+                    if io_hints:
+                        hinted_dst.finish()
+                        hinted_src.finish()
+                    if timings is not None:
+                        _report_stream(timings, locked_file_path, timed_src, timed_dst,
+                                       time.perf_counter() - stream_start, encrypted_size)
+            except Exception:
+                # Don't leave a partial output file behind
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+        
+        def on_durable():
+            if on_written:
+                on_written()
+            # Delete the locked file
+            if not keep_locked:
+                try:
+                    with timed(timings, PHASE_REMOVE, locked_file_path):
+                        os.remove(locked_file_path)
+                except Exception as e:
+                    print(f"Warning: Could not delete locked file: {e}")
+            if on_done:
+                on_done()
         
-        # Delete the locked file
+        # The locked file is only deleted once the output is on disk
         try:
-            os.remove(locked_file_path)
-        except Exception as e:
-            print(f"Warning: Could not delete locked file: {e}")
+            if durability is None:
+                durability = Durability(timings=timings)
+            durability.publish(temp_path, output_path, on_durable)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
         
         print(f"File decrypted successfully: {output_path}")
         return True
-        
+    
+    except OperationCancelled:
+        raise
     except Exception as e:
         print(f"Decryption error: {e}")
         return False
 
 
+class _NullWriter:
+    """Writable file object that discards everything."""
+    
+    def write(self, data):
+        return len(data)
+
+
+def check_locked_file(locked_file_path: str, password: str, keyring=None,
+                      chunk_jobs: int = None) -> tuple:
+    """
+    Decrypt a locked file without writing the plaintext anywhere.
+    
+    For chunked (version 3 and 4) files every chunk's tag is verified, so
+    any modification or truncation is found. Older CBC files only have
+    their padding checked.
+    
+    Args:
+        locked_file_path: Path to the .locked file
+        password: Master password
+        keyring: Optional KeyRing to reuse (default: a new one for password)
+        chunk_jobs: Chunks decrypted in parallel (default: DEFAULT_JOBS for
+            files spanning several chunks, otherwise 1)
+    
+    Returns:
+        Tuple of (ok: bool, message: str)
+    """
+    try:
+        if keyring is None:
+            keyring = KeyRing(password)
+        
+        with open(locked_file_path, 'rb') as src:
+            header = _read_header(src)
+            encrypted_size = os.path.getsize(locked_file_path) - src.tell()
+            algorithm = header["alg"]
+            if algorithm != ALG_AES_CBC and algorithm not in AEAD_ALGORITHMS:
+                return False, f"Unsupported algorithm: {algorithm}"
+            
+            try:
+                key = _key_from_header(header, keyring)
+            except ValueError:
+                return False, "Incorrect password"
+            
+            if chunk_jobs is None:
+                chunk_jobs = DEFAULT_JOBS if encrypted_size > 2 * CHUNK_SIZE else 1
+            
+            if algorithm == ALG_AES_CBC:
+                cipher = AES.new(key, AES.MODE_CBC, bytes.fromhex(header["iv"]))
+                _decrypt_stream(src, _NullWriter(), cipher, encrypted_size)
+            else:
+                _decrypt_chunks(src, _NullWriter(), algorithm, key, header["raw"], header["chunk_size"],
+                                encrypted_size, None, chunk_jobs, header.get("codec"))
+        return True, "OK"
+    
+    except Exception as e:
+        return False, str(e) or type(e).__name__
+
+
+class LockedFileReader(io.RawIOBase):
+    """
+    Read-only, seekable view of the plaintext of a version 3 locked file.
+    
+    Only the chunks that are read get decrypted and verified. Recently used
+    chunks are kept in a small LRU cache whose size is capped in bytes.
+    Besides read/readinto/seek it supports mmap-style slicing:
+    reader[start:stop] returns bytes without moving the file position.
+    
+    Create instances with open_locked().
+    """
+    
+    def __init__(self, f, header: dict, key: bytes, offsets: array, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        super().__init__()
+        self._file = f
+        self._algorithm = header["alg"]
+        self._header_bytes = header["raw"]
+        self._chunk_size = header["chunk_size"]
+        self._codec = header.get("codec")
+        self._key = key
+        self._offsets = offsets
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_limit = max(cache_bytes, 0)
+        self._position = 0
+        self._lock = threading.Lock()
+        
+        # Plaintext size: full chunks plus the length of the last one.
+        # A compressed last chunk has to be decrypted to learn its length.
+        if offsets and self._codec:
+            last_length = len(self._get_chunk(len(offsets) - 1))
+            self._size = (len(offsets) - 1) * self._chunk_size + last_length
+        elif offsets:
+            f.seek(offsets[-1])
+            last_length = struct.unpack(">I", f.read(4))[0] - TAG_SIZE
+            self._size = (len(offsets) - 1) * self._chunk_size + last_length
+        else:
+            self._size = 0
+    
+    @property
+    def size(self) -> int:
+        """Size of the plaintext in bytes."""
+        return self._size
+    
+    def __len__(self):
+        return self._size
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+    
+    def readinto(self, buffer) -> int:
+        data = self._read_range(self._position, self._position + len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._size)
+            data = self._read_range(start, stop) if stop > start else b""
+            return data if step == 1 else data[::step]
+        if item < 0:
+            item += self._size
+        if not 0 <= item < self._size:
+            raise IndexError("LockedFileReader index out of range")
+        return self._read_range(item, item + 1)[0]
+    
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self._cache.clear()
+        super().close()
+    
+    def _read_range(self, start: int, stop: int) -> bytes:
+        """Return plaintext bytes [start, stop), decrypting chunks as needed."""
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        stop = min(stop, self._size)
+        pieces = []
+        position = start
+        while position < stop:
+            index = position // self._chunk_size
+            chunk = self._get_chunk(index)
+            offset = position - index * self._chunk_size
+            piece = chunk[offset:offset + (stop - position)]
+            pieces.append(piece)
+            position += len(piece)
+        return b"".join(pieces)
+    
+    def _get_chunk(self, index: int) -> bytes:
+        """Return one decrypted chunk, from the LRU cache when possible."""
+        with self._lock:
+            chunk = self._cache.get(index)
+            if chunk is not None:
+                self._cache.move_to_end(index)
+                return chunk
+            
+            self._file.seek(self._offsets[index])
+            length = struct.unpack(">I", self._file.read(4))[0]
+            if not TAG_SIZE <= length <= _record_limit(self._chunk_size, self._codec):
+                raise ValueError("Locked file is corrupted")
+            record = self._file.read(length)
+            final = index == len(self._offsets) - 1
+            chunk, _ = _open_record(self._codec, self._algorithm, self._key, self._header_bytes,
+                                    index, record, final, self._chunk_size)
+            
+            # Cache it, evicting least recently used chunks over the cap
+            self._cache[index] = chunk
+            self._cache_bytes += len(chunk)
+            while self._cache_bytes > self._cache_limit and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+            return chunk
+
+
+def open_locked(locked_file_path: str, password: str, keyring=None,
+                cache_bytes: int = DEFAULT_CACHE_BYTES) -> LockedFileReader:
+    """
+    Open a locked file for random-access reading without decrypting it to disk.
+    
+    Args:
+        locked_file_path: Path to the .locked file (version 3 format)
+        password: Master password for decryption
+        keyring: Optional KeyRing to reuse (default: a new one for password)
+        cache_bytes: Memory cap for cached decrypted chunks
+    
+    Returns:
+        LockedFileReader positioned at the start of the plaintext
+    
+    Raises:
+        ValueError: If the password is wrong or the file is not a chunked
+            (version 3) locked file
+    """
+    f = open(locked_file_path, 'rb')
+    try:
+        header = _read_header(f)
+        if header["version"] < 3 or header["alg"] not in AEAD_ALGORITHMS:
+            raise ValueError("Random access needs a chunked (version 3) locked file")
+        
+        if keyring is None:
+            keyring = KeyRing(password)
+        key = _key_from_header(header, keyring)
+        
+        offsets = _read_chunk_index(f, len(header["raw"]))
+        return LockedFileReader(f, header, key, offsets, cache_bytes)
+    except Exception:
+        f.close()
+        raise
+
+
 def hide_file_windows(file_path: str) -> bool:
     """
-    Hide a file in Windows using file attributes.
+    Hide a file using the platform's default hiding backend.
+    
+    On Windows this sets the hidden attribute directly (no attrib process).
     
     Args:
         file_path: Path to file to hide
-        
+    
     Returns:
         True on success, False on failure
     """
     try:
-        import subprocess
-        # Use Windows attrib command to hide file
-        subprocess.run(['attrib', '+h', file_path], check=True, capture_output=True)
+        if get_hide_backend().hide(file_path) is None:
+            print(f"File not hidden: {file_path}")
+            return False
         print(f"File hidden: {file_path}")
         return True
     except Exception as e:
@@ -216,18 +1720,18 @@ def hide_file_windows(file_path: str) -> bool:
 
 def unhide_file_windows(file_path: str) -> bool:
     """
-    Unhide a file in Windows using file attributes.
+    Unhide a file using the platform's default hiding backend.
     
     Args:
         file_path: Path to file to unhide
-        
+    
     Returns:
         True on success, False on failure
     """
     try:
-        import subprocess
-        # Use Windows attrib command to unhide file
-        subprocess.run(['attrib', '-h', file_path], check=True, capture_output=True)
+        if get_hide_backend().unhide(file_path) is None:
+            print(f"File not unhidden: {file_path}")
+            return False
         print(f"File unhidden: {file_path}")
         return True
     except Exception as e:
@@ -235,15 +1739,446 @@ def unhide_file_windows(file_path: str) -> bool:
         return False
 
 
-def encrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
+def _run_parallel(worker, paths: list, jobs: int = None, callback=None, control=None,
+                  progress=None, timings=None) -> tuple:
+    """
+    Run worker(path) for every path on a bounded pool of threads.
+    
+    At most 2 * jobs paths are queued at any time, so memory stays flat for
+    folders with hundreds of thousands of files. Progress callbacks are
+    serialised and receive the number of completed files.
+    
+    When control is cancelled no further paths are started, and paths the
+    worker abandons with OperationCancelled count as neither done nor failed.
+    
+    Args:
+        worker: Function(path) returning True on success
+        paths: List of paths to process
+        jobs: Number of worker threads (default: DEFAULT_JOBS)
+        callback: Optional callback function(files_done, total_files, filename)
+        control: Optional JobControl checked before each path
+        progress: Optional progress.ProgressChannel told about each finished path
+        timings: Optional timing.TimingObserver told each path's total time
+    
+    Returns:
+        Tuple of (successful: int, failed_files: list of file names in input order)
+    """
+    jobs = max(1, jobs or DEFAULT_JOBS)
+    total = len(paths)
+    results = [None] * total
+    done_count = 0
+    
+    def run(index):
+        path = paths[index]
+        start = time.perf_counter()
+        try:
+            if control is not None:
+                control.checkpoint()
+            results[index] = bool(worker(path))
+        except OperationCancelled:
+            return index
+        except Exception as e:
+            results[index] = False
+            print(f"Error processing {path}: {e}")
+        if progress is not None:
+            progress.file_done(path, results[index])
+        if timings is not None:
+            timings.file_done(path, time.perf_counter() - start, results[index])
+        return index
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        next_index = 0
+        while next_index < total or pending:
+            # Keep the queue topped up without submitting everything at once
+            while (next_index < total and len(pending) < jobs * 2 and
+                   not (control is not None and control.cancelled)):
+                pending.add(executor.submit(run, next_index))
+                next_index += 1
+            if not pending:
+                break
+            
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = future.result()
+                if results[index] is None:
+                    continue
+                done_count += 1
+                if callback:
+                    try:
+                        callback(done_count, total, os.path.basename(paths[index]))
+                    except Exception as e:
+                        print(f"Progress callback error: {e}")
+    
+    failed_files = [os.path.basename(paths[i]) for i in range(total) if results[i] is False]
+    return results.count(True), failed_files
+
+
+def run_parallel(worker, paths: list, jobs: int = None, callback=None, control=None) -> tuple:
+    """
+    Run worker(path) for every path on the pool used by the folder functions.
+    
+    Args:
+        worker: Function(path) returning True on success
+        paths: List of paths to process
+        jobs: Number of worker threads (default: DEFAULT_JOBS)
+        callback: Optional callback function(files_done, total_files, filename)
+        control: Optional JobControl to pause or cancel the run
+    
+    Returns:
+        Tuple of (successful: int, failed_files: list of file names in input order)
+    """
+    return _run_parallel(worker, paths, jobs, callback, control)
+
+
+class FolderManifest:
+    """
+    Files selected for a folder operation, produced by scan_folder().
+    
+    Passing a manifest to encrypt_folder / decrypt_folder lets them skip
+    their own directory walk.
+    
+    Attributes:
+        folder_path: Folder that was scanned
+        mode: "lock" (files to encrypt) or "unlock" (.locked files)
+        entries: List of (path, size, mtime) tuples
+        total_bytes: Sum of the file sizes
+    """
+    
+    def __init__(self, folder_path: str, mode: str):
+        self.folder_path = folder_path
+        self.mode = mode
+        self.entries = []
+        self.total_bytes = 0
+    
+    @property
+    def paths(self) -> list:
+        """Paths of the files in the manifest."""
+        return [entry[0] for entry in self.entries]
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+def scan_folder(folder_path: str, mode: str = "lock", callback=None) -> FolderManifest:
+    """
+    Walk a folder once with os.scandir and list the files for an operation.
+    
+    Meant to run off the UI thread: the callback receives running totals
+    so a dialog can show counts while a large tree is being scanned.
+    Symbolic links and METADATA_PREFIX files are skipped.
+    
+    Args:
+        folder_path: Path to the folder to scan
+        mode: "lock" for files to encrypt, "unlock" for .locked files
+        callback: Optional callback function(files_found, total_bytes)
+    
+    Returns:
+        FolderManifest with the matching files
+    """
+    if mode not in ("lock", "unlock"):
+        raise ValueError(f"Unknown scan mode: {mode}")
+    
+    manifest = FolderManifest(folder_path, mode)
+    want_locked = mode == "unlock"
+    pending_dirs = [folder_path]
+    
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending_dirs.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        if entry.name.startswith(METADATA_PREFIX):
+                            continue
+                        if entry.name.endswith('.locked') != want_locked:
+                            continue
+                        info = entry.stat(follow_symlinks=False)
+                    except OSError as e:
+                        print(f"Error scanning {entry.path}: {e}")
+                        continue
+                    
+                    manifest.entries.append((entry.path, info.st_size, info.st_mtime))
+                    manifest.total_bytes += info.st_size
+                    if callback and len(manifest.entries) % SCAN_PROGRESS_INTERVAL == 0:
+                        callback(len(manifest.entries), manifest.total_bytes)
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
+    
+    if callback:
+        callback(len(manifest.entries), manifest.total_bytes)
+    return manifest
+
+
+def _manifest_key(folder_path: str, file_path: str) -> str:
+    """Key for a file in the lock manifest: its path relative to the folder."""
+    return os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+
+
+def _hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file, read CHUNK_SIZE bytes at a time."""
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def load_lock_manifest(folder_path: str, keyring) -> dict:
+    """
+    Load the encrypted incremental-lock manifest of a folder.
+    
+    Each entry maps a relative path to {"size", "mtime", "sha256",
+    "unlocked"}: the state of the plaintext when it was last locked or
+    unlocked, and whether it is currently unlocked next to its .locked copy.
+    Entries written by decrypt_folder(keep_locked=True) also record the
+    "locked_size" and "locked_mtime" of that .locked copy.
+    
+    Args:
+        folder_path: Root of the locked folder
+        keyring: KeyRing for the master password
+    
+    Returns:
+        Dictionary of entries (empty if there is no readable manifest)
+    """
+    manifest_path = os.path.join(folder_path, LOCK_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'rb') as f:
+            data = json.loads(decrypt_bytes(f.read(), keyring).decode('utf-8'))
+        return data.get("files", {})
+    except Exception as e:
+        print(f"Warning: Could not read lock manifest: {e}")
+        return {}
+
+
+def save_lock_manifest(folder_path: str, entries: dict, keyring) -> bool:
+    """
+    Encrypt and save the incremental-lock manifest of a folder.
+    
+    An empty manifest removes the file.
+    
+    Args:
+        folder_path: Root of the locked folder
+        entries: Dictionary of entries (see load_lock_manifest)
+        keyring: KeyRing for the master password
+    
+    Returns:
+        True on success, False on failure
+    """
+    manifest_path = os.path.join(folder_path, LOCK_MANIFEST_NAME)
+    try:
+        if not entries:
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            return True
+        
+        data = json.dumps({"version": 1, "files": entries}).encode('utf-8')
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encrypt_bytes(data, keyring))
+        os.replace(temp_path, manifest_path)
+        return True
+    except Exception as e:
+        print(f"Warning: Could not save lock manifest: {e}")
+        return False
+
+
+def _is_kept_copy(locked_file_path: str, entry: dict) -> bool:
+    """
+    Check whether a .locked file is the copy a lock manifest entry recorded.
+    
+    A copy written since (e.g. by a lock that did not use the manifest) or
+    an entry without the recorded size and mtime does not match.
+    """
+    try:
+        info = os.stat(locked_file_path)
+    except OSError:
+        return False
+    return (entry.get("locked_size") == info.st_size and
+            entry.get("locked_mtime") == info.st_mtime)
+
+
+def _is_unchanged(file_path: str, size: int, mtime: float, entry: dict) -> bool:
+    """
+    Check whether a plaintext file still matches its lock manifest entry.
+    
+    Size and mtime are compared first; the content hash is only computed
+    when the size matches but the mtime moved.
+    """
+    if not _is_kept_copy(file_path + ".locked", entry) or size != entry.get("size"):
+        return False
+    if mtime == entry.get("mtime"):
+        return True
+    return _hash_file(file_path) == entry.get("sha256")
+
+
+def _journal_password_matches(folder_path: str, journal: dict, keyring) -> bool:
+    """
+    Check the password against a locked file of an interrupted run.
+    
+    Recovering a journal deletes it, so this runs first: otherwise a run
+    with another password could recover an interrupted lock and the rest
+    of the folder would end up locked under a different key.
+    """
+    for name, state in journal["files"].items():
+        path = os.path.join(folder_path, *name.split('/'))
+        if journal["op"] == "lock":
+            # Only finished files have a complete .locked file
+            if state not in (STATE_WRITTEN, STATE_DONE):
+                continue
+            locked_file_path = path + ".locked"
+        else:
+            locked_file_path = path
+        try:
+            matches = verify_file_key(locked_file_path, None, keyring)
+        except OSError:
+            continue
+        if matches is not None:
+            return matches
+    return True
+
+
+def _recover_folder(folder_path: str, journal: dict) -> None:
+    """
+    Bring every file an interrupted folder operation was working on back
+    to a consistent state, then delete the journal.
+    
+    Files that were started are rolled back (the partial output is removed
+    and the source kept). Files whose output was written are rolled
+    forward (the source is removed). Temporary outputs that were never
+    published are removed. No password is needed.
+    """
+    keep_locked = journal["options"].get("keep_locked", False)
+    shred_mode = journal["options"].get("shred_mode") or DEFAULT_SHRED_MODE
+    for name, state in journal["files"].items():
+        path = os.path.join(folder_path, *name.split('/'))
+        output_path = path + ".locked" if journal["op"] == "lock" else path[:-len('.locked')]
+        try:
+            if os.path.exists(temp_path_for(output_path)):
+                os.remove(temp_path_for(output_path))
+            if journal["op"] == "lock":
+                # path is the original, path + ".locked" the output
+                if state == STATE_STARTED and os.path.exists(path):
+                    if os.path.exists(path + ".locked"):
+                        os.remove(path + ".locked")
+                elif state == STATE_WRITTEN and os.path.exists(path):
+                    _secure_delete(path, shred_mode)
+            else:
+                # path is the locked file, the output has no extension
+                if state == STATE_STARTED and os.path.exists(path):
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                elif state == STATE_WRITTEN and not keep_locked and os.path.exists(path):
+                    os.remove(path)
+        except OSError as e:
+            print(f"Warning: Could not recover {name}: {e}")
+    
+    remove_journal(folder_path)
+
+
+def resume_folder(folder_path: str, password: str, callback=None, jobs: int = None,
+                  control=None, progress=None, timings=None, keyring=None) -> tuple:
+    """
+    Resume an interrupted encrypt_folder / decrypt_folder run.
+    
+    Files the interrupted run was working on are recovered from the
+    journal, then the same operation runs with the same options over the
+    files it had not reached yet. Finished files are not processed again.
+    
+    Args:
+        folder_path: Path to the folder
+        password: Master password
+        callback: Optional callback function(current_file, total_files) for progress updates
+        jobs: Number of worker threads (default: DEFAULT_JOBS)
+        control: Optional JobControl to pause or cancel the run
+        progress: Optional progress.ProgressChannel to publish progress to
+        timings: Optional timing.TimingObserver to report phase timings to
+        keyring: Optional KeyRing for password to reuse
+    
+    Returns:
+        Tuple of (success: bool, message: str, files_processed: int)
+    """
+    journal = load_journal(folder_path)
+    if journal is None:
+        return False, "No interrupted operation to resume", 0
+    
+    options = journal["options"]
+    if journal["op"] == "lock":
+        return encrypt_folder(folder_path, password, callback, jobs, control=control,
+                              progress=progress, timings=timings, keyring=keyring, **options)
+    return decrypt_folder(folder_path, password, callback, jobs, control=control,
+                          progress=progress, timings=timings, keyring=keyring, **options)
+
+
+def encrypt_folder(folder_path: str, password: str, callback=None, jobs: int = None,
+                   hide_backend: str = None, hide_root: bool = False, manifest=None,
+                   incremental: bool = False, compression: str = None, control=None,
+                   progress=None, timings=None, keyring=None,
+                   shred_mode: str = DEFAULT_SHRED_MODE, shred_queue=None,
+                   durability: str = DEFAULT_DURABILITY, batch_files: int = DEFAULT_BATCH_FILES,
+                   batch_seconds: float = DEFAULT_BATCH_SECONDS, io_hints=None) -> tuple:
     """
     Encrypt all files in a folder recursively using AES-256.
     
+    Files are encrypted in parallel on a pool of worker threads, then the
+    locked files are hidden in one batch.
+    
+    Progress is recorded in a journal (see journal.py). If a previous run
+    was interrupted, the files it was working on are recovered first and
+    the files it already locked are skipped (see resume_folder).
+    
+    With incremental=True an encrypted lock manifest is kept in the folder.
+    Files unlocked with decrypt_folder(keep_locked=True) that have not
+    changed since are not re-encrypted: their existing .locked copy is kept
+    and only the plaintext is deleted. Files deleted while unlocked have
+    their stale .locked copy removed, as long as it is still the copy the
+    manifest recorded. A run without incremental=True clears the manifest,
+    since the .locked copies it writes are not the recorded ones.
+    
     Args:
         folder_path: Path to the folder to encrypt
         password: Master password for encryption
         callback: Optional callback function(current_file, total_files) for progress updates
-        
+        jobs: Number of worker threads (default: DEFAULT_JOBS)
+        hide_backend: Name of a file_hiding backend (default: platform default)
+        hide_root: Hide only the folder itself instead of every locked file.
+            With a renaming backend (dotprefix) the locked files are hidden
+            instead, so the folder keeps its path.
+        manifest: Optional FolderManifest from scan_folder(folder_path, "lock")
+        incremental: Only encrypt new or changed files (see above)
+        compression: Optional compression codec passed to encrypt_file
+        control: Optional JobControl to pause or cancel the run between
+            chunks and files. Cancelling removes the partial output of the
+            files in progress and leaves their originals in place.
+        progress: Optional progress.ProgressChannel to publish files done,
+            bytes processed, the current file and errors to
+        timings: Optional timing.TimingObserver to report the scan and hide
+            phases, each file's phases and each file's total time to
+        keyring: Optional KeyRing for password to reuse (e.g. a session's),
+            so keys it already derived are not derived again
+        shred_mode: How originals are deleted, one of
+            secure_delete.SHRED_MODES (choose per volume: "trim" on SSDs
+            and copy-on-write filesystems, where overwriting does not
+            reach the old blocks)
+        shred_queue: Optional shred_queue.ShredQueue that deletes the
+            originals in the background, so the run finishes at
+            encryption speed
+        durability: When locked files are synced before their originals
+            are deleted, one of durability.DURABILITY_MODES: after each
+            file, in batches of batch_files files or batch_seconds
+            seconds, or never
+        batch_files: Batch size for durability "batch"
+        batch_seconds: Batch age limit for durability "batch"
+        io_hints: Optional collection of io_hints.IO_HINTS names applied to
+            every file, so a bulk run does not flush the page cache
+    
     Returns:
         Tuple of (success: bool, message: str, files_encrypted: int)
     """
@@ -255,41 +2190,146 @@ def encrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
         if not os.path.isdir(folder_path):
             return False, f"Not a folder: {folder_path}", 0
         
-        # Get all files recursively
-        all_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                # Skip already locked files
-                if not file.endswith('.locked'):
-                    file_path = os.path.join(root, file)
-                    all_files.append(file_path)
+        if shred_mode not in SHRED_MODES:
+            return False, f"Unknown secure delete mode: {shred_mode}", 0
+        
+        if durability not in DURABILITY_MODES:
+            return False, f"Unknown durability mode: {durability}", 0
+        
+        try:
+            io_hints = validate_hints(io_hints)
+        except ValueError as e:
+            return False, str(e), 0
+        
+        # Derive the master key once for the whole folder
+        if keyring is None:
+            keyring = KeyRing(password)
+        
+        # Finish what an interrupted run left half done before scanning.
+        # Its remaining files must be locked with the same password.
+        interrupted = load_journal(folder_path)
+        if interrupted:
+            if not _journal_password_matches(folder_path, interrupted, keyring):
+                return False, "Incorrect password for the interrupted operation on this folder", 0
+            _recover_folder(folder_path, interrupted)
+            manifest = None
+        
+        # Get all files recursively (skipping already locked files),
+        # unless the caller already scanned the folder
+        if manifest is None:
+            with timed(timings, PHASE_SCAN):
+                manifest = scan_folder(folder_path, "lock")
+        all_files = manifest.paths
+        lock_state = load_lock_manifest(folder_path, keyring) if incremental else {}
+        
+        # Remove .locked copies of files that were deleted while unlocked.
+        # A copy that changed since it was recorded is left alone.
+        stale = [key for key, entry in lock_state.items()
+                 if entry.get("unlocked") and not os.path.exists(os.path.join(folder_path, key))]
+        for key in stale:
+            locked_path = os.path.join(folder_path, key) + ".locked"
+            if _is_kept_copy(locked_path, lock_state[key]):
+                try:
+                    os.remove(locked_path)
+                except OSError as e:
+                    print(f"Warning: Could not remove stale locked file: {e}")
+            del lock_state[key]
         
         if not all_files:
+            if stale or not incremental:
+                save_lock_manifest(folder_path, lock_state, keyring)
             return False, "No files found in folder", 0
         
-        # Encrypt each file
-        successful_encryptions = 0
-        failed_files = []
+        file_stats = {entry[0]: (entry[1], entry[2]) for entry in manifest.entries}
+        new_state = dict(lock_state)
+        state_lock = threading.Lock()
         
-        for index, file_path in enumerate(all_files):
+        if progress is not None:
+            progress.begin(len(all_files), manifest.total_bytes)
+        
+        journal = FolderJournal(folder_path, "lock", {
+            "hide_backend": hide_backend,
+            "hide_root": hide_root,
+            "incremental": incremental,
+            "compression": compression,
+            "shred_mode": shred_mode,
+            "durability": durability,
+            "batch_files": batch_files,
+            "batch_seconds": batch_seconds,
+            "io_hints": sorted(io_hints),
+        }, planned=len(all_files))
+        syncer = Durability(durability, batch_files, batch_seconds, timings)
+        
+        def lock_one(file_path):
+            journal.record(file_path, STATE_STARTED)
+            on_written = lambda: journal.record(file_path, STATE_WRITTEN)
+            # Done only once the locked file is synced and the original gone
+            on_done = lambda: journal.record(file_path, STATE_DONE)
+            file_progress = progress.file_callback(file_path) if progress is not None else None
+            
+            if not incremental:
+                return encrypt_file(file_path, password, file_progress, keyring=keyring, chunk_jobs=1,
+                                    compression=compression, on_written=on_written,
+                                    control=control, timings=timings, shred_mode=shred_mode,
+                                    shred_queue=shred_queue, durability=syncer,
+                                    io_hints=io_hints, on_done=on_done)
+            
+            key = _manifest_key(folder_path, file_path)
+            size, mtime = file_stats[file_path]
+            entry = lock_state.get(key)
+            if entry and _is_unchanged(file_path, size, mtime, entry):
+                # The .locked copy is current - only the plaintext has to go
+                on_written()
+                if file_progress:
+                    file_progress(size, size)
+                if not _secure_delete(file_path, shred_mode, timings, shred_queue):
+                    return False
+                on_done()
+            else:
+                content_hash = hashlib.sha256()
+                if not encrypt_file(file_path, password, file_progress, keyring=keyring, chunk_jobs=1,
+                                    content_hash=content_hash, compression=compression,
+                                    on_written=on_written, control=control, timings=timings,
+                                    shred_mode=shred_mode, shred_queue=shred_queue,
+                                    durability=syncer, io_hints=io_hints, on_done=on_done):
+                    return False
+                entry = {"size": size, "mtime": mtime, "sha256": content_hash.hexdigest()}
+            
+            with state_lock:
+                new_state[key] = dict(entry, unlocked=False)
+            return True
+        
+        # Encrypt the files on the worker pool
+        try:
             try:
-                # Update progress callback
-                if callback:
-                    callback(index + 1, len(all_files), os.path.basename(file_path))
-                
-                # Encrypt the file
-                if encrypt_file(file_path, password):
-                    successful_encryptions += 1
-                    # Hide the locked file
-                    locked_path = file_path + ".locked"
-                    hide_file_windows(locked_path)
-                else:
-                    failed_files.append(os.path.basename(file_path))
-            except Exception as e:
-                print(f"Error encrypting {file_path}: {e}")
-                failed_files.append(os.path.basename(file_path))
+                successful_encryptions, failed_files = _run_parallel(lock_one, all_files, jobs, callback, control,
+                                                                     progress, timings)
+            finally:
+                # Originals of the last batch are deleted once it is synced
+                syncer.flush()
+        except BaseException:
+            # Keep the journal so the run can be resumed
+            journal.close()
+            raise
+        journal.finish()
+        
+        # A plain lock rewrites .locked copies the manifest may describe
+        save_lock_manifest(folder_path, new_state if incremental else {}, keyring)
+        
+        # Hide the locked files (or just the folder) in one batch. Renaming
+        # the folder itself would move it away from the caller's path.
+        backend = get_hide_backend(hide_backend)
+        with timed(timings, PHASE_HIDE):
+            if hide_root and not backend.renames:
+                backend.hide_many([folder_path])
+            else:
+                locked_paths = [path + ".locked" for path in all_files if os.path.exists(path + ".locked")]
+                backend.hide_many(locked_paths)
         
         # Prepare message
+        if control is not None and control.cancelled:
+            message = f"Cancelled after locking {successful_encryptions}/{len(all_files)} files"
+            return False, message, successful_encryptions
         if successful_encryptions == len(all_files):
             message = f"Successfully locked {successful_encryptions} file(s) in folder"
             return True, message, successful_encryptions
@@ -301,21 +2341,56 @@ def encrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
         else:
             message = f"Failed to lock any files. Errors: {', '.join(failed_files[:5])}"
             return False, message, 0
-            
+    
     except Exception as e:
         print(f"Folder encryption error: {e}")
         return False, f"Error: {str(e)}", 0
 
 
-def decrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
+def decrypt_folder(folder_path: str, password: str, callback=None, jobs: int = None,
+                   hide_backend: str = None, manifest=None, keep_locked: bool = False,
+                   control=None, progress=None, timings=None, keyring=None,
+                   durability: str = DEFAULT_DURABILITY, batch_files: int = DEFAULT_BATCH_FILES,
+                   batch_seconds: float = DEFAULT_BATCH_SECONDS, io_hints=None) -> tuple:
     """
     Decrypt all .locked files in a folder recursively.
     
+    The locked files (and the folder) are unhidden in one batch, then
+    decrypted in parallel on a pool of worker threads.
+    
+    Progress is recorded in a journal (see journal.py). If a previous run
+    was interrupted, the files it was working on are recovered first and
+    the files it already unlocked are skipped (see resume_folder).
+    
+    With keep_locked=True the .locked copies stay in place and the size,
+    mtime and hash of each unlocked file are recorded in the lock manifest,
+    so a later encrypt_folder(incremental=True) only re-encrypts the files
+    that changed.
+    
     Args:
         folder_path: Path to the folder containing locked files
         password: Master password for decryption
         callback: Optional callback function(current_file, total_files) for progress updates
-        
+        jobs: Number of worker threads (default: DEFAULT_JOBS)
+        hide_backend: Name of the file_hiding backend used when locking
+        manifest: Optional FolderManifest from scan_folder(folder_path, "unlock")
+        keep_locked: Keep the .locked files for an incremental re-lock
+        control: Optional JobControl to pause or cancel the run between
+            chunks and files
+        progress: Optional progress.ProgressChannel to publish files done,
+            bytes processed (of the locked files), the current file and errors to
+        timings: Optional timing.TimingObserver to report the scan, key
+            check and unhide phases, each file's phases and each file's
+            total time to
+        keyring: Optional KeyRing for password to reuse (e.g. a session's),
+            so keys it already derived are not derived again
+        durability: When unlocked files are synced before their locked
+            files are deleted (see encrypt_folder)
+        batch_files: Batch size for durability "batch"
+        batch_seconds: Batch age limit for durability "batch"
+        io_hints: Optional collection of io_hints.IO_HINTS names (see
+            encrypt_folder)
+    
     Returns:
         Tuple of (success: bool, message: str, files_decrypted: int)
     """
@@ -327,40 +2402,127 @@ def decrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
         if not os.path.isdir(folder_path):
             return False, f"Not a folder: {folder_path}", 0
         
-        # Get all .locked files recursively
-        locked_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.locked'):
-                    file_path = os.path.join(root, file)
-                    locked_files.append(file_path)
+        if durability not in DURABILITY_MODES:
+            return False, f"Unknown durability mode: {durability}", 0
+        
+        try:
+            io_hints = validate_hints(io_hints)
+        except ValueError as e:
+            return False, str(e), 0
+        
+        # Master keys are derived once per salt, not once per file
+        if keyring is None:
+            keyring = KeyRing(password)
+        
+        # Finish what an interrupted run left half done before scanning,
+        # but only with the password it ran with
+        interrupted = load_journal(folder_path)
+        if interrupted:
+            if not _journal_password_matches(folder_path, interrupted, keyring):
+                return False, "Incorrect password for the interrupted operation on this folder", 0
+            _recover_folder(folder_path, interrupted)
+            manifest = None
+        
+        # Get all .locked files recursively, unless the caller already
+        # scanned the folder
+        if manifest is None:
+            with timed(timings, PHASE_SCAN):
+                manifest = scan_folder(folder_path, "unlock")
+        locked_files = manifest.paths
         
         if not locked_files:
             return False, "No locked files found in folder", 0
         
-        # Decrypt each file
-        successful_decryptions = 0
-        failed_files = []
+        # Check the password against the first file that carries a key check
+        # value, so a wrong password aborts before any file is touched
+        with timed(timings, PHASE_KDF):
+            for locked_file_path in locked_files:
+                try:
+                    matches = verify_file_key(locked_file_path, password, keyring)
+                except OSError:
+                    continue
+                if matches is False:
+                    return False, "Incorrect password for the locked files in this folder", 0
+                if matches:
+                    break
         
-        for index, locked_file_path in enumerate(locked_files):
-            try:
-                # Unhide file first
-                unhide_file_windows(locked_file_path)
-                
-                # Update progress callback
-                if callback:
-                    callback(index + 1, len(locked_files), os.path.basename(locked_file_path))
-                
-                # Decrypt the file
-                if decrypt_file(locked_file_path, password):
-                    successful_decryptions += 1
+        # Unhide the folder and the files first, in one batch. Renaming
+        # backends never hide the folder and give the files back their
+        # original names.
+        backend = get_hide_backend(hide_backend)
+        with timed(timings, PHASE_HIDE):
+            if not backend.renames:
+                backend.unhide_many([folder_path])
+            unhidden = backend.unhide_many(locked_files)
+        locked_files = [new or old for new, old in zip(unhidden, locked_files)]
+        
+        lock_state = load_lock_manifest(folder_path, keyring)
+        state_lock = threading.Lock()
+        
+        if progress is not None:
+            progress.begin(len(locked_files), manifest.total_bytes)
+        
+        journal = FolderJournal(folder_path, "unlock", {
+            "hide_backend": hide_backend,
+            "keep_locked": keep_locked,
+            "durability": durability,
+            "batch_files": batch_files,
+            "batch_seconds": batch_seconds,
+            "io_hints": sorted(io_hints),
+        }, planned=len(locked_files))
+        syncer = Durability(durability, batch_files, batch_seconds, timings)
+        
+        def unlock_one(locked_file_path):
+            journal.record(locked_file_path, STATE_STARTED)
+            content_hash = hashlib.sha256() if keep_locked else None
+            file_progress = progress.file_callback(locked_file_path) if progress is not None else None
+            if not decrypt_file(locked_file_path, password, progress_callback=file_progress,
+                                keyring=keyring, chunk_jobs=1,
+                                content_hash=content_hash, keep_locked=keep_locked,
+                                on_written=lambda: journal.record(locked_file_path, STATE_WRITTEN),
+                                control=control, timings=timings, durability=syncer,
+                                io_hints=io_hints,
+                                on_done=lambda: journal.record(locked_file_path, STATE_DONE)):
+                return False
+            
+            # Record what was unlocked for the next incremental lock
+            file_path = locked_file_path[:-len('.locked')]
+            key = _manifest_key(folder_path, file_path)
+            with state_lock:
+                if keep_locked:
+                    info = os.stat(file_path)
+                    locked_info = os.stat(locked_file_path)
+                    lock_state[key] = {
+                        "size": info.st_size,
+                        "mtime": info.st_mtime,
+                        "sha256": content_hash.hexdigest(),
+                        "unlocked": True,
+                        "locked_size": locked_info.st_size,
+                        "locked_mtime": locked_info.st_mtime,
+                    }
                 else:
-                    failed_files.append(os.path.basename(locked_file_path))
-            except Exception as e:
-                print(f"Error decrypting {locked_file_path}: {e}")
-                failed_files.append(os.path.basename(locked_file_path))
+                    lock_state.pop(key, None)
+            return True
+        
+        # Decrypt the files on the worker pool
+        try:
+            try:
+                successful_decryptions, failed_files = _run_parallel(unlock_one, locked_files, jobs, callback,
+                                                                     control, progress, timings)
+            finally:
+                # Locked files of the last batch are deleted once it is synced
+                syncer.flush()
+        except BaseException:
+            # Keep the journal so the run can be resumed
+            journal.close()
+            raise
+        journal.finish()
+        save_lock_manifest(folder_path, lock_state, keyring)
         
         # Prepare message
+        if control is not None and control.cancelled:
+            message = f"Cancelled after unlocking {successful_decryptions}/{len(locked_files)} files"
+            return False, message, successful_decryptions
         if successful_decryptions == len(locked_files):
             message = f"Successfully unlocked {successful_decryptions} file(s) in folder"
             return True, message, successful_decryptions
@@ -372,7 +2534,7 @@ def decrypt_folder(folder_path: str, password: str, callback=None) -> tuple:
         else:
             message = f"Failed to unlock any files. Errors: {', '.join(failed_files[:5])}"
             return False, message, 0
-            
+    
     except Exception as e:
         print(f"Folder decryption error: {e}")
         return False, f"Error: {str(e)}", 0
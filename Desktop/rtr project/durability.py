@@ -0,0 +1,161 @@
+"""
+durability.py - Output Durability Module
+Publishes finished output files from a temporary name with os.replace and
+decides when they are synced to disk: after every file, in batches, or never
+"""
+
+import os
+import threading
+import time
+
+from timing import timed, PHASE_SYNC
+
+# Durability modes
+#   file:  fsync each output and its folder before it replaces the final
+#          name, then delete the source
+#   batch: publish at once, fsync the outputs every batch_files files or
+#          batch_seconds seconds and only then delete their sources
+#   none:  publish at once and delete the source, never fsync
+DURABILITY_FILE = "file"
+DURABILITY_BATCH = "batch"
+DURABILITY_NONE = "none"
+DURABILITY_MODES = (DURABILITY_FILE, DURABILITY_BATCH, DURABILITY_NONE)
+DEFAULT_DURABILITY = DURABILITY_FILE
+
+# Batch limits for DURABILITY_BATCH
+DEFAULT_BATCH_FILES = 64
+DEFAULT_BATCH_SECONDS = 2.0
+
+# Outputs are written under this prefix in the final folder. It starts with
+# crypto_utils.METADATA_PREFIX, so folder scans skip half-written outputs.
+TEMP_PREFIX = ".sfl_tmp_"
+
+
+def temp_path_for(final_path: str) -> str:
+    """Return the temporary path an output is written to before publishing."""
+    directory, name = os.path.split(final_path)
+    return os.path.join(directory, TEMP_PREFIX + name)
+
+
+def _fsync_file(path: str) -> None:
+    # Windows needs a handle with write access to flush a file
+    with open(path, 'r+b') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: str) -> None:
+    """Make a rename in a folder durable (a no-op on Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    """
+    Publishes outputs and runs what depends on them being safe on disk.
+    
+    Writers produce each output at temp_path_for(final_path) and hand it to
+    publish() with a callback that deletes the source. A killed process
+    never leaves a half-written file under the final name, and the callback
+    only runs once the output is as durable as the mode promises, so the
+    source is never removed before its replacement can survive a power loss
+    (except in DURABILITY_NONE).
+    
+    One instance is shared by the workers of a folder job, whose owner
+    calls flush() when the job ends. Safe to share between threads.
+    """
+    
+    def __init__(self, mode: str = DEFAULT_DURABILITY, batch_files: int = DEFAULT_BATCH_FILES,
+                 batch_seconds: float = DEFAULT_BATCH_SECONDS, timings=None):
+        """
+        Args:
+            mode: One of DURABILITY_MODES
+            batch_files: DURABILITY_BATCH syncs after this many outputs
+            batch_seconds: ... or when the oldest unsynced output is this old
+            timings: Optional timing.TimingObserver told how long each
+                output took to sync (phase "sync")
+        
+        Raises:
+            ValueError: If mode is unknown
+        """
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.mode = mode
+        self.batch_files = max(1, batch_files)
+        self.batch_seconds = batch_seconds
+        self.timings = timings
+        self._lock = threading.Lock()
+        self._pending = []
+        self._batch_start = None
+    
+    def publish(self, temp_path: str, final_path: str, on_durable=None) -> None:
+        """
+        Move a finished output to its final name.
+        
+        Args:
+            temp_path: Complete output file (see temp_path_for)
+            final_path: Name to publish it under (replaced if it exists)
+            on_durable: Optional callback() run once the output is durable
+                enough to delete its source; with DURABILITY_BATCH it may
+                run later, from the thread that completes the batch
+        
+        Raises:
+            OSError: If the output could not be synced or renamed (the
+                callback is not run)
+        """
+        if self.mode == DURABILITY_FILE:
+            with timed(self.timings, PHASE_SYNC, final_path):
+                _fsync_file(temp_path)
+                os.replace(temp_path, final_path)
+                _fsync_dir(os.path.dirname(final_path))
+        else:
+            os.replace(temp_path, final_path)
+        
+        if self.mode != DURABILITY_BATCH:
+            if on_durable:
+                on_durable()
+            return
+        
+        with self._lock:
+            if not self._pending:
+                self._batch_start = time.monotonic()
+            self._pending.append((final_path, on_durable))
+            full = (len(self._pending) >= self.batch_files or
+                    time.monotonic() - self._batch_start >= self.batch_seconds)
+        if full:
+            self.flush()
+    
+    def flush(self) -> None:
+        """
+        Sync every output published since the last flush, then run their
+        callbacks. Outputs that fail to sync keep their sources.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        
+        synced = []
+        for final_path, on_durable in pending:
+            try:
+                with timed(self.timings, PHASE_SYNC, final_path):
+                    _fsync_file(final_path)
+                synced.append((final_path, on_durable))
+            except OSError as e:
+                print(f"Warning: Could not sync {final_path}, keeping its source: {e}")
+        for directory in {os.path.dirname(path) for path, _ in synced}:
+            try:
+                _fsync_dir(directory)
+            except OSError as e:
+                print(f"Warning: Could not sync folder {directory}: {e}")
+        
+        for final_path, on_durable in synced:
+            if on_durable:
+                try:
+                    on_durable()
+                except Exception as e:
+                    print(f"Warning: Could not finish {final_path}: {e}")
@@ -0,0 +1,204 @@
+"""
+file_hiding.py - File Hiding Module
+Hides and unhides locked files without spawning a process per file
+Backends: Windows attributes, BSD/macOS chflags, dot-prefix rename, no-op
+"""
+
+import abc
+import os
+import stat
+import sys
+
+# Windows file attribute flags (see SetFileAttributesW)
+FILE_ATTRIBUTE_HIDDEN = 0x2
+FILE_ATTRIBUTE_NORMAL = 0x80
+INVALID_FILE_ATTRIBUTES = 0xFFFFFFFF
+
+# Prefix added by the dot-prefix backend. It is longer than a plain "." so
+# files that were already dotfiles are not renamed on unhide.
+DOT_PREFIX = ".sfl."
+
+
+class HideBackend(abc.ABC):
+    """
+    Base class for file hiding backends.
+    
+    hide() and unhide() return the path of the file afterwards (backends that
+    rename files return the new path) or None on failure. The *_many methods
+    process a whole list in one call. Backends with renames = True move the
+    file, so a caller that must keep a path (e.g. a folder the user picked)
+    should not hide it with them.
+    """
+    
+    name = "base"
+    renames = False
+    
+    @abc.abstractmethod
+    def hide(self, path: str):
+        """Hide path and return its path afterwards, or None on failure."""
+    
+    @abc.abstractmethod
+    def unhide(self, path: str):
+        """Unhide path and return its path afterwards, or None on failure."""
+    
+    def hide_many(self, paths: list) -> list:
+        """
+        Hide every path in the list.
+        
+        Args:
+            paths: Paths to hide
+        
+        Returns:
+            List with the new path (or None on failure) for each input path
+        """
+        return [self._safe(self.hide, path) for path in paths]
+    
+    def unhide_many(self, paths: list) -> list:
+        """
+        Unhide every path in the list.
+        
+        Args:
+            paths: Paths to unhide
+        
+        Returns:
+            List with the new path (or None on failure) for each input path
+        """
+        return [self._safe(self.unhide, path) for path in paths]
+    
+    @staticmethod
+    def _safe(func, path):
+        try:
+            return func(path)
+        except OSError:
+            return None
+
+
+class WindowsHideBackend(HideBackend):
+    """Sets the hidden attribute directly with SetFileAttributesW."""
+    
+    name = "windows"
+    
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._get_attributes = kernel32.GetFileAttributesW
+        self._get_attributes.argtypes = [wintypes.LPCWSTR]
+        self._get_attributes.restype = wintypes.DWORD
+        self._set_attributes = kernel32.SetFileAttributesW
+        self._set_attributes.argtypes = [wintypes.LPCWSTR, wintypes.DWORD]
+        self._set_attributes.restype = wintypes.BOOL
+    
+    def _update(self, path: str, hidden: bool):
+        attributes = self._get_attributes(path)
+        if attributes == INVALID_FILE_ATTRIBUTES:
+            return None
+        
+        if hidden:
+            new_attributes = attributes | FILE_ATTRIBUTE_HIDDEN
+        else:
+            # FILE_ATTRIBUTE_NORMAL is only valid on its own
+            new_attributes = (attributes & ~FILE_ATTRIBUTE_HIDDEN) or FILE_ATTRIBUTE_NORMAL
+        
+        if new_attributes != attributes and not self._set_attributes(path, new_attributes):
+            return None
+        return path
+    
+    def hide(self, path: str):
+        return self._update(path, True)
+    
+    def unhide(self, path: str):
+        return self._update(path, False)
+
+
+class ChflagsHideBackend(HideBackend):
+    """Sets the UF_HIDDEN flag with os.chflags (macOS and BSD)."""
+    
+    name = "chflags"
+    
+    def hide(self, path: str):
+        flags = os.lstat(path).st_flags
+        if not flags & stat.UF_HIDDEN:
+            os.chflags(path, flags | stat.UF_HIDDEN, follow_symlinks=False)
+        return path
+    
+    def unhide(self, path: str):
+        flags = os.lstat(path).st_flags
+        if flags & stat.UF_HIDDEN:
+            os.chflags(path, flags & ~stat.UF_HIDDEN, follow_symlinks=False)
+        return path
+
+
+class DotPrefixHideBackend(HideBackend):
+    """Hides files on POSIX by renaming them with a DOT_PREFIX name."""
+    
+    name = "dotprefix"
+    renames = True
+    
+    def hide(self, path: str):
+        directory, name = os.path.split(path)
+        if name.startswith(DOT_PREFIX):
+            return path
+        hidden_path = os.path.join(directory, DOT_PREFIX + name)
+        os.replace(path, hidden_path)
+        return hidden_path
+    
+    def unhide(self, path: str):
+        directory, name = os.path.split(path)
+        if not name.startswith(DOT_PREFIX):
+            return path
+        visible_path = os.path.join(directory, name[len(DOT_PREFIX):])
+        os.replace(path, visible_path)
+        return visible_path
+
+
+class NoopHideBackend(HideBackend):
+    """Leaves files visible. hide() reports failure so callers can tell the user."""
+    
+    name = "none"
+    
+    def hide(self, path: str):
+        return None
+    
+    def unhide(self, path: str):
+        return path
+
+
+# Backends selectable by name
+HIDE_BACKENDS = {
+    WindowsHideBackend.name: WindowsHideBackend,
+    ChflagsHideBackend.name: ChflagsHideBackend,
+    DotPrefixHideBackend.name: DotPrefixHideBackend,
+    NoopHideBackend.name: NoopHideBackend,
+}
+
+_default_backend = None
+
+
+def get_hide_backend(name: str = None) -> HideBackend:
+    """
+    Return a file hiding backend.
+    
+    Args:
+        name: Backend name from HIDE_BACKENDS, or None / "auto" for the
+            platform default (Windows attributes, chflags, otherwise no-op)
+    
+    Returns:
+        HideBackend instance
+    """
+    global _default_backend
+    
+    if name and name != "auto":
+        if name not in HIDE_BACKENDS:
+            raise ValueError(f"Unknown hide backend: {name}")
+        return HIDE_BACKENDS[name]()
+    
+    if _default_backend is None:
+        if sys.platform == "win32":
+            _default_backend = WindowsHideBackend()
+        elif hasattr(os, "chflags") and hasattr(stat, "UF_HIDDEN"):
+            _default_backend = ChflagsHideBackend()
+        else:
+            _default_backend = NoopHideBackend()
+    return _default_backend
@@ -0,0 +1,134 @@
+"""
+journal.py - Folder Operation Journal Module
+Append-only record of an encrypt_folder / decrypt_folder run, so an
+interrupted run can be recovered and resumed instead of restarted
+"""
+
+import json
+import os
+import threading
+
+# Journal file at the root of the folder. It starts with
+# crypto_utils.METADATA_PREFIX, so folder scans skip it.
+JOURNAL_NAME = ".sfl_journal"
+
+# Per-file states, in order. "written" means the output file is complete
+# and only the source still has to be removed.
+STATE_STARTED = "started"
+STATE_WRITTEN = "written"
+STATE_DONE = "done"
+
+
+class FolderJournal:
+    """
+    Append-only JSON lines journal for one folder operation.
+    
+    The first line records the operation, its options and the number of
+    planned files. Each file then gets a line per state change, keyed by its
+    path relative to the folder. The journal is deleted when the operation
+    finishes, so a journal left on disk means the run was interrupted.
+    
+    Lines are flushed as they are written, so they survive the application
+    being closed or killed mid-run.
+    """
+    
+    def __init__(self, folder_path: str, operation: str, options: dict = None, planned: int = 0):
+        """
+        Start a new journal, replacing any previous one.
+        
+        Args:
+            folder_path: Root of the folder being processed
+            operation: "lock" or "unlock"
+            options: Keyword options needed to resume the operation
+            planned: Number of files the operation will process
+        """
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, JOURNAL_NAME)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._append({"op": operation, "options": options or {}, "planned": planned})
+        os.fsync(self._file.fileno())
+    
+    def _append(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+    
+    def record(self, file_path: str, state: str) -> None:
+        """
+        Record a state change for one file.
+        
+        Args:
+            file_path: Path of the source file being processed
+            state: STATE_STARTED, STATE_WRITTEN or STATE_DONE
+        """
+        name = os.path.relpath(file_path, self.folder_path).replace(os.sep, '/')
+        with self._lock:
+            self._append({"file": name, "state": state})
+    
+    def finish(self) -> None:
+        """Close the journal and delete it: the operation completed."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            print(f"Warning: Could not remove journal: {e}")
+    
+    def close(self) -> None:
+        """Close the journal but keep it on disk (the operation did not finish)."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_journal(folder_path: str):
+    """
+    Read the journal of an interrupted folder operation.
+    
+    A line cut short by a crash is ignored.
+    
+    Args:
+        folder_path: Root of the folder
+    
+    Returns:
+        Dictionary with "op", "options", "planned" and "files" (relative
+        path -> last recorded state), or None if there is no journal
+    """
+    journal_path = os.path.join(folder_path, JOURNAL_NAME)
+    if not os.path.exists(journal_path):
+        return None
+    
+    journal = None
+    files = {}
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if journal is None:
+                if "op" not in record:
+                    return None
+                journal = record
+            elif "file" in record:
+                files[record["file"]] = record.get("state")
+    
+    if journal is None:
+        return None
+    journal["files"] = files
+    return journal
+
+
+def remove_journal(folder_path: str) -> None:
+    """Delete a folder's journal once it has been recovered."""
+    journal_path = os.path.join(folder_path, JOURNAL_NAME)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+def pending_operation(folder_path: str):
+    """
+    Return the operation ("lock" or "unlock") an interrupted run left
+    behind in a folder, or None.
+    """
+    journal = load_journal(folder_path)
+    return journal["op"] if journal else None
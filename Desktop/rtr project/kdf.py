@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+kdf.py - Key Derivation Module
+Pluggable password-based key derivation (PBKDF2, scrypt, Argon2id) with
+parameters that are stored next to every hash and in every file header,
+plus a calibration routine that picks the cost for a target latency
+
+Usage:
+    python kdf.py [--kdf NAME] [--target-ms MS]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Argon2 is optional (pip install argon2-cffi)
+try:
+    from argon2.low_level import hash_secret_raw, Type as Argon2Type
+except ImportError:
+    hash_secret_raw = None
+
+KDF_PBKDF2 = "pbkdf2-sha256"
+KDF_SCRYPT = "scrypt"
+KDF_ARGON2 = "argon2id"
+
+# The parameters every hash and file used before they were stored. Files
+# and hash files without a "kdf" field are read with these.
+LEGACY_PARAMS = {"name": KDF_PBKDF2, "iterations": 100000}
+
+# Used where parameters are needed without measuring this machine, e.g.
+# files locked with a plain password rather than the key store
+DEFAULT_PARAMS = LEGACY_PARAMS
+
+# KDF that new master passwords and key stores are calibrated for
+DEFAULT_KDF = KDF_PBKDF2
+
+# Latency calibrate() aims for by default (seconds per derivation)
+DEFAULT_TARGET_SECONDS = 0.25
+
+# Calibration never goes below these, so a slow machine does not end up
+# weaker than the legacy setting
+MIN_PBKDF2_ITERATIONS = 100000
+MIN_SCRYPT_N = 2 ** 14
+MIN_ARGON2_MEMORY_KIB = 19 * 1024
+
+# Upper limits for parameters read from headers, so a crafted file cannot
+# make a derivation run for hours or exhaust memory
+MAX_PBKDF2_ITERATIONS = 50000000
+MAX_SCRYPT_N = 2 ** 20
+MAX_ARGON2_TIME_COST = 100
+
+# Memory one derivation may use. scrypt needs 128 * n * r bytes, so n and
+# r are capped together (n = 2**20 with the default r = 8 is the limit).
+MAX_KDF_MEMORY = 1024 * 1024 * 1024
+MAX_ARGON2_MEMORY_KIB = MAX_KDF_MEMORY // 1024
+
+# Starting points for calibration
+SCRYPT_R = 8
+SCRYPT_P = 1
+ARGON2_MEMORY_KIB = 64 * 1024
+ARGON2_PARALLELISM = min(4, os.cpu_count() or 1)
+
+
+def available_kdfs() -> list:
+    """Return the names of the KDFs usable on this machine."""
+    names = [KDF_PBKDF2]
+    if hasattr(hashlib, "scrypt"):
+        names.append(KDF_SCRYPT)
+    if hash_secret_raw is not None:
+        names.append(KDF_ARGON2)
+    return names
+
+
+def _int_param(params: dict, key: str, low: int, high: int) -> int:
+    value = params.get(key)
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise ValueError(f"Invalid {params.get('name')} parameter {key}: {value!r}")
+    return value
+
+
+def validate(params: dict) -> dict:
+    """
+    Check KDF parameters (e.g. from a file header) before using them.
+    
+    Returns:
+        The parameters
+    
+    Raises:
+        ValueError: If the KDF is unknown, unavailable or the costs are out of range
+    """
+    if not isinstance(params, dict):
+        raise ValueError("Invalid KDF parameters")
+    name = params.get("name")
+    if name == KDF_PBKDF2:
+        _int_param(params, "iterations", 1000, MAX_PBKDF2_ITERATIONS)
+    elif name == KDF_SCRYPT:
+        n = _int_param(params, "n", 2, MAX_SCRYPT_N)
+        if n & (n - 1):
+            raise ValueError("scrypt parameter n must be a power of 2")
+        r = _int_param(params, "r", 1, 32)
+        _int_param(params, "p", 1, 16)
+        if 128 * n * r > MAX_KDF_MEMORY:
+            raise ValueError(f"scrypt parameters need more than {MAX_KDF_MEMORY // 2 ** 20} MiB")
+    elif name == KDF_ARGON2:
+        _int_param(params, "time_cost", 1, MAX_ARGON2_TIME_COST)
+        _int_param(params, "memory_kib", 8, MAX_ARGON2_MEMORY_KIB)
+        _int_param(params, "parallelism", 1, 64)
+    else:
+        raise ValueError(f"Unknown KDF: {name!r}")
+    if name not in available_kdfs():
+        raise ValueError(f"KDF {name} is not available (install argon2-cffi)")
+    return params
+
+
+def params_id(params: dict) -> str:
+    """Canonical string for a parameter set, usable as a cache key."""
+    return json.dumps(params, sort_keys=True)
+
+
+def derive(password, salt: bytes, params: dict = None, length: int = 32) -> bytes:
+    """
+    Derive a key from a password.
+    
+    Args:
+        password: Password as str or bytes
+        salt: Random salt
+        params: KDF parameters (default: LEGACY_PARAMS)
+        length: Key length in bytes
+    
+    Returns:
+        The derived key
+    
+    Raises:
+        ValueError: If the parameters are invalid
+    """
+    params = validate(params or LEGACY_PARAMS)
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    
+    name = params["name"]
+    if name == KDF_PBKDF2:
+        # OpenSSL's PBKDF2 through hashlib
+        return hashlib.pbkdf2_hmac('sha256', password, salt, params["iterations"], length)
+    if name == KDF_SCRYPT:
+        n, r, p = params["n"], params["r"], params["p"]
+        maxmem = 2 * 128 * r * (n + p + 2)
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=length)
+    return hash_secret_raw(
+        password, salt,
+        time_cost=params["time_cost"],
+        memory_cost=params["memory_kib"],
+        parallelism=params["parallelism"],
+        hash_len=length,
+        type=Argon2Type.ID
+    )
+
+
+def measure(params: dict) -> float:
+    """Return the seconds one derivation with params takes on this machine."""
+    start = time.perf_counter()
+    derive(b"calibration", os.urandom(16), params)
+    return time.perf_counter() - start
+
+
+def calibrate(name: str = KDF_PBKDF2, target_seconds: float = DEFAULT_TARGET_SECONDS) -> dict:
+    """
+    Pick parameters for which one derivation takes about target_seconds here.
+    
+    PBKDF2 scales its iterations, scrypt its n (a power of 2; memory grows
+    with it) and Argon2id its passes over a fixed memory size. The result is
+    never weaker than the MIN_* floors.
+    
+    Args:
+        name: KDF_PBKDF2, KDF_SCRYPT or KDF_ARGON2
+        target_seconds: Wanted time per derivation
+    
+    Returns:
+        Parameter dictionary to store with hashes and files
+    
+    Raises:
+        ValueError: If the KDF is unknown or not available
+    """
+    if name not in available_kdfs():
+        raise ValueError(f"KDF {name} is not available")
+    
+    if name == KDF_PBKDF2:
+        iterations = 20000
+        elapsed = measure({"name": name, "iterations": iterations})
+        # Measure long enough for the timer to be meaningful
+        while elapsed < 0.02:
+            iterations *= 4
+            elapsed = measure({"name": name, "iterations": iterations})
+        iterations = int(iterations * target_seconds / elapsed) // 1000 * 1000
+        iterations = min(max(iterations, MIN_PBKDF2_ITERATIONS), MAX_PBKDF2_ITERATIONS)
+        return {"name": name, "iterations": iterations}
+    
+    if name == KDF_SCRYPT:
+        # Cost is linear in n: double it while the next step stays in budget
+        n = MIN_SCRYPT_N
+        params = {"name": name, "n": n, "r": SCRYPT_R, "p": SCRYPT_P}
+        elapsed = measure(params)
+        while n < MAX_SCRYPT_N and elapsed * 2 <= target_seconds * 1.25:
+            n *= 2
+            elapsed *= 2
+        params["n"] = n
+        return params
+    
+    memory_kib = ARGON2_MEMORY_KIB
+    params = {"name": name, "time_cost": 1, "memory_kib": memory_kib, "parallelism": ARGON2_PARALLELISM}
+    elapsed = measure(params)
+    # One pass over the memory is already too slow: use less memory
+    while elapsed > target_seconds and memory_kib // 2 >= MIN_ARGON2_MEMORY_KIB:
+        memory_kib //= 2
+        params["memory_kib"] = memory_kib
+        elapsed = measure(params)
+    params["time_cost"] = min(max(1, int(target_seconds / elapsed)), MAX_ARGON2_TIME_COST)
+    return params
+
+
+_calibrated = None
+_calibrated_lock = threading.Lock()
+
+
+def default_params() -> dict:
+    """
+    Return DEFAULT_KDF parameters calibrated for DEFAULT_TARGET_SECONDS here.
+    
+    Used for new master passwords and key stores. The measurement runs once
+    per process and takes about a second, so UI code should call this from
+    a worker thread.
+    
+    Returns:
+        Parameter dictionary (a copy the caller may keep)
+    """
+    global _calibrated
+    with _calibrated_lock:
+        if _calibrated is None:
+            _calibrated = calibrate(DEFAULT_KDF)
+        return dict(_calibrated)
+
+
+def main(argv=None) -> int:
+    """Print calibrated parameters for this machine."""
+    parser = argparse.ArgumentParser(prog="kdf", description="Calibrate the key derivation cost")
+    parser.add_argument("--kdf", choices=[KDF_PBKDF2, KDF_SCRYPT, KDF_ARGON2], default=KDF_PBKDF2)
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_SECONDS * 1000)
+    args = parser.parse_args(argv)
+    
+    print(f"Available: {', '.join(available_kdfs())}")
+    try:
+        params = calibrate(args.kdf, args.target_ms / 1000)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Calibrated: {json.dumps(params)}")
+    print(f"Measured: {measure(params) * 1000:.0f} ms per derivation")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+"""
+keystore.py - Key Store Module
+Envelope encryption for the master key: files are keyed from a random
+data-encryption key (DEK) that is stored wrapped by a password-derived
+key-encryption key (KEK), so changing the password only re-wraps the DEK
+"""
+
+import json
+import os
+import threading
+
+import kdf
+
+# Key store next to the password hash file
+KEYSTORE_FILE = "master_key.store"
+
+KEYSTORE_VERSION = 1
+
+# Context bound to the wrapped key and the legacy keys
+WRAP_CONTEXT = b"secure-file-locker key store v1"
+
+
+class MasterKey:
+    """
+    The unwrapped contents of a key store.
+    
+    Attributes:
+        key_id: Short hex id recorded in the header of every file keyed
+            from data_key
+        data_key: 32-byte data-encryption key
+        legacy_keys: Master keys of files locked before the key store
+            existed (they are keyed from the password), by legacy_key_id().
+            Only the derived keys are kept, never the password.
+        path: Key store file the legacy keys are saved to
+    """
+    
+    def __init__(self, key_id: str, data_key: bytes, legacy_keys: dict = None,
+                 path: str = KEYSTORE_FILE):
+        self.key_id = key_id
+        self.data_key = data_key
+        self.legacy_keys = dict(legacy_keys or {})
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def legacy_key(self, salt: bytes, kdf_params: dict = None):
+        """
+        Return the recorded master key for a password-keyed file.
+        
+        Args:
+            salt: Salt stored in the locked file
+            kdf_params: KDF parameters stored in the locked file (default:
+                kdf.LEGACY_PARAMS)
+        
+        Returns:
+            32-byte key, or None if none was recorded for this salt
+        """
+        with self._lock:
+            key = self.legacy_keys.get(legacy_key_id(salt, kdf_params))
+        return bytes.fromhex(key) if key is not None else None
+    
+    def remember_legacy_key(self, salt: bytes, kdf_params: dict, key: bytes) -> None:
+        """
+        Record the master key of a password-keyed file in the key store.
+        
+        Called when such a file is opened with the password it was locked
+        with, so it still opens after that password is changed.
+        """
+        entry_id = legacy_key_id(salt, kdf_params)
+        with self._lock:
+            if self.legacy_keys.get(entry_id) == key.hex():
+                return
+            self.legacy_keys[entry_id] = key.hex()
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                record["legacy_keys"] = _seal(self.data_key, json.dumps(self.legacy_keys).encode('utf-8'))
+                _write_record(self.path, record)
+
+
+def legacy_key_id(salt: bytes, kdf_params: dict = None) -> str:
+    """Identify a password-derived master key by its salt and KDF parameters."""
+    return f"{salt.hex()}:{kdf.params_id(kdf_params or kdf.LEGACY_PARAMS)}"
+
+
+def _seal(key: bytes, plaintext: bytes) -> dict:
+    # Loaded on first use so importing this module (from auth) stays cheap
+    from Crypto.Cipher import AES
+    nonce = os.urandom(12)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(WRAP_CONTEXT)
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+    return {"nonce": nonce.hex(), "data": ciphertext.hex(), "tag": tag.hex()}
+
+
+def _open(key: bytes, sealed: dict) -> bytes:
+    """Raises ValueError if the key is wrong or the data was modified."""
+    from Crypto.Cipher import AES
+    cipher = AES.new(key, AES.MODE_GCM, nonce=bytes.fromhex(sealed["nonce"]))
+    cipher.update(WRAP_CONTEXT)
+    return cipher.decrypt_and_verify(bytes.fromhex(sealed["data"]), bytes.fromhex(sealed["tag"]))
+
+
+def keystore_exists(path: str = KEYSTORE_FILE) -> bool:
+    """Return True if a key store file exists."""
+    return os.path.exists(path)
+
+
+def _write_record(path: str, record: dict) -> None:
+    # Write a new file and swap it in, so a crash never leaves half a key store
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _write(path: str, master_key: MasterKey, password: str, kdf_params: dict) -> None:
+    """Wrap master_key with a KEK derived from password and write the key store."""
+    salt = os.urandom(16)
+    kek = kdf.derive(password, salt, kdf_params)
+    record = {
+        "version": KEYSTORE_VERSION,
+        "kid": master_key.key_id,
+        "kdf": kdf_params,
+        "salt": salt.hex(),
+        "wrapped_key": _seal(kek, master_key.data_key),
+    }
+    if master_key.legacy_keys:
+        legacy = json.dumps(master_key.legacy_keys).encode('utf-8')
+        record["legacy_keys"] = _seal(master_key.data_key, legacy)
+    _write_record(path, record)
+
+
+def create_keystore(password: str, kdf_params: dict = None, path: str = KEYSTORE_FILE) -> MasterKey:
+    """
+    Generate a new random DEK and store it wrapped under password.
+    
+    Args:
+        password: Master password
+        kdf_params: KDF parameters for the KEK (default: kdf.default_params())
+        path: Key store file
+    
+    Returns:
+        The new MasterKey
+    """
+    master_key = MasterKey(os.urandom(8).hex(), os.urandom(32), path=path)
+    _write(path, master_key, password, kdf_params or kdf.default_params())
+    return master_key
+
+
+def unlock_keystore(password: str, path: str = KEYSTORE_FILE):
+    """
+    Unwrap the DEK with password (one KDF run).
+    
+    Returns:
+        MasterKey, or None if there is no key store
+    
+    Raises:
+        ValueError: If the password is wrong or the key store is damaged
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        record = json.load(f)
+    if record.get("version") != KEYSTORE_VERSION:
+        raise ValueError("Unsupported key store version")
+    
+    kek = kdf.derive(password, bytes.fromhex(record["salt"]), record["kdf"])
+    try:
+        data_key = _open(kek, record["wrapped_key"])
+    except (ValueError, KeyError):
+        raise ValueError("Incorrect password for the key store")
+    
+    legacy = {}
+    if "legacy_keys" in record:
+        legacy = json.loads(_open(data_key, record["legacy_keys"]).decode('utf-8'))
+    return MasterKey(record["kid"], data_key, legacy, path)
+
+
+def rewrap_keystore(old_password: str, new_password: str, kdf_params: dict = None,
+                    path: str = KEYSTORE_FILE) -> MasterKey:
+    """
+    Re-wrap the DEK under a new password.
+    
+    Only the small key store is rewritten (two KDF runs), whatever amount
+    of data is locked. Without a key store one is created. The legacy keys
+    recorded for files locked before the key store are kept; old_password
+    itself is never stored.
+    
+    Args:
+        old_password: Current master password
+        new_password: New master password
+        kdf_params: KDF parameters for the new KEK (default: keep the current ones)
+        path: Key store file
+    
+    Returns:
+        The MasterKey (same DEK as before)
+    
+    Raises:
+        ValueError: If old_password does not unwrap the key store
+    """
+    master_key = unlock_keystore(old_password, path)
+    if master_key is None:
+        return create_keystore(new_password, kdf_params, path)
+    
+    if kdf_params is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            kdf_params = json.load(f)["kdf"]
+    _write(path, master_key, new_password, kdf_params)
+    return master_key
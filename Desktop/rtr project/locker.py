@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+"""
+locker.py - Command Line Interface
+Lock, unlock, verify and inspect files and folders without the GUI
+Never imports tkinter, so it runs on headless servers and from cron
+
+Usage:
+    python locker.py lock PATH... [--jobs N] [--json]
+    python locker.py unlock PATH... [--jobs N] [--json]
+    python locker.py verify PATH... [--full] [--json]
+    python locker.py status PATH... [--json]
+    python locker.py pack FOLDER... [--json]
+    python locker.py unpack VAULT... [--keep-vault] [--json]
+
+pack packs each folder into one FOLDER.vault file (see vault.py), or
+appends to it when it exists; unpack extracts a vault back into a folder.
+
+lock and pack also take --shred MODE (how originals are deleted, see
+secure_delete.py) and --background-shred (delete them on a worker thread
+while the next files are locked; the run waits for it before exiting).
+
+lock and unlock also take --timings (print where the time went),
+--trace FILE (write every per-file phase timing as JSON lines) and
+--durability file|batch|none (when outputs are synced before their
+sources are deleted, see durability.py). For large bulk jobs
+--fadvise-sequential, --fadvise-dontneed and --fallocate (or --bulk-io for
+all three) hint the page cache and preallocate outputs, see io_hints.py.
+
+The password is read from the environment variable named by --password-env
+(default SFL_PASSWORD), from --password-file, or prompted for.
+"""
+
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import sys
+import time
+
+import auth
+import crypto_utils
+import durability
+import io_hints
+import journal
+import secure_delete
+import shred_queue
+import timing
+import vault
+
+# Environment variable holding the master password by default
+PASSWORD_ENV = "SFL_PASSWORD"
+
+# Exit codes (argparse exits with 2 on usage errors)
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+
+def read_job_file(job_file: str) -> list:
+    """
+    Read the paths listed in a job file.
+    
+    One path per line; blank lines and lines starting with '#' are ignored.
+    
+    Args:
+        job_file: Path to the job file
+    
+    Returns:
+        List of paths
+    """
+    paths = []
+    with open(job_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                paths.append(line)
+    return paths
+
+
+def get_password(args) -> str:
+    """
+    Get the master password from the environment, a file or a prompt.
+    
+    Returns:
+        The password, or None if none was given
+    """
+    if args.password_file:
+        with open(args.password_file, 'r', encoding='utf-8') as f:
+            return f.readline().rstrip('\r\n')
+    password = os.environ.get(args.password_env)
+    if password:
+        return password
+    if sys.stdin.isatty():
+        return getpass.getpass("Master password: ")
+    return None
+
+
+def lock_path(path: str, password: str, args) -> dict:
+    """Lock a file or every file in a folder."""
+    if os.path.isdir(path):
+        success, message, count = crypto_utils.encrypt_folder(
+            path,
+            password,
+            jobs=args.jobs,
+            incremental=args.incremental,
+            compression=args.compression,
+            timings=args.observer,
+            keyring=args.keyring,
+            shred_mode=args.shred,
+            shred_queue=args.shred_queue,
+            durability=args.durability,
+            batch_files=args.sync_files,
+            batch_seconds=args.sync_seconds,
+            io_hints=args.io_hints
+        )
+        return {"ok": success, "message": message, "files": count}
+    
+    if path.endswith('.locked'):
+        return {"ok": False, "message": "File is already locked", "files": 0}
+    success = crypto_utils.encrypt_file(path, password, keyring=args.keyring, compression=args.compression,
+                                        timings=args.observer, shred_mode=args.shred,
+                                        shred_queue=args.shred_queue, durability=args.syncer,
+                                        io_hints=args.io_hints)
+    if success:
+        crypto_utils.hide_file_windows(path + ".locked")
+    return {"ok": success, "message": "Locked" if success else "Failed to lock file", "files": int(success)}
+
+
+def unlock_path(path: str, password: str, args) -> dict:
+    """Unlock a .locked file or every locked file in a folder."""
+    if os.path.isdir(path):
+        success, message, count = crypto_utils.decrypt_folder(
+            path,
+            password,
+            jobs=args.jobs,
+            keep_locked=args.keep_locked,
+            timings=args.observer,
+            keyring=args.keyring,
+            durability=args.durability,
+            batch_files=args.sync_files,
+            batch_seconds=args.sync_seconds,
+            io_hints=args.io_hints
+        )
+        return {"ok": success, "message": message, "files": count}
+    
+    if not path.endswith('.locked'):
+        return {"ok": False, "message": "Not a .locked file", "files": 0}
+    crypto_utils.unhide_file_windows(path)
+    success = crypto_utils.decrypt_file(path, password, keyring=args.keyring, keep_locked=args.keep_locked,
+                                        timings=args.observer, durability=args.syncer,
+                                        io_hints=args.io_hints)
+    return {"ok": success, "message": "Unlocked" if success else "Failed to unlock file", "files": int(success)}
+
+
+def pack_path(path: str, password: str, args) -> dict:
+    """Pack every file in a folder into its vault."""
+    if not os.path.isdir(path):
+        return {"ok": False, "message": "Not a folder", "files": 0}
+    success, message, count = vault.pack_folder(path, password, keyring=args.keyring,
+                                                shred_mode=args.shred, shred_queue=args.shred_queue)
+    return {"ok": success, "message": message, "files": count}
+
+
+def unpack_path(path: str, password: str, args) -> dict:
+    """Extract a vault into the folder it was packed from."""
+    if not path.endswith(vault.VAULT_EXTENSION):
+        return {"ok": False, "message": f"Not a {vault.VAULT_EXTENSION} file", "files": 0}
+    success, message, count = vault.unpack_vault(path, password, keyring=args.keyring,
+                                                 remove_vault=not args.keep_vault)
+    return {"ok": success, "message": message, "files": count}
+
+
+def verify_path(path: str, password: str, args) -> dict:
+    """
+    Check the password against a locked file or every locked file in a
+    folder. With --full every chunk is decrypted and authenticated.
+    """
+    if os.path.isdir(path):
+        locked_files = crypto_utils.scan_folder(path, "unlock").paths
+    else:
+        locked_files = [path]
+    if not locked_files:
+        return {"ok": False, "message": "No locked files found", "files": 0}
+    
+    keyring = args.keyring
+    problems = []
+    
+    def verify_one(locked_file_path):
+        if args.full:
+            ok, message = crypto_utils.check_locked_file(locked_file_path, password, keyring, chunk_jobs=1)
+        else:
+            matches = crypto_utils.verify_file_key(locked_file_path, password, keyring)
+            ok = matches is not False
+            message = "Incorrect password"
+        if not ok:
+            problems.append({"path": locked_file_path, "message": message})
+        return ok
+    
+    verified, _ = crypto_utils.run_parallel(verify_one, locked_files, args.jobs)
+    result = {
+        "ok": not problems,
+        "message": f"Verified {verified}/{len(locked_files)} file(s)",
+        "files": verified,
+    }
+    if problems:
+        result["problems"] = problems
+    return result
+
+
+def status_path(path: str, args) -> dict:
+    """Report locked and unlocked files and any interrupted operation (no password needed)."""
+    if not os.path.exists(path):
+        return {"ok": False, "message": "Path not found"}
+    
+    if os.path.isdir(path):
+        unlocked = crypto_utils.scan_folder(path, "lock")
+        locked = crypto_utils.scan_folder(path, "unlock")
+        pending = journal.pending_operation(path)
+        message = f"{len(locked)} locked, {len(unlocked)} unlocked"
+        if pending:
+            message += f", interrupted {pending} (run {pending} again to resume)"
+        return {
+            "ok": True,
+            "message": message,
+            "locked_files": len(locked),
+            "locked_bytes": locked.total_bytes,
+            "unlocked_files": len(unlocked),
+            "unlocked_bytes": unlocked.total_bytes,
+            "interrupted": pending,
+        }
+    
+    if not path.endswith('.locked'):
+        return {"ok": True, "message": "Not locked", "locked": False}
+    header = crypto_utils.read_locked_header(path)
+    return {
+        "ok": True,
+        "message": f"Locked (format version {header['version']}, {header['alg']})",
+        "locked": True,
+        "version": header["version"],
+        "algorithm": header["alg"],
+        "codec": header.get("codec"),
+        "size": os.path.getsize(path),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(
+        prog="locker",
+        description="Secure File Locker command line interface"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="*", help="files or folders")
+    common.add_argument("--job-file", help="file listing one path per line")
+    common.add_argument("--json", action="store_true", help="print results as JSON")
+    common.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help=f"worker threads for folders (default: {crypto_utils.DEFAULT_JOBS})"
+    )
+    
+    secret = argparse.ArgumentParser(add_help=False)
+    secret.add_argument(
+        "--password-env",
+        default=PASSWORD_ENV,
+        help=f"environment variable holding the password (default: {PASSWORD_ENV})"
+    )
+    secret.add_argument("--password-file", help="read the password from the first line of a file")
+    
+    timed = argparse.ArgumentParser(add_help=False)
+    timed.add_argument("--timings", action="store_true", help="print time per phase and the slowest files")
+    timed.add_argument("--trace", help="write per-file phase timings to this file (JSON lines)")
+    timed.add_argument(
+        "--durability",
+        choices=durability.DURABILITY_MODES,
+        default=durability.DEFAULT_DURABILITY,
+        help="fsync each output before its source is deleted, in batches, or never (default: %(default)s)"
+    )
+    timed.add_argument(
+        "--sync-files",
+        type=int,
+        default=durability.DEFAULT_BATCH_FILES,
+        help="with --durability batch: sync after this many files (default: %(default)s)"
+    )
+    timed.add_argument(
+        "--sync-seconds",
+        type=float,
+        default=durability.DEFAULT_BATCH_SECONDS,
+        help="with --durability batch: or after this many seconds (default: %(default)s)"
+    )
+    timed.add_argument(
+        "--fadvise-sequential",
+        action="store_true",
+        help="ask the OS for aggressive read-ahead on the source files"
+    )
+    timed.add_argument(
+        "--fadvise-dontneed",
+        action="store_true",
+        help="drop sources and outputs from the page cache once processed"
+    )
+    timed.add_argument("--fallocate", action="store_true", help="preallocate each output file")
+    timed.add_argument("--bulk-io", action="store_true", help="all three of the above")
+    
+    shredding = argparse.ArgumentParser(add_help=False)
+    shredding.add_argument(
+        "--shred",
+        choices=secure_delete.SHRED_MODES,
+        default=secure_delete.DEFAULT_SHRED_MODE,
+        help="how originals are deleted: none, single or multi overwrite, or trim for SSDs (default: %(default)s)"
+    )
+    shredding.add_argument(
+        "--background-shred",
+        action="store_true",
+        help="hide originals at once and shred them on a worker thread"
+    )
+    
+    lock = subparsers.add_parser("lock", parents=[common, secret, timed, shredding], help="lock files or folders")
+    lock.add_argument("--incremental", action="store_true", help="only re-encrypt changed files")
+    lock.add_argument(
+        "--compression",
+        choices=list(crypto_utils.COMPRESSION_CODECS) + ["auto"],
+        default=None,
+        help="compress before encrypting"
+    )
+    
+    unlock = subparsers.add_parser("unlock", parents=[common, secret, timed], help="unlock files or folders")
+    unlock.add_argument("--keep-locked", action="store_true", help="keep .locked copies for an incremental re-lock")
+    
+    verify = subparsers.add_parser("verify", parents=[common, secret], help="check the password against locked files")
+    verify.add_argument("--full", action="store_true", help="decrypt and authenticate every chunk")
+    
+    subparsers.add_parser("status", parents=[common], help="show what is locked")
+    
+    subparsers.add_parser("pack", parents=[common, secret, shredding], help="pack folders into encrypted vaults")
+    unpack = subparsers.add_parser("unpack", parents=[common, secret], help="extract vaults into folders")
+    unpack.add_argument("--keep-vault", action="store_true", help="keep the vault after extracting it")
+    return parser
+
+
+def build_observer(args):
+    """Return a timing observer for --timings / --trace, or None."""
+    sinks = []
+    if getattr(args, "trace", None):
+        sinks.append(timing.JsonlTraceSink(args.trace))
+    if getattr(args, "timings", False):
+        sinks.append(timing.SummarySink())
+    return timing.Timings(*sinks) if sinks else None
+
+
+def get_io_hints(args) -> list:
+    """Return the io_hints names selected by --fadvise-* / --fallocate / --bulk-io."""
+    if getattr(args, "bulk_io", False):
+        return list(io_hints.IO_HINTS)
+    hints = []
+    if getattr(args, "fadvise_sequential", False):
+        hints.append(io_hints.HINT_SEQUENTIAL)
+    if getattr(args, "fadvise_dontneed", False):
+        hints.append(io_hints.HINT_DONTNEED)
+    if getattr(args, "fallocate", False):
+        hints.append(io_hints.HINT_FALLOCATE)
+    return hints
+
+
+def main(argv=None) -> int:
+    """Command line entry point. Returns the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    paths = list(args.paths)
+    if args.job_file:
+        try:
+            paths.extend(read_job_file(args.job_file))
+        except OSError as e:
+            parser.error(f"cannot read job file: {e}")
+    if not paths:
+        parser.error("no paths given")
+    
+    password = None
+    master_key = None
+    if args.command != "status":
+        password = get_password(args)
+        if not password:
+            parser.error(f"no password (set {args.password_env}, use --password-file or run interactively)")
+        is_master = auth.is_password_set() and auth.authenticate_user(password)
+        # Lock only with the master password, so files stay unlockable from the app
+        if args.command in ("lock", "pack") and auth.is_password_set() and not is_master:
+            print("Incorrect master password", file=sys.stderr)
+            return EXIT_FAILED
+        if is_master:
+            try:
+                master_key = auth.open_master_key(password)
+            except ValueError as e:
+                print(f"Cannot open key store: {e}", file=sys.stderr)
+                return EXIT_FAILED
+    
+    args.observer = build_observer(args)
+    # Shared by the single-file paths; folders sync with their own
+    args.syncer = None
+    if args.command in ("lock", "unlock"):
+        args.syncer = durability.Durability(args.durability, args.sync_files, args.sync_seconds, args.observer)
+    args.io_hints = get_io_hints(args)
+    args.shred_queue = None
+    if getattr(args, "background_shred", False):
+        args.shred_queue = shred_queue.ShredQueue()
+        args.shred_queue.start()
+    # One key ring for every path, so each salt goes through PBKDF2 once
+    args.keyring = crypto_utils.KeyRing(password, auth.get_kdf_params(), master_key) if password else None
+    results = []
+    # Library progress messages go to stderr so stdout stays machine-readable
+    with contextlib.redirect_stdout(sys.stderr):
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                if not os.path.exists(path):
+                    result = {"ok": False, "message": "Path not found"}
+                elif args.command == "lock":
+                    result = lock_path(path, password, args)
+                elif args.command == "unlock":
+                    result = unlock_path(path, password, args)
+                elif args.command == "verify":
+                    result = verify_path(path, password, args)
+                elif args.command == "pack":
+                    result = pack_path(path, password, args)
+                elif args.command == "unpack":
+                    result = unpack_path(path, password, args)
+                else:
+                    result = status_path(path, args)
+            except Exception as e:
+                result = {"ok": False, "message": f"Error: {e}"}
+            result = {"path": path, **result, "seconds": round(time.perf_counter() - start, 3)}
+            results.append(result)
+        
+        # Sources of the last batch of single files are deleted once it is synced
+        if args.syncer is not None:
+            args.syncer.flush()
+        
+        # Plaintext must not outlive the run
+        if args.shred_queue is not None:
+            files, size = args.shred_queue.backlog()
+            if files:
+                print(f"Waiting for {files} queued file(s) ({size} bytes) to be shredded")
+            args.shred_queue.wait()
+            args.shred_queue.stop()
+    
+    # The summary goes to stderr, after the library messages
+    if args.observer is not None:
+        args.observer.finish()
+    
+    all_ok = all(result["ok"] for result in results)
+    if args.json:
+        print(json.dumps({"command": args.command, "ok": all_ok, "results": results}, indent=2))
+    else:
+        for result in results:
+            mark = "OK  " if result["ok"] else "FAIL"
+            print(f"{mark} {result['path']}: {result['message']}")
+            for problem in result.get("problems", []):
+                print(f"     {problem['path']}: {problem['message']}")
+    
+    return EXIT_OK if all_ok else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
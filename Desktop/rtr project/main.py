@@ -3,41 +3,77 @@ main.py - Secure File Locker Desktop Application
 Main GUI application with authentication and file locking/unlocking
 """
 
-# CRITICAL: Check if running in correct Python environment
+import time
+
+# Reference point for --measure-startup (time to first window)
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
-import subprocess
+import importlib.util
+import site
+
 
-def check_and_relaunch_if_needed():
-    """Check if running with correct Python (venv), relaunch if not"""
-    # Check if Crypto module is available
+def ensure_venv_on_path():
+    """
+    Make the project's .venv packages importable in this interpreter.
+    
+    If pycryptodome is not importable, the site-packages folder of the
+    project's .venv is added to sys.path in-process (only when the venv was
+    built for the same Python version), instead of starting a second
+    interpreter. Nothing is imported, so this costs a few stat calls.
+    """
+    if importlib.util.find_spec("Crypto") is not None:
+        return
+    
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    venv_root = os.path.join(project_root, '.venv')
+    version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    candidates = [
+        os.path.join(venv_root, 'Lib', 'site-packages'),
+        os.path.join(venv_root, 'lib', f'python{version}', 'site-packages'),
+    ]
+    
+    # A venv built for another Python version has incompatible extensions
     try:
-        import Crypto
-    except ImportError:
-        # Not in venv - try to relaunch with venv Python
-        project_root = os.path.dirname(os.path.abspath(__file__))
-        venv_python = os.path.join(project_root, '.venv', 'Scripts', 'python.exe')
-        
-        if os.path.exists(venv_python):
-            # Relaunch with venv Python
-            subprocess.run([venv_python, __file__], cwd=project_root)
-            sys.exit(0)
-        else:
-            # Can't find venv
-            print("ERROR: Virtual environment not found!")
-            print(f"Expected at: {venv_python}")
-            print("\nPlease run: .venv\\Scripts\\python.exe main.py")
-            sys.exit(1)
+        config = {}
+        with open(os.path.join(venv_root, 'pyvenv.cfg'), 'r') as f:
+            for line in f:
+                if '=' in line:
+                    key, value = line.split('=', 1)
+                    config[key.strip()] = value.strip()
+        venv_version = config.get('version') or config.get('version_info') or ''
+        if venv_version and venv_version.split('.')[:2] != version.split('.'):
+            candidates = []
+    except OSError:
+        pass
+    
+    for site_packages in candidates:
+        if os.path.isdir(site_packages):
+            site.addsitedir(site_packages)
+            if importlib.util.find_spec("Crypto") is not None:
+                return
+    
+    print("ERROR: pycryptodome is not installed for this Python.")
+    print(f"Python: {sys.executable}")
+    print("\nPlease run: pip install -r requirements.txt")
+    print("or start the app with the virtual environment: .venv\\Scripts\\python.exe main.py")
+    sys.exit(1)
+
 
-check_and_relaunch_if_needed()
+ensure_venv_on_path()
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import auth
-import crypto_utils
+import kdf
+import progress
+import secure_delete
+import session
 import threading
-from concurrent.futures import ThreadPoolExecutor
-import queue
+
+# How often the dashboard refreshes the background shred backlog (milliseconds)
+SHRED_POLL_MS = 1000
 
 
 # Color scheme - Apple inspired (modern dark/light theme)
@@ -58,10 +94,25 @@ COLORS = {
 }
 
 
+def format_size(num_bytes):
+    """Format a byte count for display, e.g. 1536 -> '1.5 KB'"""
+    size = float(num_bytes)
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024
+    if unit == "bytes":
+        return f"{int(size)} bytes"
+    return f"{size:.1f} {unit}"
+
+
 class SecureFileLocker:
     """Main application class for Secure File Locker"""
     
-    def __init__(self, root):
+    def __init__(self, root, jobs=None, session_timeout=session.DEFAULT_IDLE_TIMEOUT, kdf_name=None,
+                 kdf_target=kdf.DEFAULT_TARGET_SECONDS, shred_mode=secure_delete.DEFAULT_SHRED_MODE,
+                 background_shred=False, durability_mode=None,
+                 bulk_io=False):
         """Initialize the application"""
         self.root = root
         self.root.title("Secure File Locker")
@@ -77,9 +128,43 @@ class SecureFileLocker:
         # Center window on screen
         self.center_window()
         
-        # Current state
+        # Current state. The session holds the password and its derived
+        # keys between login and logout or the idle timeout.
         self.authenticated = False
-        self.current_password = None
+        self.session = None
+        self.session_timeout = session_timeout
+        self._session_check = None
+        
+        # Worker threads used for folder lock/unlock (None: library default)
+        self.jobs = jobs
+        
+        # KDF to calibrate when a password is set or changed (None: the
+        # first password uses kdf.DEFAULT_KDF, a change keeps the current one)
+        self.kdf_name = kdf_name
+        self.kdf_target = kdf_target
+        
+        # How originals are deleted after locking (see secure_delete.py)
+        self.shred_mode = shred_mode
+        
+        # When folder outputs are synced before their sources are deleted
+        # (None: the crypto_utils default)
+        self.durability_mode = durability_mode
+        
+        # Page cache hints and preallocation for large jobs (see io_hints.py)
+        if bulk_io:
+            import io_hints
+            self.io_hints = list(io_hints.IO_HINTS)
+        else:
+            self.io_hints = None
+        
+        # Background shredding of originals (see shred_queue.py). The queue
+        # is opened once the window is up, so files queued before a restart
+        # are still shredded; its worker only starts when there is work.
+        self.background_shred = background_shred
+        self._shred_poll = None
+        self._shred_queue = None
+        self._shred_queue_opened = False
+        self.root.after(SHRED_POLL_MS, self.open_shred_queue)
         
         # Show login screen
         self.show_login_screen()
@@ -123,6 +208,59 @@ class SecureFileLocker:
         btn.pack(fill="x", padx=0)
         return btn_frame
     
+    def create_job_controls(self, parent, control):
+        """Add Pause/Resume and Cancel buttons for a running folder job"""
+        button_frame = tk.Frame(parent, bg=COLORS["bg_primary"])
+        button_frame.pack(pady=5)
+        
+        def toggle_pause():
+            if control.paused:
+                control.resume()
+                pause_btn.config(text="Pause")
+            else:
+                control.pause()
+                pause_btn.config(text="Resume")
+        
+        def cancel():
+            control.cancel()
+            pause_btn.config(state="disabled")
+            cancel_btn.config(text="Cancelling...", state="disabled")
+        
+        pause_btn = tk.Button(
+            button_frame,
+            text="Pause",
+            command=toggle_pause,
+            font=("Segoe UI", 10, "bold"),
+            bg=COLORS["bg_tertiary"],
+            fg=COLORS["text_primary"],
+            padx=16,
+            pady=4,
+            relief="flat",
+            cursor="hand2",
+            border=0,
+            highlightthickness=0
+        )
+        pause_btn.pack(side="left", padx=5)
+        
+        cancel_btn = tk.Button(
+            button_frame,
+            text="Cancel",
+            command=cancel,
+            font=("Segoe UI", 10, "bold"),
+            bg=COLORS["accent_red"],
+            fg="white",
+            padx=16,
+            pady=4,
+            relief="flat",
+            cursor="hand2",
+            border=0,
+            highlightthickness=0
+        )
+        cancel_btn.pack(side="left", padx=5)
+        
+        # Closing the dialog cancels the job instead of leaving it running
+        parent.protocol("WM_DELETE_WINDOW", cancel)
+    
     def _lighten_color(self, color):
         """Lighten a color for hover effect"""
         # Convert hex to RGB, lighten, and convert back
@@ -397,7 +535,7 @@ class SecureFileLocker:
         
         info_text = tk.Label(
             info_frame,
-            text="⚠️  Options:\n\n• Use your backup password if you created one\n• Reset all data by deleting master_password.hash file\n• Start fresh with a new master password",
+            text="⚠️  Options:\n\n• Use your backup password if you created one\n• Reset all data by deleting the master_password.hash and master_key.store files\n• Start fresh with a new master password",
             font=("Segoe UI", 10),
             bg=COLORS["bg_secondary"],
             fg=COLORS["text_primary"],
@@ -449,14 +587,19 @@ class SecureFileLocker:
             messagebox.showerror("Setup Error", "Passwords do not match")
             return
         
-        # Set master password
-        if auth.set_master_password(password):
-            self.current_password = password
-            self.authenticated = True
-            messagebox.showinfo("Success", "Master password set successfully!")
-            self.show_dashboard()
-        else:
-            messagebox.showerror("Setup Error", "Failed to set master password")
+        # Set master password (calibrating the KDF takes a moment)
+        def set_password():
+            return auth.set_master_password(password, self.calibrated_kdf_params(first_password=True))
+        
+        def on_done(success):
+            if success:
+                self.start_session(password)
+                messagebox.showinfo("Success", "Master password set successfully!")
+                self.show_dashboard()
+            else:
+                messagebox.showerror("Setup Error", "Failed to set master password")
+        
+        self.run_password_job("🔑 Setting master password...", set_password, on_done)
     
     def handle_login(self):
         """Handle user login"""
@@ -468,8 +611,7 @@ class SecureFileLocker:
         
         # Authenticate user
         if auth.authenticate_user(password):
-            self.current_password = password
-            self.authenticated = True
+            self.start_session(password)
             messagebox.showinfo("Success", "Authentication successful!")
             self.show_dashboard()
         else:
@@ -477,6 +619,115 @@ class SecureFileLocker:
             self.login_pwd_entry.delete(0, tk.END)
             self.login_pwd_entry.focus()
     
+    def start_session(self, password):
+        """Open a session for an authenticated password and watch its idle timer"""
+        if self.session is not None:
+            self.session.close()
+        self.session = session.Session(password, self.session_timeout, auth.get_kdf_params())
+        self.authenticated = True
+        
+        # Derive the key for new locked files while the dashboard is shown
+        threading.Thread(target=self.session.warm_up, daemon=True).start()
+        
+        if self._session_check is None:
+            self._session_check = self.root.after(session.SESSION_CHECK_MS, self.check_session)
+    
+    def calibrated_kdf_params(self, first_password=False):
+        """
+        KDF parameters tuned to this machine, or None to keep the current ones
+        
+        The first password is always calibrated (with kdf.DEFAULT_KDF unless
+        --kdf was given); a change only recalibrates with --kdf. Measuring
+        takes about a second, so call this from run_password_job.
+        """
+        if self.kdf_name is None and not first_password:
+            return None
+        return kdf.calibrate(self.kdf_name or kdf.DEFAULT_KDF, self.kdf_target)
+    
+    def run_password_job(self, message, job, on_done):
+        """Run job() in a background thread behind a small dialog, then on_done(result) on the UI thread"""
+        job_window = tk.Toplevel(self.root)
+        job_window.title("Please Wait")
+        job_window.geometry("400x100")
+        job_window.resizable(False, False)
+        job_window.configure(bg=COLORS["bg_primary"])
+        
+        # Center dialog
+        job_window.transient(self.root)
+        job_window.grab_set()
+        
+        title_label = tk.Label(
+            job_window,
+            text=message,
+            font=("Segoe UI", 12, "bold"),
+            padx=20,
+            pady=30,
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_primary"]
+        )
+        title_label.pack()
+        
+        # The worker publishes its result to the channel; only poll() touches Tk
+        channel = progress.ProgressChannel()
+        
+        def job_thread():
+            try:
+                channel.finish(job())
+            except Exception as e:
+                channel.finish(error=e)
+        
+        def poll():
+            state = channel.snapshot()
+            if not state["finished"]:
+                self.root.after(progress.PROGRESS_POLL_MS, poll)
+                return
+            
+            try:
+                job_window.destroy()
+            except tk.TclError:
+                pass
+            
+            if state["error"] is not None:
+                messagebox.showerror("Error", str(state["error"]))
+            else:
+                on_done(state["result"])
+        
+        threading.Thread(target=job_thread, daemon=True).start()
+        self.root.after(progress.PROGRESS_POLL_MS, poll)
+    
+    def check_session(self):
+        """Return to the login screen once the session has been idle too long"""
+        self._session_check = None
+        if self.session is None:
+            return
+        if self.session.expired:
+            self.end_session()
+            return
+        self._session_check = self.root.after(session.SESSION_CHECK_MS, self.check_session)
+    
+    def end_session(self):
+        """Close the session (idle timeout) and ask for the password again"""
+        if self.session is not None:
+            self.session.close()
+        self.session = None
+        self.authenticated = False
+        self.show_login_screen()
+        messagebox.showinfo("Session Expired", "You were logged out after being idle. Please log in again.")
+    
+    def session_credentials(self):
+        """
+        Return (password, keyring) of the current session, or None if it
+        expired (the login screen is shown instead)
+        """
+        try:
+            return self.session.credentials()
+        except (session.SessionExpired, AttributeError):
+            self.end_session()
+            return None
+        except ValueError as e:
+            messagebox.showerror("Key Store Error", f"Cannot open the key store: {e}")
+            return None
+    
     def show_dashboard(self):
         """Display main dashboard with professional Apple-style design"""
         self.clear_window()
@@ -548,6 +799,18 @@ class SecureFileLocker:
         )
         self.status_label.pack(pady=(0, 0))
         
+        # Background shred backlog (empty while nothing is queued)
+        self.shred_label = tk.Label(
+            header_content,
+            text="",
+            font=("Segoe UI", 9),
+            bg=COLORS["bg_secondary"],
+            fg=COLORS["text_secondary"]
+        )
+        self.shred_label.pack(pady=(4, 0))
+        if self._shred_poll is None:
+            self.update_shred_backlog()
+        
         # Content section
         content_frame = tk.Frame(main_frame, bg=COLORS["bg_primary"], highlightthickness=0)
         content_frame.pack(fill="both", expand=True, padx=24, pady=24)
@@ -696,6 +959,49 @@ class SecureFileLocker:
         )
         exit_btn.pack(fill="x", pady=(24, 0))
     
+    def update_shred_backlog(self):
+        """Show the background shred backlog on the dashboard, once a second"""
+        self._shred_poll = None
+        if not self.shred_label.winfo_exists():
+            return
+        queue = self._shred_queue
+        files, size = queue.backlog() if queue else (0, 0)
+        if files:
+            self.shred_label.config(text=f"🗑️ Shredding in background: {files} file(s), {format_size(size)} left")
+        else:
+            self.shred_label.config(text="")
+        self._shred_poll = self.root.after(SHRED_POLL_MS, self.update_shred_backlog)
+    
+    @property
+    def crypto(self):
+        """
+        The crypto_utils module. It is imported on first use, so the window
+        appears without waiting for pycryptodome.
+        """
+        import crypto_utils
+        return crypto_utils
+    
+    def open_shred_queue(self):
+        """Open the shred queue on first use and start it (None if it cannot be opened)"""
+        if not self._shred_queue_opened:
+            self._shred_queue_opened = True
+            import shred_queue
+            try:
+                self._shred_queue = shred_queue.ShredQueue()
+                self._shred_queue.start()
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not open the shred queue: {e}")
+        return self._shred_queue
+    
+    def background_shred_queue(self):
+        """The shred queue lock operations hand originals to, or None"""
+        return self.open_shred_queue() if self.background_shred else None
+    
+    @property
+    def folder_durability(self):
+        """Durability mode for folder jobs (--durability or the crypto_utils default)"""
+        return self.durability_mode or self.crypto.DEFAULT_DURABILITY
+    
     def lock_file_action(self):
         """Handle lock file action"""
         # Open file picker
@@ -716,16 +1022,23 @@ class SecureFileLocker:
             messagebox.showerror("Error", f"File is not readable. Please check permissions: {file_path}")
             return
         
+        credentials = self.session_credentials()
+        if credentials is None:
+            return
+        password, keyring = credentials
+        
         # Show processing
         self.status_label.config(text="🔒 Encrypting file...")
         self.root.update()
         
         try:
-            # Encrypt the file
-            if crypto_utils.encrypt_file(file_path, self.current_password):
+            # Encrypt the file with the session's keys (no PBKDF2)
+            if self.crypto.encrypt_file(file_path, password, keyring=keyring, shred_mode=self.shred_mode,
+                                        shred_queue=self.background_shred_queue(),
+                                        io_hints=self.io_hints):
                 # Hide the encrypted file
                 locked_path = file_path + ".locked"
-                if crypto_utils.hide_file_windows(locked_path):
+                if self.crypto.hide_file_windows(locked_path):
                     self.status_label.config(text="✓ File locked and hidden successfully", fg=COLORS["accent_green"])
                     messagebox.showinfo(
                         "Success",
@@ -764,24 +1077,60 @@ class SecureFileLocker:
             messagebox.showerror("Error", f"Not a folder: {folder_path}")
             return
         
+        # An interrupted run is recovered before the new one starts
+        import journal
+        pending = journal.pending_operation(folder_path)
+        if pending:
+            messagebox.showinfo(
+                "Interrupted Operation",
+                f"An interrupted {pending} of this folder was found.\n\n"
+                "Files it was working on will be recovered first, and files it "
+                "already finished will not be processed again."
+            )
+        
+        # Scan the folder off the UI thread, then confirm
+        self.scan_folder_with_dialog(
+            folder_path,
+            "lock",
+            lambda manifest: self.confirm_and_lock_folder(folder_path, manifest)
+        )
+    
+    def confirm_and_lock_folder(self, folder_path, manifest):
+        """Confirm and lock a scanned folder"""
         # Confirm action
-        file_count = sum([len(files) for _, _, files in os.walk(folder_path)])
+        file_count = len(manifest)
         if file_count == 0:
-            messagebox.showwarning("Warning", "The selected folder is empty")
+            messagebox.showwarning("Warning", "No files to lock in the selected folder")
             return
         
         confirm = messagebox.askyesno(
             "Confirm Lock",
-            f"Lock {file_count} file(s)?\n\n{folder_path}"
+            f"Lock {file_count} file(s) ({format_size(manifest.total_bytes)})?\n\n{folder_path}"
         )
         
         if not confirm:
             return
         
+        # A folder unlocked with its locked copies kept can be re-locked
+        # incrementally; a full lock re-encrypts everything and clears the
+        # manifest of kept copies
+        incremental = False
+        if os.path.exists(os.path.join(folder_path, self.crypto.LOCK_MANIFEST_NAME)):
+            incremental = messagebox.askyesno(
+                "Incremental Lock",
+                "This folder was unlocked with its locked copies kept.\n\n"
+                "Only re-encrypt files that changed since then?"
+            )
+        
+        credentials = self.session_credentials()
+        if credentials is None:
+            return
+        password, keyring = credentials
+        
         # Create progress dialog
         progress_window = tk.Toplevel(self.root)
         progress_window.title("Locking Folder")
-        progress_window.geometry("400x150")
+        progress_window.geometry("400x200")
         progress_window.resizable(False, False)
         progress_window.configure(bg=COLORS["bg_primary"])
         
@@ -825,47 +1174,52 @@ class SecureFileLocker:
         )
         progress_bar.pack()
         
-        # Callback for progress updates
-        def progress_callback(current, total, filename):
-            try:
-                progress_percent = int((current / total) * 100)
-                progress_label.config(text=f"{filename[:40]}")
-                progress_bar.config(text=f"{current}/{total} files • {progress_percent}%")
-                progress_window.update()
-            except:
-                pass
+        # Pause / Cancel controls, checked between chunks and files
+        control = self.crypto.JobControl()
+        self.create_job_controls(progress_window, control)
+        
+        # The worker publishes to the channel; only the UI thread touches Tk
+        channel = progress.ProgressChannel()
         
         # Run encryption in background thread
         def encrypt_folder_thread():
             try:
-                success, message, files_encrypted = crypto_utils.encrypt_folder(
+                result = self.crypto.encrypt_folder(
                     folder_path,
-                    self.current_password,
-                    callback=progress_callback
+                    password,
+                    jobs=self.jobs,
+                    incremental=incremental,
+                    manifest=manifest,
+                    control=control,
+                    progress=channel,
+                    keyring=keyring,
+                    shred_mode=self.shred_mode,
+                    shred_queue=self.background_shred_queue(),
+                    durability=self.folder_durability,
+                    io_hints=self.io_hints
                 )
-                
-                try:
-                    progress_window.destroy()
-                except:
-                    pass
-                
-                if success:
-                    self.status_label.config(text=f"✓ {files_encrypted} file(s) locked", fg=COLORS["accent_green"])
-                    messagebox.showinfo("Success", f"Locked {files_encrypted} file(s)")
-                else:
-                    self.status_label.config(text="✗ Folder locking failed", fg=COLORS["accent_red"])
-                    messagebox.showwarning("Warning", message)
+                channel.finish(result)
             except Exception as e:
-                try:
-                    progress_window.destroy()
-                except:
-                    pass
+                channel.finish(error=e)
+        
+        def on_finished(state):
+            if state["error"] is not None:
                 self.status_label.config(text="✗ Error", fg=COLORS["accent_red"])
-                messagebox.showerror("Error", str(e))
+                messagebox.showerror("Error", str(state["error"]))
+                return
+            
+            success, message, files_encrypted = state["result"]
+            if success:
+                self.status_label.config(text=f"✓ {files_encrypted} file(s) locked", fg=COLORS["accent_green"])
+                messagebox.showinfo("Success", f"Locked {files_encrypted} file(s)")
+            else:
+                self.status_label.config(text="✗ Folder locking failed", fg=COLORS["accent_red"])
+                messagebox.showwarning("Warning", message)
         
         self.status_label.config(text="🔒 Encrypting folder...")
         thread = threading.Thread(target=encrypt_folder_thread, daemon=True)
         thread.start()
+        self.poll_progress(channel, progress_window, progress_label, progress_bar, on_finished)
     
     def unlock_file_action(self):
         """Handle unlock file action with threading"""
@@ -879,77 +1233,33 @@ class SecureFileLocker:
         if not file_path:
             return
         
-        # Verify password before decryption
-        password_dialog = tk.Toplevel(self.root)
-        password_dialog.title("Verify Password")
-        password_dialog.geometry("350x180")
-        password_dialog.resizable(False, False)
-        
-        # Center dialog
-        password_dialog.transient(self.root)
-        password_dialog.grab_set()
+        # The session already holds the password and its derived keys
+        credentials = self.session_credentials()
+        if credentials is None:
+            return
+        password, keyring = credentials
         
-        # Label
-        label = tk.Label(
-            password_dialog,
-            text="Enter password to unlock file",
-            font=("Segoe UI", 10),
-            padx=20,
-            pady=20
-        )
-        label.pack()
+        self.status_label.config(text="🔓 Decrypting file...")
+        self.root.update()
         
-        # Password entry
-        pwd_entry = tk.Entry(password_dialog, show="●", font=("Segoe UI", 11))
-        pwd_entry.pack(padx=20, pady=(0, 20), fill="x")
-        pwd_entry.focus()
-        
-        def verify_and_decrypt():
-            password = pwd_entry.get()
-            if auth.authenticate_user(password):
-                password_dialog.destroy()
-                self.status_label.config(text="🔓 Decrypting file...")
-                self.root.update()
-                
-                try:
-                    # Unhide file first
-                    crypto_utils.unhide_file_windows(file_path)
-                    
-                    # Decrypt the file
-                    if crypto_utils.decrypt_file(file_path, password):
-                        self.status_label.config(text="✓ File unlocked successfully", fg="#28a745")
-                        original_path = file_path[:-7]  # Remove .locked
-                        messagebox.showinfo(
-                            "Success",
-                            f"File unlocked successfully!\n\nOriginal file: {original_path}"
-                        )
-                    else:
-                        self.status_label.config(text="✗ File decryption failed", fg="#dc3545")
-                        messagebox.showerror("Error", "Failed to decrypt file")
-                except Exception as e:
-                    self.status_label.config(text="✗ An error occurred", fg="#dc3545")
-                    messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        try:
+            # Unhide file first
+            self.crypto.unhide_file_windows(file_path)
+            
+            # Decrypt the file
+            if self.crypto.decrypt_file(file_path, password, keyring=keyring, io_hints=self.io_hints):
+                self.status_label.config(text="✓ File unlocked successfully", fg="#28a745")
+                original_path = file_path[:-7]  # Remove .locked
+                messagebox.showinfo(
+                    "Success",
+                    f"File unlocked successfully!\n\nOriginal file: {original_path}"
+                )
             else:
-                messagebox.showerror("Error", "Incorrect password")
-                pwd_entry.delete(0, tk.END)
-                pwd_entry.focus()
-        
-        # Verify button
-        verify_btn = tk.Button(
-            password_dialog,
-            text="Unlock",
-            command=verify_and_decrypt,
-            font=("Segoe UI", 10, "bold"),
-            bg="#dc3545",
-            fg="white",
-            padx=20,
-            pady=8,
-            relief="flat"
-        )
-        verify_btn.pack(pady=10)
-        
-        # Bind Enter key
-        pwd_entry.bind("<Return>", lambda e: verify_and_decrypt())
+                self.status_label.config(text="✗ File decryption failed", fg="#dc3545")
+                messagebox.showerror("Error", "Failed to decrypt file (locked with a different password?)")
+        except Exception as e:
+            self.status_label.config(text="✗ An error occurred", fg="#dc3545")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
     def unlock_folder_action(self):
         """Handle unlock folder action with threading"""
@@ -971,182 +1281,249 @@ class SecureFileLocker:
             messagebox.showerror("Error", f"Not a folder: {folder_path}")
             return
         
-        # Count locked files
-        locked_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.locked'):
-                    locked_files.append(file)
-        
-        if not locked_files:
+        # An interrupted run is recovered before the new one starts
+        import journal
+        pending = journal.pending_operation(folder_path)
+        if pending:
+            messagebox.showinfo(
+                "Interrupted Operation",
+                f"An interrupted {pending} of this folder was found.\n\n"
+                "Files it was working on will be recovered first, and files it "
+                "already finished will not be processed again."
+            )
+        
+        # Scan the folder off the UI thread, then confirm
+        self.scan_folder_with_dialog(
+            folder_path,
+            "unlock",
+            lambda manifest: self.confirm_and_unlock_folder(folder_path, manifest)
+        )
+    
+    def confirm_and_unlock_folder(self, folder_path, manifest):
+        """Confirm and unlock a scanned folder with the session's keys"""
+        if len(manifest) == 0:
             messagebox.showwarning("Warning", "No locked files found")
             return
         
         # Confirm action
         confirm = messagebox.askyesno(
             "Confirm Unlock",
-            f"Unlock {len(locked_files)} file(s)?\n\n{folder_path}"
+            f"Unlock {len(manifest)} file(s) ({format_size(manifest.total_bytes)})?\n\n{folder_path}"
         )
         
         if not confirm:
             return
         
-        # Create password verification dialog
-        password_dialog = tk.Toplevel(self.root)
-        password_dialog.title("Verify Password")
-        password_dialog.geometry("350x180")
-        password_dialog.resizable(False, False)
-        password_dialog.configure(bg=COLORS["bg_primary"])
+        # Kept copies let the next lock skip files that did not change
+        keep_locked = messagebox.askyesno(
+            "Keep Locked Copies",
+            "Keep the locked copies next to the unlocked files?\n\n"
+            "The next lock then only re-encrypts files you changed."
+        )
+        
+        # The session already holds the password and its derived keys
+        credentials = self.session_credentials()
+        if credentials is None:
+            return
+        password, keyring = credentials
+        
+        # Create progress dialog
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Unlocking Folder")
+        progress_window.geometry("400x200")
+        progress_window.resizable(False, False)
+        progress_window.configure(bg=COLORS["bg_primary"])
         
         # Center dialog
-        password_dialog.transient(self.root)
-        password_dialog.grab_set()
+        progress_window.transient(self.root)
+        progress_window.grab_set()
         
-        # Label
-        label = tk.Label(
-            password_dialog,
-            text="Enter password",
-            font=("Segoe UI", 11),
+        # Title
+        title_label = tk.Label(
+            progress_window,
+            text="🔓 Unlocking folder...",
+            font=("Segoe UI", 12, "bold"),
             padx=20,
-            pady=20,
+            pady=10,
             bg=COLORS["bg_primary"],
             fg=COLORS["text_primary"]
         )
-        label.pack()
+        title_label.pack()
         
-        # Password entry
-        pwd_entry = tk.Entry(
-            password_dialog,
-            show="●",
-            font=("Segoe UI", 11),
-            bg=COLORS["bg_secondary"],
-            fg=COLORS["text_primary"],
-            border=1,
-            relief="solid",
-            insertbackground=COLORS["accent_blue"]
+        # Progress label
+        progress_label = tk.Label(
+            progress_window,
+            text="Starting...",
+            font=("Segoe UI", 10),
+            padx=20,
+            pady=5,
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_secondary"]
         )
-        pwd_entry.pack(padx=20, pady=(0, 20), fill="x", ipady=8)
-        pwd_entry.focus()
-        
-        def verify_and_decrypt_folder():
-            password = pwd_entry.get()
-            if auth.authenticate_user(password):
-                password_dialog.destroy()
-                
-                # Create progress dialog
-                progress_window = tk.Toplevel(self.root)
-                progress_window.title("Unlocking Folder")
-                progress_window.geometry("400x150")
-                progress_window.resizable(False, False)
-                progress_window.configure(bg=COLORS["bg_primary"])
-                
-                # Center dialog
-                progress_window.transient(self.root)
-                progress_window.grab_set()
-                
-                # Title
-                title_label = tk.Label(
-                    progress_window,
-                    text="🔓 Unlocking folder...",
-                    font=("Segoe UI", 12, "bold"),
-                    padx=20,
-                    pady=10,
-                    bg=COLORS["bg_primary"],
-                    fg=COLORS["text_primary"]
-                )
-                title_label.pack()
-                
-                # Progress label
-                progress_label = tk.Label(
-                    progress_window,
-                    text="Starting...",
-                    font=("Segoe UI", 10),
-                    padx=20,
-                    pady=5,
-                    bg=COLORS["bg_primary"],
-                    fg=COLORS["text_secondary"]
-                )
-                progress_label.pack()
-                
-                # Progress bar
-                progress_bar = tk.Label(
-                    progress_window,
-                    text="",
-                    font=("Segoe UI", 9),
-                    fg=COLORS["accent_red"],
-                    padx=20,
-                    pady=5,
-                    bg=COLORS["bg_primary"]
+        progress_label.pack()
+        
+        # Progress bar
+        progress_bar = tk.Label(
+            progress_window,
+            text="",
+            font=("Segoe UI", 9),
+            fg=COLORS["accent_red"],
+            padx=20,
+            pady=5,
+            bg=COLORS["bg_primary"]
+        )
+        progress_bar.pack()
+        
+        # Pause / Cancel controls, checked between chunks and files
+        control = self.crypto.JobControl()
+        self.create_job_controls(progress_window, control)
+        
+        # The worker publishes to the channel; only the UI thread touches Tk
+        channel = progress.ProgressChannel()
+        
+        # Run decryption in background thread
+        def decrypt_folder_thread():
+            try:
+                result = self.crypto.decrypt_folder(
+                    folder_path,
+                    password,
+                    jobs=self.jobs,
+                    manifest=manifest,
+                    keep_locked=keep_locked,
+                    control=control,
+                    progress=channel,
+                    keyring=keyring,
+                    durability=self.folder_durability,
+                    io_hints=self.io_hints
                 )
-                progress_bar.pack()
-                
-                # Callback for progress updates
-                def progress_callback(current, total, filename):
-                    try:
-                        progress_percent = int((current / total) * 100)
-                        progress_label.config(text=f"{filename[:40]}")
-                        progress_bar.config(text=f"{current}/{total} files • {progress_percent}%")
-                        progress_window.update()
-                    except:
-                        pass
-                
-                # Run decryption in background thread
-                def decrypt_folder_thread():
-                    try:
-                        success, message, files_decrypted = crypto_utils.decrypt_folder(
-                            folder_path,
-                            password,
-                            callback=progress_callback
-                        )
-                        
-                        try:
-                            progress_window.destroy()
-                        except:
-                            pass
-                        
-                        if success:
-                            self.status_label.config(text=f"✓ {files_decrypted} file(s) unlocked", fg=COLORS["accent_green"])
-                            messagebox.showinfo("Success", f"Unlocked {files_decrypted} file(s)")
-                        else:
-                            self.status_label.config(text="✗ Folder unlocking failed", fg=COLORS["accent_red"])
-                            messagebox.showwarning("Warning", message)
-                    except Exception as e:
-                        try:
-                            progress_window.destroy()
-                        except:
-                            pass
-                        self.status_label.config(text="✗ Error", fg=COLORS["accent_red"])
-                        messagebox.showerror("Error", str(e))
-                
-                self.status_label.config(text="🔓 Decrypting folder...")
-                thread = threading.Thread(target=decrypt_folder_thread, daemon=True)
-                thread.start()
+                channel.finish(result)
+            except Exception as e:
+                channel.finish(error=e)
+        
+        def on_finished(state):
+            if state["error"] is not None:
+                self.status_label.config(text="✗ Error", fg=COLORS["accent_red"])
+                messagebox.showerror("Error", str(state["error"]))
+                return
+            
+            success, message, files_decrypted = state["result"]
+            if success:
+                self.status_label.config(text=f"✓ {files_decrypted} file(s) unlocked", fg=COLORS["accent_green"])
+                messagebox.showinfo("Success", f"Unlocked {files_decrypted} file(s)")
             else:
-                messagebox.showerror("Error", "Incorrect password")
-                pwd_entry.delete(0, tk.END)
-                pwd_entry.focus()
-        
-        # Verify button
-        verify_btn = tk.Button(
-            password_dialog,
-            text="Unlock",
-            command=verify_and_decrypt_folder,
-            font=("Segoe UI", 11, "bold"),
-            bg=COLORS["accent_red"],
-            fg="white",
+                self.status_label.config(text="✗ Folder unlocking failed", fg=COLORS["accent_red"])
+                messagebox.showwarning("Warning", message)
+        
+        self.status_label.config(text="🔓 Decrypting folder...")
+        thread = threading.Thread(target=decrypt_folder_thread, daemon=True)
+        thread.start()
+        self.poll_progress(channel, progress_window, progress_label, progress_bar, on_finished)
+    
+    def poll_progress(self, channel, progress_window, progress_label, progress_bar, on_finished):
+        """Drain a progress channel into the dialog every PROGRESS_POLL_MS until the job ends"""
+        state = channel.snapshot()
+        
+        # A running job counts as activity for the idle timeout
+        if self.session is not None:
+            self.session.touch()
+        
+        try:
+            if state["files_total"]:
+                if state["bytes_total"]:
+                    percent = min(100, int(state["bytes_done"] * 100 / state["bytes_total"]))
+                else:
+                    percent = int(state["files_done"] * 100 / state["files_total"])
+                progress_label.config(text=f"{state['current_file'][:40]}")
+                text = (f"{state['files_done']}/{state['files_total']} files • "
+                        f"{format_size(state['bytes_done'])} • {percent}%")
+                if state["error_count"]:
+                    text += f" • {state['error_count']} error(s)"
+                progress_bar.config(text=text)
+        except tk.TclError:
+            pass
+        
+        if not state["finished"]:
+            self.root.after(progress.PROGRESS_POLL_MS, self.poll_progress,
+                            channel, progress_window, progress_label, progress_bar, on_finished)
+            return
+        
+        try:
+            progress_window.destroy()
+        except tk.TclError:
+            pass
+        on_finished(state)
+    
+    def scan_folder_with_dialog(self, folder_path, mode, on_done):
+        """Scan a folder in a background thread while a dialog shows running counts"""
+        scan_window = tk.Toplevel(self.root)
+        scan_window.title("Scanning Folder")
+        scan_window.geometry("400x120")
+        scan_window.resizable(False, False)
+        scan_window.configure(bg=COLORS["bg_primary"])
+        
+        # Center dialog
+        scan_window.transient(self.root)
+        scan_window.grab_set()
+        
+        # Title
+        title_label = tk.Label(
+            scan_window,
+            text="🔍 Scanning folder...",
+            font=("Segoe UI", 12, "bold"),
             padx=20,
-            pady=8,
-            relief="flat",
-            cursor="hand2",
-            activebackground="#E60C0C",
-            activeforeground="white",
-            border=0,
-            highlightthickness=0
+            pady=10,
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_primary"]
         )
-        verify_btn.pack(pady=10)
+        title_label.pack()
         
-        # Bind Enter key
-        pwd_entry.bind("<Return>", lambda e: verify_and_decrypt_folder())
+        # Count label
+        count_label = tk.Label(
+            scan_window,
+            text="0 files found",
+            font=("Segoe UI", 10),
+            padx=20,
+            pady=5,
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_secondary"]
+        )
+        count_label.pack()
+        
+        # Shared with the scan thread - the Tk widgets are only touched here
+        state = {"files": 0, "bytes": 0, "manifest": None, "error": None}
+        
+        def scan_progress(files_found, total_bytes):
+            state["files"] = files_found
+            state["bytes"] = total_bytes
+        
+        def scan_thread():
+            try:
+                state["manifest"] = self.crypto.scan_folder(folder_path, mode, callback=scan_progress)
+            except Exception as e:
+                state["error"] = e
+        
+        def poll():
+            try:
+                count_label.config(text=f"{state['files']} files found • {format_size(state['bytes'])}")
+            except tk.TclError:
+                pass
+            
+            if state["manifest"] is None and state["error"] is None:
+                self.root.after(100, poll)
+                return
+            
+            try:
+                scan_window.destroy()
+            except tk.TclError:
+                pass
+            
+            if state["error"] is not None:
+                messagebox.showerror("Error", f"Could not scan folder: {state['error']}")
+            else:
+                on_done(state["manifest"])
+        
+        threading.Thread(target=scan_thread, daemon=True).start()
+        self.root.after(100, poll)
     
     def show_change_password_inline(self, parent_frame):
         """Show change password panel inline on the dashboard"""
@@ -1280,17 +1657,22 @@ class SecureFileLocker:
                 new_pwd_entry.focus()
                 return
             
-            # Attempt to change password
-            success, message = auth.change_master_password(current_pwd, new_pwd)
+            # Attempt to change password (re-wrapping runs the KDF)
+            def change_password():
+                return auth.change_master_password(current_pwd, new_pwd, self.calibrated_kdf_params())
             
-            if success:
-                self.current_password = new_pwd
-                messagebox.showinfo("Success", message)
-                self.show_dashboard()
-            else:
-                messagebox.showerror("Error", message)
-                current_pwd_entry.delete(0, tk.END)
-                current_pwd_entry.focus()
+            def on_done(result):
+                success, message = result
+                if success:
+                    self.start_session(new_pwd)
+                    messagebox.showinfo("Success", message)
+                    self.show_dashboard()
+                else:
+                    messagebox.showerror("Error", message)
+                    current_pwd_entry.delete(0, tk.END)
+                    current_pwd_entry.focus()
+            
+            self.run_password_job("🔑 Changing master password...", change_password, on_done)
         
         # Button frame
         button_frame = tk.Frame(parent_frame, bg=COLORS["bg_primary"], highlightthickness=0)
@@ -1462,17 +1844,22 @@ class SecureFileLocker:
                 new_pwd_entry.focus()
                 return
             
-            # Attempt to change password
-            success, message = auth.change_master_password(current_pwd, new_pwd)
+            # Attempt to change password (re-wrapping runs the KDF)
+            def change_password():
+                return auth.change_master_password(current_pwd, new_pwd, self.calibrated_kdf_params())
             
-            if success:
-                self.current_password = new_pwd
-                messagebox.showinfo("Success", message)
-                change_pwd_dialog.destroy()
-            else:
-                messagebox.showerror("Error", message)
-                current_pwd_entry.delete(0, tk.END)
-                current_pwd_entry.focus()
+            def on_done(result):
+                success, message = result
+                if success:
+                    self.start_session(new_pwd)
+                    messagebox.showinfo("Success", message)
+                    change_pwd_dialog.destroy()
+                else:
+                    messagebox.showerror("Error", message)
+                    current_pwd_entry.delete(0, tk.END)
+                    current_pwd_entry.focus()
+            
+            self.run_password_job("🔑 Changing master password...", change_password, on_done)
         
         # Button frame
         button_frame = tk.Frame(content_frame, bg=COLORS["bg_primary"], highlightthickness=0)
@@ -1522,10 +1909,119 @@ class SecureFileLocker:
         confirm_pwd_entry.bind("<Return>", lambda e: perform_password_change())
 
 
+def preload_crypto():
+    """Import crypto_utils in the background (--preload-crypto)"""
+    def load():
+        try:
+            import crypto_utils  # noqa: F401
+        except Exception as e:
+            print(f"Warning: Could not preload crypto_utils: {e}")
+    
+    threading.Thread(target=load, daemon=True).start()
+
+
+def durability_mode(value):
+    """argparse type for --durability (durability.py is only imported when it is given)"""
+    import argparse
+    import durability
+    if value not in durability.DURABILITY_MODES:
+        raise argparse.ArgumentTypeError(
+            f"invalid choice: {value!r} (choose from {', '.join(durability.DURABILITY_MODES)})")
+    return value
+
+
 def main():
     """Main entry point"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Secure File Locker")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker threads for folder lock/unlock (default: CPU count, up to 32)"
+    )
+    parser.add_argument(
+        "--session-timeout",
+        type=float,
+        default=session.DEFAULT_IDLE_TIMEOUT / 60,
+        help="minutes of inactivity before logging out (0: never; default: %(default)g)"
+    )
+    parser.add_argument(
+        "--kdf",
+        choices=kdf.available_kdfs(),
+        default=None,
+        help="key derivation function to calibrate when a password is set or changed "
+             f"(default: {kdf.DEFAULT_KDF} for a new password, else keep the current one)"
+    )
+    parser.add_argument(
+        "--kdf-target-ms",
+        type=float,
+        default=kdf.DEFAULT_TARGET_SECONDS * 1000,
+        help="wanted time per key derivation when calibrating (default: %(default)g)"
+    )
+    parser.add_argument(
+        "--shred",
+        choices=secure_delete.SHRED_MODES,
+        default=secure_delete.DEFAULT_SHRED_MODE,
+        help="how originals are deleted after locking; use trim on SSDs (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--background-shred",
+        action="store_true",
+        help="hide originals at once and shred them in a background worker"
+    )
+    parser.add_argument(
+        "--durability",
+        type=durability_mode,
+        default=None,
+        metavar="{file,batch,none}",
+        help="when folder outputs are synced to disk: each file, in batches, or never (default: file)"
+    )
+    parser.add_argument(
+        "--bulk-io",
+        action="store_true",
+        help="keep large jobs out of the page cache and preallocate outputs (Linux)"
+    )
+    parser.add_argument(
+        "--preload-crypto",
+        action="store_true",
+        help="import the crypto libraries in the background after the window appears, "
+             "instead of on the first lock or unlock"
+    )
+    parser.add_argument(
+        "--measure-startup",
+        action="store_true",
+        help="print the time to first window as JSON and exit"
+    )
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = SecureFileLocker(root)
+    app = SecureFileLocker(
+        root,
+        jobs=args.jobs,
+        session_timeout=args.session_timeout * 60,
+        kdf_name=args.kdf,
+        kdf_target=args.kdf_target_ms / 1000,
+        shred_mode=args.shred,
+        background_shred=args.background_shred,
+        durability_mode=args.durability,
+        bulk_io=args.bulk_io
+    )
+    
+    if args.measure_startup:
+        # Draw the first window, report and exit
+        root.update()
+        import json
+        print(json.dumps({
+            "time_to_first_window_ms": round((time.perf_counter() - STARTUP_TIME) * 1000, 1),
+            "crypto_loaded": "crypto_utils" in sys.modules,
+        }))
+        root.destroy()
+        return
+    
+    # Optionally warm up the crypto imports while the user types the password
+    if args.preload_crypto:
+        root.after(500, preload_crypto)
     root.mainloop()
 
 
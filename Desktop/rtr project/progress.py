@@ -0,0 +1,114 @@
+"""
+progress.py - Progress Channel Module
+Thread-safe progress state shared between folder workers and the UI
+Workers publish without waiting on the UI; the UI polls snapshots at its own rate
+"""
+
+import os
+import threading
+
+# How often the UI drains a ProgressChannel (milliseconds)
+PROGRESS_POLL_MS = 100
+
+
+class ProgressChannel:
+    """
+    Progress of one folder job: files done, bytes processed, the current
+    file and errors.
+    
+    Workers update a few counters under a short lock and never touch the
+    UI, so publishing costs next to nothing per chunk or per file. Updates
+    are coalesced: the UI reads the latest state with snapshot() on a
+    timer (root.after), however many updates happened in between. When the
+    job ends, the worker calls finish() with its result and the UI picks it
+    up on its next poll.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.current_file = ""
+        self.errors = []
+        self.finished = False
+        self.result = None
+        self.error = None
+        self._errors_read = 0
+    
+    def begin(self, files_total: int, bytes_total: int) -> None:
+        """Set the totals once the job knows what it will process."""
+        with self._lock:
+            self.files_total = files_total
+            self.bytes_total = bytes_total
+    
+    def file_callback(self, file_path: str):
+        """
+        Return a progress_callback(bytes_done, total_bytes) for one file.
+        
+        The per-file running total is turned into increments of the job's
+        bytes_done.
+        """
+        name = os.path.basename(file_path)
+        last = [0]
+        
+        def callback(bytes_done, total_bytes):
+            with self._lock:
+                self.bytes_done += bytes_done - last[0]
+                self.current_file = name
+            last[0] = bytes_done
+        
+        return callback
+    
+    def file_done(self, file_path: str, success: bool = True) -> None:
+        """Count a finished file (a failed file is also recorded as an error)."""
+        name = os.path.basename(file_path)
+        with self._lock:
+            self.files_done += 1
+            self.current_file = name
+            if not success:
+                self.errors.append(name)
+    
+    def add_error(self, message: str) -> None:
+        """Record an error message."""
+        with self._lock:
+            self.errors.append(message)
+    
+    def finish(self, result=None, error=None) -> None:
+        """
+        Mark the job as ended.
+        
+        Args:
+            result: The job's return value
+            error: Exception that stopped the job, if any
+        """
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.finished = True
+    
+    def snapshot(self) -> dict:
+        """
+        Return the current state for display.
+        
+        Returns:
+            Dictionary with files_done, files_total, bytes_done, bytes_total,
+            current_file, new_errors (errors since the last snapshot),
+            error_count, finished, result and error
+        """
+        with self._lock:
+            new_errors = self.errors[self._errors_read:]
+            self._errors_read = len(self.errors)
+            return {
+                "files_done": self.files_done,
+                "files_total": self.files_total,
+                "bytes_done": self.bytes_done,
+                "bytes_total": self.bytes_total,
+                "current_file": self.current_file,
+                "new_errors": new_errors,
+                "error_count": len(self.errors),
+                "finished": self.finished,
+                "result": self.result,
+                "error": self.error,
+            }
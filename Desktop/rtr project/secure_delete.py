@@ -0,0 +1,119 @@
+"""
+secure_delete.py - Secure Delete Module
+Removes plaintext originals after locking, with a selectable cost: plain
+unlink, one streamed overwrite pass, several passes, or a trim-aware
+unlink for SSDs and copy-on-write filesystems
+"""
+
+import os
+import time
+
+# Delete modes
+#   none:   unlink only
+#   single: one pass of random data, then unlink
+#   multi:  one pass per MULTI_PASS_PATTERNS entry, then unlink
+#   trim:   truncate to zero and unlink, so the filesystem can discard the
+#           blocks. Overwriting is pointless on SSDs and copy-on-write
+#           filesystems, which write the new data to other blocks anyway.
+SHRED_NONE = "none"
+SHRED_SINGLE = "single"
+SHRED_MULTI = "multi"
+SHRED_TRIM = "trim"
+SHRED_MODES = (SHRED_NONE, SHRED_SINGLE, SHRED_MULTI, SHRED_TRIM)
+DEFAULT_SHRED_MODE = SHRED_SINGLE
+
+# Size of the overwrite buffer. One buffer is filled per pass and written
+# over the whole file, so memory stays at this size whatever the file size.
+SHRED_CHUNK_SIZE = 1024 * 1024
+
+# Patterns written by the multi-pass mode, in order (None: random data)
+MULTI_PASS_PATTERNS = (b"\x00", b"\xff", None)
+
+
+class ShredResult:
+    """
+    Outcome and cost of deleting one file.
+    
+    Attributes:
+        ok: True if the file was removed (even if the overwrite failed)
+        mode: Mode used
+        seconds: Wall time including the overwrite, sync and unlink
+        bytes_written: Bytes written over the file (0 for none and trim)
+    """
+    
+    def __init__(self, ok: bool, mode: str, seconds: float, bytes_written: int):
+        self.ok = ok
+        self.mode = mode
+        self.seconds = seconds
+        self.bytes_written = bytes_written
+
+
+def _overwrite_pass(f, size: int, pattern: bytes = None) -> int:
+    """
+    Write one pass over the first size bytes of an open file and sync it.
+    
+    Returns:
+        Bytes written
+    """
+    length = min(SHRED_CHUNK_SIZE, size)
+    buffer = os.urandom(length) if pattern is None else pattern * length
+    view = memoryview(buffer)
+    f.seek(0)
+    remaining = size
+    while remaining > 0:
+        n = min(length, remaining)
+        f.write(view[:n])
+        remaining -= n
+    f.flush()
+    # Otherwise the dirty pages can be dropped with the unlinked file and
+    # the old blocks are never overwritten
+    os.fsync(f.fileno())
+    return size
+
+
+def _truncate(file_path: str) -> None:
+    """Release the file's blocks before unlinking (see SHRED_TRIM)."""
+    with open(file_path, 'r+b') as f:
+        f.truncate(0)
+        os.fsync(f.fileno())
+
+
+def shred_file(file_path: str, mode: str = DEFAULT_SHRED_MODE) -> ShredResult:
+    """
+    Delete a file using one of SHRED_MODES.
+    
+    Args:
+        file_path: File to delete
+        mode: Delete mode (default: DEFAULT_SHRED_MODE)
+    
+    Returns:
+        ShredResult with the time and bytes the mode cost
+    
+    Raises:
+        ValueError: If mode is unknown
+    """
+    if mode not in SHRED_MODES:
+        raise ValueError(f"Unknown secure delete mode: {mode}")
+    
+    start = time.perf_counter()
+    bytes_written = 0
+    try:
+        if mode in (SHRED_SINGLE, SHRED_MULTI):
+            size = os.path.getsize(file_path)
+            patterns = MULTI_PASS_PATTERNS if mode == SHRED_MULTI else (None,)
+            with open(file_path, 'r+b') as f:
+                for pattern in patterns:
+                    bytes_written += _overwrite_pass(f, size, pattern)
+        elif mode == SHRED_TRIM:
+            _truncate(file_path)
+    except OSError as e:
+        print(f"Warning: Could not securely delete original file: {e}")
+    
+    # Still remove the file if the overwrite failed
+    try:
+        os.remove(file_path)
+        ok = True
+    except OSError as e:
+        print(f"Warning: Could not remove original file: {e}")
+        ok = False
+    return ShredResult(ok, mode, time.perf_counter() - start, bytes_written)
@@ -0,0 +1,132 @@
+"""
+session.py - Unlocked Session Module
+Keeps the master password's derived keys in memory after login, so
+lock and unlock operations skip the password prompt and PBKDF2, until
+the session has been idle for too long
+"""
+
+import threading
+import time
+
+import auth
+
+# Idle time after which a session expires (seconds)
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+
+# How often the UI checks whether the session expired (milliseconds)
+SESSION_CHECK_MS = 5000
+
+
+class SessionExpired(Exception):
+    """Raised when an expired or closed session is used."""
+
+
+class Session:
+    """
+    Authenticated session created at login.
+    
+    Holds the password and one crypto_utils.KeyRing. Master keys are
+    derived at most once per salt for the whole session, so repeated
+    operations only pay for the cheap per-file HKDF step. Every use resets
+    the idle timer; once the session has been idle for idle_timeout
+    seconds it is closed and drops its key material.
+    
+    Safe to share between threads.
+    """
+    
+    def __init__(self, password: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 kdf_params: dict = None):
+        """
+        Args:
+            password: Master password, already authenticated by the caller
+            idle_timeout: Seconds without use before the session expires
+                (0 or None: never)
+            kdf_params: KDF parameters for new locked files (default:
+                kdf.DEFAULT_PARAMS)
+        """
+        self.idle_timeout = idle_timeout
+        self.kdf_params = kdf_params
+        self._password = password
+        self._master_key = None
+        self._keyring = None
+        self._lock = threading.Lock()
+        self._last_used = time.monotonic()
+    
+    def _check(self) -> None:
+        # Called with the lock held
+        if self._password is not None and self.idle_timeout:
+            if time.monotonic() - self._last_used > self.idle_timeout:
+                self._close()
+        if self._password is None:
+            raise SessionExpired("Session expired")
+    
+    def _close(self) -> None:
+        # Python cannot wipe immutable bytes; dropping the references lets
+        # them be freed. Jobs already running keep their own reference.
+        self._password = None
+        self._master_key = None
+        self._keyring = None
+    
+    @property
+    def expired(self) -> bool:
+        """True once the session was closed or has been idle for too long."""
+        with self._lock:
+            try:
+                self._check()
+            except SessionExpired:
+                return True
+            return False
+    
+    def touch(self) -> None:
+        """Reset the idle timer, e.g. while a long job is running."""
+        with self._lock:
+            if self._password is not None:
+                self._last_used = time.monotonic()
+    
+    def credentials(self) -> tuple:
+        """
+        Return the password and the session's key ring for an operation.
+        
+        Returns:
+            Tuple of (password: str, keyring: crypto_utils.KeyRing)
+        
+        Raises:
+            SessionExpired: If the session is closed or idle for too long
+            ValueError: If the password does not unwrap the key store
+        """
+        with self._lock:
+            self._check()
+            if self._keyring is None:
+                # Loaded on first use so creating a session does not wait for pycryptodome
+                import crypto_utils
+                if self._master_key is None:
+                    self._master_key = auth.open_master_key(self._password)
+                self._keyring = crypto_utils.KeyRing(self._password, self.kdf_params, self._master_key)
+            self._last_used = time.monotonic()
+            return self._password, self._keyring
+    
+    def warm_up(self) -> None:
+        """
+        Unwrap the key store now, so the first lock of the session does not
+        wait for it. crypto_utils is still imported on the first lock or
+        unlock; only without a master password is the password-derived key
+        derived here, through the key ring. Meant for a background thread
+        right after login.
+        """
+        try:
+            with self._lock:
+                self._check()
+                if self._keyring is not None or self._master_key is not None:
+                    return
+                self._master_key = auth.open_master_key(self._password)
+                if self._master_key is not None:
+                    return
+            _, keyring = self.credentials()
+        except (SessionExpired, ValueError):
+            return
+        keyring.encryption_key()
+    
+    def close(self) -> None:
+        """End the session (log out)."""
+        with self._lock:
+            self._close()
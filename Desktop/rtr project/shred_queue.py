@@ -0,0 +1,292 @@
+"""
+shred_queue.py - Background Shred Queue Module
+Takes the secure delete of originals off the lock path: each original is
+renamed out of sight at once, then overwritten and unlinked later by a
+low-priority worker thread. The queue is kept in a file and survives restarts
+"""
+
+import json
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+
+from file_hiding import get_hide_backend
+from secure_delete import shred_file, DEFAULT_SHRED_MODE, SHRED_MODES
+
+# Queue file name, kept in the per-user app data folder (see default_queue_path)
+SHRED_QUEUE_FILE = "shred_queue.jsonl"
+
+# App data folder name (Windows: %LOCALAPPDATA%, macOS: Application
+# Support, elsewhere $XDG_DATA_HOME or ~/.local/share)
+APP_DATA_NAME = "SecureFileLocker"
+
+# Queued originals are renamed to this prefix + a random id in their own
+# folder. It starts with crypto_utils.METADATA_PREFIX, so folder scans skip it.
+SHRED_PREFIX = ".sfl_shred_"
+
+# The queue file is rewritten without finished entries after this many lines
+COMPACT_LINES = 1000
+
+# Nice value of the worker thread on Linux (the I/O priority follows it)
+BACKGROUND_NICE = 19
+
+# SetThreadPriority mode that lowers CPU, I/O and memory priority (Windows)
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+def default_queue_path() -> str:
+    """
+    Return the queue file in the per-user app data folder.
+    
+    The path does not depend on the working directory, so every run finds
+    the files queued by earlier runs.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, APP_DATA_NAME, SHRED_QUEUE_FILE)
+
+
+def _lower_thread_priority() -> None:
+    """Run the calling thread at background priority where the OS allows it."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            
+            kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+            kernel32.GetCurrentThread.restype = wintypes.HANDLE
+            kernel32.SetThreadPriority.argtypes = [wintypes.HANDLE, ctypes.c_int]
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+        elif sys.platform.startswith("linux"):
+            # The nice value is per thread on Linux
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICE)
+    except (OSError, AttributeError):
+        pass
+
+
+class ShredQueue:
+    """
+    Persistent queue of originals waiting to be shredded, with one worker.
+    
+    The queue file is append-only JSON lines: an "add" line with the hidden
+    path, mode and size when a file is queued, and a "done" line once it is
+    gone. Original names are not recorded, so the queue does not list the
+    plaintext files. The add line is synced before the file is renamed and
+    hidden, so after a crash every renamed file is in the queue; an entry
+    whose rename never happened is dropped and its original stays where it
+    was, as if it had not been queued.
+    
+    Files are shredded one at a time, in the order they were queued. A
+    file whose shred was cut short by a crash is shredded again from the
+    start on the next run.
+    """
+    
+    def __init__(self, queue_path: str = None):
+        """
+        Load the entries a previous run left unfinished.
+        
+        Args:
+            queue_path: Queue file, created on first use (default:
+                default_queue_path())
+        """
+        self.queue_path = queue_path or default_queue_path()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = OrderedDict()
+        self._pending_bytes = 0
+        self._file = None
+        self._lines = 0
+        self._thread = None
+        self._started = False
+        self._stopping = False
+        self._load()
+    
+    def _load(self) -> None:
+        if not os.path.exists(self.queue_path):
+            return
+        with open(self.queue_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                if "add" in record:
+                    self._pending[record["add"]] = record
+                elif "done" in record:
+                    self._pending.pop(record["done"], None)
+        
+        # Queued but never renamed: the original was not touched
+        for entry_id in [entry_id for entry_id, entry in self._pending.items()
+                         if not os.path.exists(entry["path"])]:
+            del self._pending[entry_id]
+        self._pending_bytes = sum(entry["size"] for entry in self._pending.values())
+        self._compact()
+    
+    def _compact(self) -> None:
+        # Called with the lock held (or before the worker starts)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._lines = 0
+        if not self._pending:
+            if os.path.exists(self.queue_path):
+                os.remove(self.queue_path)
+            return
+        temp_path = self.queue_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self._pending.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.queue_path)
+        self._lines = len(self._pending)
+    
+    def _append(self, record: dict, sync: bool = False) -> None:
+        # Called with the lock held
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.queue_path) or ".", exist_ok=True)
+            self._file = open(self.queue_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+        self._lines += 1
+    
+    def enqueue(self, file_path: str, mode: str = DEFAULT_SHRED_MODE) -> bool:
+        """
+        Hide a file under a SHRED_PREFIX name and queue it for shredding.
+        
+        The renamed file is also hidden with the platform's hide backend,
+        since a leading dot does not hide anything on Windows.
+        
+        Args:
+            file_path: Original to delete
+            mode: One of secure_delete.SHRED_MODES
+        
+        Returns:
+            True if the file was queued, False if it could not be renamed
+            (the caller should delete it itself)
+        
+        Raises:
+            ValueError: If mode is unknown
+        """
+        if mode not in SHRED_MODES:
+            raise ValueError(f"Unknown secure delete mode: {mode}")
+        
+        file_path = os.path.abspath(file_path)
+        entry_id = uuid.uuid4().hex
+        entry = {
+            "add": entry_id,
+            "path": os.path.join(os.path.dirname(file_path), SHRED_PREFIX + entry_id),
+            "mode": mode,
+            "size": 0,
+        }
+        with self._lock:
+            try:
+                entry["size"] = os.path.getsize(file_path)
+                self._append(entry, sync=True)
+            except OSError as e:
+                print(f"Warning: Could not queue {file_path} for shredding: {e}")
+                return False
+            try:
+                # Same folder, so the rename is atomic and the data stays put
+                os.rename(file_path, entry["path"])
+            except OSError as e:
+                self._append({"done": entry_id})
+                print(f"Warning: Could not queue {file_path} for shredding: {e}")
+                return False
+            # Only advice: a visible renamed file is shredded all the same
+            get_hide_backend().hide_many([entry["path"]])
+            self._pending[entry_id] = entry
+            self._pending_bytes += entry["size"]
+            self._start_worker()
+            self._changed.notify_all()
+        return True
+    
+    def backlog(self) -> tuple:
+        """
+        Return what is still waiting to be shredded.
+        
+        Returns:
+            Tuple of (files: int, bytes: int)
+        """
+        with self._lock:
+            return len(self._pending), self._pending_bytes
+    
+    def start(self) -> None:
+        """
+        Start shredding. The worker thread is spawned once there is
+        something to shred: at once for entries left by earlier runs,
+        otherwise on the first enqueue().
+        """
+        with self._lock:
+            self._started = True
+            self._stopping = False
+            self._start_worker()
+    
+    def _start_worker(self) -> None:
+        # Called with the lock held
+        if self._started and self._pending and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shred-queue", daemon=True)
+            self._thread.start()
+    
+    def _run(self) -> None:
+        _lower_thread_priority()
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._changed.wait()
+                if self._stopping:
+                    return
+                entry_id, entry = next(iter(self._pending.items()))
+            
+            if os.path.exists(entry["path"]):
+                result = shred_file(entry["path"], entry["mode"])
+                if not result.ok:
+                    print(f"Warning: Could not shred queued file {entry['path']}")
+            
+            with self._lock:
+                del self._pending[entry_id]
+                self._pending_bytes -= entry["size"]
+                try:
+                    self._append({"done": entry_id})
+                    if self._lines >= COMPACT_LINES or not self._pending:
+                        self._compact()
+                except OSError as e:
+                    print(f"Warning: Could not update shred queue: {e}")
+                self._changed.notify_all()
+    
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until the queue is empty (start() must have been called).
+        
+        Returns:
+            True if the queue is empty, False if timeout ran out first
+        """
+        with self._lock:
+            return self._changed.wait_for(lambda: not self._pending, timeout)
+    
+    def stop(self) -> None:
+        """
+        Stop the worker after the file it is shredding. Files still queued
+        stay in the queue file for the next run.
+        """
+        with self._lock:
+            self._started = False
+            self._stopping = True
+            self._changed.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -5,11 +5,41 @@ Run this to verify the application setup is correct
 
 import sys
 import os
+import tempfile
 
 print("=" * 60)
 print("SECURE FILE LOCKER - APPLICATION VERIFICATION")
 print("=" * 60)
 
+# Failed checks; any failure makes the script exit with status 1
+failures = 0
+
+
+def write_files(folder, count, size=1000):
+    """
+    Create count files of random data in a folder.
+    
+    Returns:
+        Dictionary of file name -> contents
+    """
+    contents = {}
+    for i in range(count):
+        name = f"file{i}.bin"
+        contents[name] = os.urandom(size)
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(contents[name])
+    return contents
+
+
+def read_files(folder, names):
+    """Return a dictionary of file name -> contents for files in a folder."""
+    contents = {}
+    for name in names:
+        with open(os.path.join(folder, name), 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+
 # Test 1: Check Python version
 print(f"\n✓ Python Version: {sys.version}")
 
@@ -71,14 +101,814 @@ try:
         print("  ✓ Correct password verified successfully")
     else:
         print("  ✗ Correct password verification failed")
+        failures += 1
     
     # Verify wrong password
     if not auth.verify_password("WrongPassword", hashed):
         print("  ✓ Wrong password correctly rejected")
     else:
         print("  ✗ Wrong password verification failed")
+        failures += 1
 except Exception as e:
     print(f"  ✗ Password hashing test failed: {e}")
+    failures += 1
+
+# Test 5: Test file encryption round-trip
+print("\n🧪 Testing File Encryption...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "sample.bin")
+        # Spans several chunks and ends on a partial block
+        test_data = os.urandom(crypto_utils.CHUNK_SIZE * 2 + 7)
+        with open(test_file, 'wb') as f:
+            f.write(test_data)
+
+        if crypto_utils.encrypt_file(test_file, test_password):
+            print("  ✓ File encrypted successfully")
+        else:
+            print("  ✗ File encryption failed")
+            failures += 1
+
+        if crypto_utils.decrypt_file(test_file + ".locked", test_password):
+            with open(test_file, 'rb') as f:
+                if f.read() == test_data:
+                    print("  ✓ Decrypted file matches original")
+                else:
+                    print("  ✗ Decrypted file does not match original")
+                    failures += 1
+        else:
+            print("  ✗ File decryption failed")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ File encryption test failed: {e}")
+    failures += 1
+
+# Test 6: One key derivation per folder operation
+print("\n🧪 Testing Shared Key Ring...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        keyring = crypto_utils.KeyRing(test_password)
+        salts = set()
+        for i in range(3):
+            test_file = os.path.join(temp_dir, f"file{i}.txt")
+            with open(test_file, 'wb') as f:
+                f.write(os.urandom(100))
+            crypto_utils.encrypt_file(test_file, test_password, keyring=keyring)
+            with open(test_file + ".locked", 'rb') as f:
+                salts.add(crypto_utils._read_header(f)["salt"])
+
+        if len(salts) == 1:
+            print("  ✓ Files locked with one key ring share one master key")
+        else:
+            print("  ✗ Files locked with one key ring use different master keys")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Shared key ring test failed: {e}")
+    failures += 1
+
+# Test 7: Parallel folder lock and unlock
+print("\n🧪 Testing Parallel Folder Locking...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder_data = write_files(temp_dir, 20)
+
+        success, message, count = crypto_utils.encrypt_folder(temp_dir, test_password, jobs=4)
+        if success and count == 20:
+            print("  ✓ Folder locked with 4 jobs")
+        else:
+            print(f"  ✗ Parallel folder lock failed: {message}")
+            failures += 1
+
+        success, message, count = crypto_utils.decrypt_folder(temp_dir, test_password, jobs=4)
+        if success and count == 20 and read_files(temp_dir, folder_data) == folder_data:
+            print("  ✓ Folder unlocked with 4 jobs and all files match")
+        else:
+            print(f"  ✗ Parallel folder unlock failed: {message}")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Parallel folder test failed: {e}")
+    failures += 1
+
+# Test 8: Authenticated cipher modes
+print("\n🧪 Testing Authenticated Encryption...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_data = os.urandom(crypto_utils.CHUNK_SIZE + 100)
+        for algorithm in crypto_utils.AEAD_ALGORITHMS:
+            test_file = os.path.join(temp_dir, f"{algorithm}.bin")
+            with open(test_file, 'wb') as f:
+                f.write(test_data)
+            crypto_utils.encrypt_file(test_file, test_password, algorithm=algorithm)
+            with open(test_file + ".locked", 'rb') as f:
+                header = crypto_utils._read_header(f)
+            # Version 3 is the chunked AEAD layout
+            if header["version"] != 3 or header["alg"] != algorithm:
+                print(f"  ✗ Unexpected header for {algorithm}: {header}")
+                failures += 1
+            elif crypto_utils.decrypt_file(test_file + ".locked", test_password) and \
+                    open(test_file, 'rb').read() == test_data:
+                print(f"  ✓ {algorithm} round trip succeeded")
+            else:
+                print(f"  ✗ {algorithm} round trip failed")
+                failures += 1
+
+        # Flip one ciphertext byte: the tag check must reject the file
+        test_file = os.path.join(temp_dir, "tampered.bin")
+        with open(test_file, 'wb') as f:
+            f.write(test_data)
+        crypto_utils.encrypt_file(test_file, test_password)
+        with open(test_file + ".locked", 'r+b') as f:
+            f.seek(-40, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 1]))
+        if not crypto_utils.decrypt_file(test_file + ".locked", test_password):
+            print("  ✓ Tampered file correctly rejected")
+        else:
+            print("  ✗ Tampered file was decrypted")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Authenticated encryption test failed: {e}")
+    failures += 1
+
+# Test 9: Wrong password rejection
+print("\n🧪 Testing Wrong Password Rejection...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "secret.txt")
+        with open(test_file, 'wb') as f:
+            f.write(b"secret data")
+        crypto_utils.encrypt_file(test_file, test_password)
+
+        if not crypto_utils.verify_file_key(test_file + ".locked", "WrongPassword"):
+            print("  ✓ Wrong password rejected from the header")
+        else:
+            print("  ✗ Wrong password accepted by verify_file_key")
+            failures += 1
+
+        if (not crypto_utils.decrypt_file(test_file + ".locked", "WrongPassword") and
+                not os.path.exists(test_file) and os.path.exists(test_file + ".locked")):
+            print("  ✓ Wrong password wrote no output and kept the locked file")
+        else:
+            print("  ✗ Wrong password decryption left the files in a bad state")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Wrong password test failed: {e}")
+    failures += 1
+
+# Test 10: Random-access reads
+print("\n🧪 Testing Random-Access Reads...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "large.bin")
+        test_data = os.urandom(crypto_utils.CHUNK_SIZE * 3)
+        with open(test_file, 'wb') as f:
+            f.write(test_data)
+        crypto_utils.encrypt_file(test_file, test_password)
+
+        # The slice spans a chunk boundary
+        offset = crypto_utils.CHUNK_SIZE * 2 - 10
+        with crypto_utils.open_locked(test_file + ".locked", test_password) as reader:
+            reader.seek(offset)
+            if reader.read(20) == test_data[offset:offset + 20]:
+                print("  ✓ Seek and read returned the right plaintext")
+            else:
+                print("  ✗ Seek and read returned the wrong plaintext")
+                failures += 1
+
+        # Without its index trailer the file is treated as damaged
+        with open(test_file + ".locked", 'r+b') as f:
+            f.truncate(f.seek(0, os.SEEK_END) - 12)
+        try:
+            crypto_utils.open_locked(test_file + ".locked", test_password).close()
+            print("  ✗ File without a chunk index opened")
+            failures += 1
+        except ValueError:
+            print("  ✓ File without a chunk index rejected")
+except Exception as e:
+    print(f"  ✗ Random-access read test failed: {e}")
+    failures += 1
+
+# Test 11: File hiding backend
+print("\n🧪 Testing File Hiding...")
+try:
+    import file_hiding
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "visible.txt")
+        with open(test_file, 'wb') as f:
+            f.write(b"data")
+
+        backend = file_hiding.get_hide_backend("dotprefix")
+        hidden_path = backend.hide(test_file)
+        if os.path.basename(hidden_path).startswith(file_hiding.DOT_PREFIX) and not os.path.exists(test_file):
+            print("  ✓ File hidden")
+        else:
+            print("  ✗ File was not hidden")
+            failures += 1
+
+        if backend.unhide(hidden_path) == test_file and os.path.exists(test_file):
+            print("  ✓ File unhidden")
+        else:
+            print("  ✗ File was not unhidden")
+            failures += 1
+
+        # Hiding the root with a renaming backend must not move the folder
+        folder = os.path.join(temp_dir, "root")
+        os.makedirs(folder)
+        files = write_files(folder, 2)
+        crypto_utils.encrypt_folder(folder, test_password, hide_backend="dotprefix", hide_root=True)
+        if os.path.isdir(folder) and not any(name in os.listdir(folder) for name in files):
+            print("  ✓ Root-hidden folder keeps its path")
+        else:
+            print("  ✗ Root-hidden folder was moved")
+            failures += 1
+        success, message, _ = crypto_utils.decrypt_folder(folder, test_password, hide_backend="dotprefix")
+        if success and read_files(folder, files) == files:
+            print("  ✓ Root-hidden folder unlocked at its path")
+        else:
+            print(f"  ✗ Root-hidden folder did not unlock: {message}")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ File hiding test failed: {e}")
+    failures += 1
+
+# Test 12: Folder scan manifest
+print("\n🧪 Testing Folder Scan...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.makedirs(os.path.join(temp_dir, "sub"))
+        sizes = [10, 200, 3000]
+        for i, size in enumerate(sizes):
+            with open(os.path.join(temp_dir, "sub" if i else "", f"file{i}.bin"), 'wb') as f:
+                f.write(os.urandom(size))
+
+        manifest = crypto_utils.scan_folder(temp_dir, "lock")
+        if len(manifest) == len(sizes) and manifest.total_bytes == sum(sizes):
+            print(f"  ✓ Scan found {len(manifest)} files, {manifest.total_bytes} bytes")
+        else:
+            print(f"  ✗ Scan found {len(manifest)} files, {manifest.total_bytes} bytes")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Folder scan test failed: {e}")
+    failures += 1
+
+# Test 13: Incremental re-lock
+print("\n🧪 Testing Incremental Re-lock...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_files(temp_dir, 2)
+        crypto_utils.encrypt_folder(temp_dir, test_password, incremental=True)
+        crypto_utils.decrypt_folder(temp_dir, test_password, keep_locked=True)
+
+        with open(os.path.join(temp_dir, "file0.bin"), 'wb') as f:
+            f.write(b"new content")
+        with open(os.path.join(temp_dir, "file1.bin.locked"), 'rb') as f:
+            unchanged_locked = f.read()
+
+        success, message, count = crypto_utils.encrypt_folder(temp_dir, test_password, incremental=True)
+        with open(os.path.join(temp_dir, "file1.bin.locked"), 'rb') as f:
+            kept = f.read() == unchanged_locked
+        if success and kept and not os.path.exists(os.path.join(temp_dir, "file1.bin")):
+            print("  ✓ Unchanged file kept its locked copy")
+        else:
+            print(f"  ✗ Incremental re-lock failed: {message}")
+            failures += 1
+
+        crypto_utils.decrypt_folder(temp_dir, test_password)
+        with open(os.path.join(temp_dir, "file0.bin"), 'rb') as f:
+            if f.read() == b"new content":
+                print("  ✓ Changed file was re-encrypted")
+            else:
+                print("  ✗ Changed file has stale content")
+                failures += 1
+
+    # A plain lock between an unlock and an incremental lock must not
+    # make the incremental lock delete the new .locked copies
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder_data = write_files(temp_dir, 3)
+        crypto_utils.encrypt_folder(temp_dir, test_password, incremental=True)
+        crypto_utils.decrypt_folder(temp_dir, test_password, keep_locked=True)
+        crypto_utils.encrypt_folder(temp_dir, test_password)
+        crypto_utils.encrypt_folder(temp_dir, test_password, incremental=True)
+        crypto_utils.decrypt_folder(temp_dir, test_password)
+        if read_files(temp_dir, folder_data) == folder_data:
+            print("  ✓ Plain lock followed by an incremental lock kept every file")
+        else:
+            print("  ✗ Plain lock followed by an incremental lock lost files")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Incremental re-lock test failed: {e}")
+    failures += 1
+
+# Test 14: Vault container
+print("\n🧪 Testing Vault Container...")
+try:
+    import vault
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = os.path.join(temp_dir, "photos")
+        os.makedirs(folder)
+        folder_data = write_files(folder, 5)
+
+        success, message, count = vault.pack_folder(folder, test_password)
+        if success and count == 5 and not os.listdir(folder):
+            print("  ✓ Folder packed into a vault")
+        else:
+            print(f"  ✗ Vault pack failed: {message}")
+            failures += 1
+
+        # A second pack appends to the existing vault
+        folder_data["extra.txt"] = b"appended"
+        with open(os.path.join(folder, "extra.txt"), 'wb') as f:
+            f.write(folder_data["extra.txt"])
+        success, message, count = vault.pack_folder(folder, test_password)
+        vault_path = folder + vault.VAULT_EXTENSION
+        names = [name for name, size, mtime in vault.Vault(vault_path, test_password).list()]
+        if success and sorted(names) == sorted(folder_data):
+            print("  ✓ Files appended to the vault")
+        else:
+            print(f"  ✗ Vault append failed: {message}")
+            failures += 1
+
+        success, message, count = vault.unpack_vault(vault_path, test_password)
+        if success and count == len(folder_data) and read_files(folder, folder_data) == folder_data:
+            print("  ✓ Vault unpacked and all files match")
+        else:
+            print(f"  ✗ Vault unpack failed: {message}")
+            failures += 1
+
+        # Packing the same names again leaves replaced data behind
+        for _ in range(3):
+            folder_data = write_files(folder, 2, size=vault.COMPACT_MIN_BYTES)
+            vault.pack_folder(folder, test_password)
+        with vault.Vault(vault_path, test_password) as packed:
+            compacted = packed.dead_bytes == 0 and packed.read("file0.bin") == folder_data["file0.bin"]
+        if compacted:
+            print("  ✓ Vault compacted once replaced entries passed the threshold")
+        else:
+            print("  ✗ Vault kept the data of replaced entries")
+            failures += 1
+
+        import subprocess
+        locker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locker.py")
+        env = dict(os.environ, SFL_PASSWORD=test_password)
+        for command, path in (("unpack", vault_path), ("pack", folder)):
+            result = subprocess.run([sys.executable, locker_script, command, path],
+                                    cwd=temp_dir, env=env, capture_output=True, text=True)
+            if result.returncode == 0:
+                print(f"  ✓ locker.py {command} succeeded")
+            else:
+                print(f"  ✗ locker.py {command} failed: {result.stderr.strip()}")
+                failures += 1
+except Exception as e:
+    print(f"  ✗ Vault test failed: {e}")
+    failures += 1
+
+# Test 15: Compression before encryption
+print("\n🧪 Testing Compression...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "log.txt")
+        test_data = b"2024-01-01 INFO request handled\n" * 10000
+        with open(test_file, 'wb') as f:
+            f.write(test_data)
+
+        crypto_utils.encrypt_file(test_file, test_password, compression=crypto_utils.CODEC_ZLIB)
+        if os.path.getsize(test_file + ".locked") < len(test_data) // 2:
+            print("  ✓ Compressible file shrank when locked")
+        else:
+            print("  ✗ Compressible file did not shrink")
+            failures += 1
+
+        if crypto_utils.decrypt_file(test_file + ".locked", test_password) and \
+                open(test_file, 'rb').read() == test_data:
+            print("  ✓ Compressed file decrypted correctly")
+        else:
+            print("  ✗ Compressed file round trip failed")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Compression test failed: {e}")
+    failures += 1
+
+# Test 16: Resuming an interrupted folder operation
+print("\n🧪 Testing Journal Resume...")
+try:
+    import journal
+
+    class SimulatedCrash(BaseException):
+        pass
+
+    def crash_after_two(done, total, name):
+        if done == 2:
+            raise SimulatedCrash()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_files(temp_dir, 10)
+        try:
+            crypto_utils.encrypt_folder(temp_dir, test_password, callback=crash_after_two, jobs=1)
+        except SimulatedCrash:
+            pass
+
+        if journal.pending_operation(temp_dir) == "lock":
+            print("  ✓ Interrupted lock left a journal")
+        else:
+            print("  ✗ Interrupted lock left no journal")
+            failures += 1
+
+        success, message, count = crypto_utils.resume_folder(temp_dir, test_password)
+        names = [name for name in os.listdir(temp_dir) if not name.startswith(crypto_utils.METADATA_PREFIX)]
+        if success and journal.pending_operation(temp_dir) is None and all(n.endswith(".locked") for n in names):
+            print("  ✓ Resumed lock finished every file")
+        else:
+            print(f"  ✗ Resume failed: {message}")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Journal resume test failed: {e}")
+    failures += 1
+
+# Test 17: Cancelling and pausing a folder job
+print("\n🧪 Testing Cancel and Pause...")
+try:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_files(temp_dir, 20)
+        control = crypto_utils.JobControl()
+        control.pause()
+        control.resume()
+        if not control.paused:
+            print("  ✓ Job paused and resumed")
+        else:
+            print("  ✗ Job still paused after resume")
+            failures += 1
+
+        def cancel_after_two(done, total, name):
+            if done == 2:
+                control.cancel()
+
+        success, message, count = crypto_utils.encrypt_folder(
+            temp_dir, test_password, callback=cancel_after_two, jobs=1, control=control
+        )
+        if not success and count < 20:
+            print(f"  ✓ Job cancelled after {count} files")
+        else:
+            print("  ✗ Job was not cancelled")
+            failures += 1
+        crypto_utils.decrypt_folder(temp_dir, test_password)
+except Exception as e:
+    print(f"  ✗ Cancel and pause test failed: {e}")
+    failures += 1
+
+# Test 18: Progress channel
+print("\n🧪 Testing Progress Channel...")
+try:
+    import progress
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_files(temp_dir, 5)
+        channel = progress.ProgressChannel()
+        crypto_utils.encrypt_folder(temp_dir, test_password, progress=channel)
+        snapshot = channel.snapshot()
+        if snapshot["files_done"] == 5 and snapshot["files_total"] == 5:
+            print("  ✓ Progress channel counted every file")
+        else:
+            print(f"  ✗ Progress channel reported {snapshot['files_done']}/{snapshot['files_total']} files")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Progress channel test failed: {e}")
+    failures += 1
+
+# Test 19: Command-line entry point
+print("\n🧪 Testing Command Line...")
+try:
+    import json
+    import subprocess
+    locker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locker.py")
+    env = dict(os.environ, SFL_PASSWORD=test_password)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folder = os.path.join(temp_dir, "docs")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "note.txt"), 'wb') as f:
+            f.write(b"note")
+
+        for command in ("lock", "status", "unlock"):
+            result = subprocess.run(
+                [sys.executable, locker_script, command, folder, "--json"],
+                cwd=temp_dir, env=env, capture_output=True, text=True
+            )
+            if result.returncode == 0 and json.loads(result.stdout)["ok"]:
+                print(f"  ✓ locker.py {command} succeeded")
+            else:
+                print(f"  ✗ locker.py {command} failed: {result.stderr.strip()}")
+                failures += 1
+except Exception as e:
+    print(f"  ✗ Command line test failed: {e}")
+    failures += 1
+
+# Test 20: Fast startup
+print("\n🧪 Testing Lazy Imports...")
+try:
+    import subprocess
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('crypto_utils' in sys.modules)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if result.stdout.strip() == "False":
+        print("  ✓ Importing main does not load crypto_utils")
+    else:
+        print(f"  ✗ Importing main loaded crypto_utils: {result.stdout.strip()} {result.stderr.strip()}")
+        failures += 1
+
+    deferred = ["durability", "io_hints", "journal", "shred_queue"]
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, main; print([m for m in {deferred!r} if m in sys.modules])"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if result.stdout.strip() == "[]":
+        print("  ✓ Importing main defers the folder job modules")
+    else:
+        print(f"  ✗ Importing main loaded: {result.stdout.strip()} {result.stderr.strip()}")
+        failures += 1
+
+    # Warming up a session unwraps the key store without loading crypto_utils
+    with tempfile.TemporaryDirectory() as temp_dir:
+        script = ("import sys, auth, session; auth.set_master_password('TestPassword123'); "
+                  "s = session.Session('TestPassword123'); s.warm_up(); "
+                  "print(s._master_key is not None, 'crypto_utils' in sys.modules)")
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=temp_dir, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(
+                filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")])))
+        )
+        if result.stdout.strip() == "True False":
+            print("  ✓ Session warm-up does not load crypto_utils")
+        else:
+            print(f"  ✗ Session warm-up: {result.stdout.strip()} {result.stderr.strip()}")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Lazy import test failed: {e}")
+    failures += 1
+
+# Test 21: Benchmark comparison
+print("\n🧪 Testing Benchmark Comparison...")
+try:
+    import benchmark
+    baseline = {"results": [{"name": "file/1KB", "p50": 1.0, "peak_memory_bytes": 1000}]}
+    current = {"results": [{"name": "file/1KB", "p50": 2.0, "peak_memory_bytes": 1000}]}
+    rows = benchmark.compare_results(baseline, current, threshold=10)
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions == ["p50"]:
+        print("  ✓ Slower p50 flagged as a regression")
+    else:
+        print(f"  ✗ Unexpected regressions: {regressions}")
+        failures += 1
+except Exception as e:
+    print(f"  ✗ Benchmark comparison test failed: {e}")
+    failures += 1
+
+# Test 22: Per-phase timings
+print("\n🧪 Testing Timing Instrumentation...")
+try:
+    import io
+    import timing
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "timed.bin")
+        with open(test_file, 'wb') as f:
+            f.write(os.urandom(crypto_utils.CHUNK_SIZE))
+        sink = timing.SummarySink(stream=io.StringIO())
+        crypto_utils.encrypt_file(test_file, test_password, timings=sink)
+        missing = [phase for phase in ("read", "crypt", "write") if phase not in sink.phase_seconds]
+        if not missing:
+            print("  ✓ Read, crypt and write phases were timed")
+        else:
+            print(f"  ✗ Phases not timed: {', '.join(missing)}")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ Timing instrumentation test failed: {e}")
+    failures += 1
+
+# Test 23: Unlocked session
+print("\n🧪 Testing Session...")
+original_dir = os.getcwd()
+try:
+    import session
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The session reads the master password files from the working directory
+        os.chdir(temp_dir)
+        user_session = session.Session(test_password)
+        password, keyring = user_session.credentials()
+        if password == test_password and user_session.credentials()[1] is keyring:
+            print("  ✓ Session reuses one key ring")
+        else:
+            print("  ✗ Session returned a different key ring")
+            failures += 1
+
+        user_session.close()
+        try:
+            user_session.credentials()
+            print("  ✗ Closed session still returned credentials")
+            failures += 1
+        except session.SessionExpired:
+            print("  ✓ Closed session rejected")
+except Exception as e:
+    print(f"  ✗ Session test failed: {e}")
+    failures += 1
+finally:
+    os.chdir(original_dir)
+
+# Test 24: Key derivation functions
+print("\n🧪 Testing Key Derivation...")
+try:
+    import kdf
+    salt = os.urandom(16)
+    params = kdf.validate({"name": kdf.KDF_SCRYPT, "n": 2 ** 14, "r": 8, "p": 1})
+    if kdf.derive(test_password, salt, params) == kdf.derive(test_password, salt, params):
+        print("  ✓ scrypt derivation is deterministic")
+    else:
+        print("  ✗ scrypt derivation differs between runs")
+        failures += 1
+
+    try:
+        kdf.validate({"name": kdf.KDF_SCRYPT, "n": kdf.MAX_SCRYPT_N * 2, "r": 8, "p": 1})
+        print("  ✗ Oversized scrypt parameters accepted")
+        failures += 1
+    except ValueError:
+        print("  ✓ Oversized scrypt parameters rejected")
+
+    # A new master password gets parameters measured on this machine
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            auth.set_master_password(test_password)
+            params = auth.get_kdf_params()
+            if params != kdf.LEGACY_PARAMS and kdf.validate(params)["name"] == kdf.DEFAULT_KDF:
+                print("  ✓ New master password uses calibrated KDF parameters")
+            else:
+                print(f"  ✗ New master password uses {params}")
+                failures += 1
+        finally:
+            os.chdir(original_dir)
+except Exception as e:
+    print(f"  ✗ Key derivation test failed: {e}")
+    failures += 1
+
+# Test 25: Changing the master password
+print("\n🧪 Testing Master Password Change...")
+original_dir = os.getcwd()
+try:
+    import keystore
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The master password and key store files live in the working directory
+        os.chdir(temp_dir)
+        auth.set_master_password(test_password)
+        keyring = crypto_utils.KeyRing(test_password, auth.get_kdf_params(), auth.open_master_key(test_password))
+        test_file = os.path.join(temp_dir, "wrapped.txt")
+        with open(test_file, 'wb') as f:
+            f.write(b"wrapped data")
+        crypto_utils.encrypt_file(test_file, test_password, keyring=keyring)
+
+        # Keyed from the password, like files locked before the key store
+        legacy_file = os.path.join(temp_dir, "legacy.txt")
+        with open(legacy_file, 'wb') as f:
+            f.write(b"legacy data")
+        crypto_utils.encrypt_file(legacy_file, test_password)
+        crypto_utils.verify_file_key(legacy_file + ".locked", test_password, keyring)
+
+        new_password = "NewPassword456"
+        success, message = auth.change_master_password(test_password, new_password)
+        if success:
+            print("  ✓ Master password changed")
+        else:
+            print(f"  ✗ Master password change failed: {message}")
+            failures += 1
+
+        keyring = crypto_utils.KeyRing(new_password, auth.get_kdf_params(), auth.open_master_key(new_password))
+        if crypto_utils.decrypt_file(test_file + ".locked", new_password, keyring=keyring):
+            print("  ✓ File locked before the change opens with the new password")
+        else:
+            print("  ✗ File locked before the change does not open")
+            failures += 1
+
+        if crypto_utils.decrypt_file(legacy_file + ".locked", new_password, keyring=keyring):
+            print("  ✓ Password-keyed file opens after the change")
+        else:
+            print("  ✗ Password-keyed file does not open after the change")
+            failures += 1
+
+        with open(keystore.KEYSTORE_FILE, 'r', encoding='utf-8') as f:
+            if test_password not in f.read():
+                print("  ✓ Key store holds no password")
+            else:
+                print("  ✗ Key store holds the old password")
+                failures += 1
+except Exception as e:
+    print(f"  ✗ Master password change test failed: {e}")
+    failures += 1
+finally:
+    os.chdir(original_dir)
+
+# Test 26: Secure delete strategies
+print("\n🧪 Testing Secure Delete...")
+try:
+    import secure_delete
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for mode in secure_delete.SHRED_MODES:
+            test_file = os.path.join(temp_dir, f"{mode}.bin")
+            with open(test_file, 'wb') as f:
+                f.write(os.urandom(5000))
+            result = secure_delete.shred_file(test_file, mode)
+            if result.ok and not os.path.exists(test_file):
+                print(f"  ✓ {mode} shred removed the file ({result.bytes_written} bytes written)")
+            else:
+                print(f"  ✗ {mode} shred failed")
+                failures += 1
+except Exception as e:
+    print(f"  ✗ Secure delete test failed: {e}")
+    failures += 1
+
+# Test 27: Background shred queue
+print("\n🧪 Testing Shred Queue...")
+try:
+    import shred_queue
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = shred_queue.ShredQueue(os.path.join(temp_dir, "queue.jsonl"))
+        test_file = os.path.join(temp_dir, "original.bin")
+        with open(test_file, 'wb') as f:
+            f.write(os.urandom(5000))
+
+        if queue.enqueue(test_file) and not os.path.exists(test_file):
+            print("  ✓ File queued for shredding")
+        else:
+            print("  ✗ File could not be queued")
+            failures += 1
+
+        queue.start()
+        drained = queue.wait(10)
+        queue.stop()
+        leftovers = [name for name in os.listdir(temp_dir) if name.startswith(shred_queue.SHRED_PREFIX)]
+        if drained and not leftovers:
+            print("  ✓ Queue shredded the file in the background")
+        else:
+            print("  ✗ Queue did not finish shredding")
+            failures += 1
+
+        # An empty queue starts no worker until something is queued
+        import threading
+        queue = shred_queue.ShredQueue(os.path.join(temp_dir, "queue.jsonl"))
+        queue.start()
+        if not any(thread.name == "shred-queue" for thread in threading.enumerate()):
+            print("  ✓ Empty queue starts no worker thread")
+        else:
+            print("  ✗ Empty queue started a worker thread")
+            failures += 1
+        queue.stop()
+except Exception as e:
+    print(f"  ✗ Shred queue test failed: {e}")
+    failures += 1
+
+# Test 28: Durability modes
+print("\n🧪 Testing Durability Modes...")
+try:
+    import durability
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_files(temp_dir, 5)
+        for mode in durability.DURABILITY_MODES:
+            locked = crypto_utils.encrypt_folder(temp_dir, test_password, durability=mode)[0]
+            unlocked = crypto_utils.decrypt_folder(temp_dir, test_password, durability=mode)[0]
+            temp_files = [name for name in os.listdir(temp_dir) if name.startswith(durability.TEMP_PREFIX)]
+            if locked and unlocked and not temp_files and len(os.listdir(temp_dir)) == 5:
+                print(f"  ✓ {mode} durability round trip succeeded")
+            else:
+                print(f"  ✗ {mode} durability round trip failed")
+                failures += 1
+except Exception as e:
+    print(f"  ✗ Durability test failed: {e}")
+    failures += 1
+
+# Test 29: Page cache hints
+print("\n🧪 Testing I/O Hints...")
+try:
+    import io_hints
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_file = os.path.join(temp_dir, "bulk.bin")
+        test_data = os.urandom(crypto_utils.CHUNK_SIZE * 2 + 7)
+        with open(test_file, 'wb') as f:
+            f.write(test_data)
+
+        hints = io_hints.IO_HINTS
+        crypto_utils.encrypt_file(test_file, test_password, io_hints=hints)
+        if crypto_utils.decrypt_file(test_file + ".locked", test_password, io_hints=hints) and \
+                open(test_file, 'rb').read() == test_data:
+            print("  ✓ Round trip with every I/O hint succeeded")
+        else:
+            print("  ✗ Round trip with I/O hints failed")
+            failures += 1
+except Exception as e:
+    print(f"  ✗ I/O hints test failed: {e}")
+    failures += 1
+
+if failures:
+    print("\n" + "=" * 60)
+    print(f"❌ {failures} CHECK(S) FAILED")
+    print("=" * 60)
+    sys.exit(1)
 
 print("\n" + "=" * 60)
 print("✅ ALL CHECKS PASSED - APPLICATION READY TO RUN!")
@@ -0,0 +1,200 @@
+"""
+timing.py - Per-Phase Timing Module
+Observers that receive how long each file spent reading, deriving keys,
+encrypting, writing, syncing, shredding and hiding, with JSONL trace and summary sinks
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+
+# Phases reported by crypto_utils. File-level phases carry the file path;
+# run-level phases (scan, hide, and the key check of decrypt_folder) carry None.
+PHASE_SCAN = "scan"
+PHASE_KDF = "kdf"
+PHASE_READ = "read"
+PHASE_CRYPT = "crypt"
+PHASE_WRITE = "write"
+PHASE_SYNC = "sync"
+PHASE_SHRED = "shred"
+PHASE_REMOVE = "remove"
+PHASE_HIDE = "hide"
+
+# Slowest files listed by SummarySink
+DEFAULT_TOP_FILES = 10
+
+
+class TimingObserver:
+    """
+    Receives timings from crypto_utils. Subclasses override what they need.
+    
+    Methods are called from worker threads, so implementations must be
+    thread-safe. The owner calls finish() once when its run is over.
+    """
+    
+    def phase(self, phase: str, seconds: float, nbytes: int = 0, file_path: str = None) -> None:
+        """
+        One phase finished.
+        
+        Args:
+            phase: One of the PHASE_* names
+            seconds: Wall time spent in the phase
+            nbytes: Bytes handled in the phase (0 if not applicable)
+            file_path: File the phase belongs to, or None for run-level phases
+        """
+    
+    def file_done(self, file_path: str, seconds: float, success: bool) -> None:
+        """A folder worker finished one file (seconds is its total wall time)."""
+    
+    def finish(self) -> None:
+        """The run is over: flush, close or report."""
+
+
+class Timings(TimingObserver):
+    """Forwards every event to several observers, e.g. a trace and a summary."""
+    
+    def __init__(self, *observers):
+        self.observers = list(observers)
+    
+    def phase(self, phase, seconds, nbytes=0, file_path=None):
+        for observer in self.observers:
+            observer.phase(phase, seconds, nbytes, file_path)
+    
+    def file_done(self, file_path, seconds, success):
+        for observer in self.observers:
+            observer.file_done(file_path, seconds, success)
+    
+    def finish(self):
+        for observer in self.observers:
+            observer.finish()
+
+
+class JsonlTraceSink(TimingObserver):
+    """
+    Writes one JSON line per event to a trace file.
+    
+    Phase lines look like {"t": ..., "event": "phase", "phase": "crypt",
+    "file": "...", "seconds": ..., "bytes": ...}; file lines have "event":
+    "file" and "ok". "t" is seconds since the sink was created.
+    """
+    
+    def __init__(self, trace_path: str):
+        """
+        Args:
+            trace_path: File to write the trace to (replaced if it exists)
+        """
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._file = open(trace_path, 'w', encoding='utf-8')
+    
+    def _write(self, record: dict) -> None:
+        record = {"t": round(time.perf_counter() - self._start, 6), **record}
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line)
+    
+    def phase(self, phase, seconds, nbytes=0, file_path=None):
+        self._write({"event": "phase", "phase": phase, "file": file_path,
+                     "seconds": round(seconds, 6), "bytes": nbytes})
+    
+    def file_done(self, file_path, seconds, success):
+        self._write({"event": "file", "file": file_path, "seconds": round(seconds, 6), "ok": success})
+    
+    def finish(self):
+        with self._lock:
+            self._file.close()
+
+
+class SummarySink(TimingObserver):
+    """
+    Aggregates time and bytes per phase and keeps the slowest files, then
+    prints a report when the run finishes.
+    
+    Phase times of parallel workers add up, so the per-phase total can be
+    larger than the wall time of the run; the shares still show where the
+    work went.
+    """
+    
+    def __init__(self, top: int = DEFAULT_TOP_FILES, stream=None):
+        """
+        Args:
+            top: Number of slowest files to report
+            stream: Where to print the report (default: sys.stderr)
+        """
+        self.top = top
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.phase_seconds = {}
+        self.phase_bytes = {}
+        self.file_seconds = {}
+        self._file_phase_seconds = {}
+    
+    def phase(self, phase, seconds, nbytes=0, file_path=None):
+        with self._lock:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+            self.phase_bytes[phase] = self.phase_bytes.get(phase, 0) + nbytes
+            if file_path is not None:
+                self._file_phase_seconds[file_path] = self._file_phase_seconds.get(file_path, 0.0) + seconds
+    
+    def file_done(self, file_path, seconds, success):
+        with self._lock:
+            self.file_seconds[file_path] = seconds
+    
+    def slowest_files(self) -> list:
+        """
+        Return the slowest files as (file_path, seconds), slowest first.
+        
+        Files processed outside a folder run have no total of their own, so
+        the sum of their phases is used.
+        """
+        with self._lock:
+            totals = dict(self._file_phase_seconds)
+            totals.update(self.file_seconds)
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:self.top]
+    
+    def report(self) -> str:
+        """Format the per-phase table and the slowest files."""
+        elapsed = time.perf_counter() - self._start
+        with self._lock:
+            phases = sorted(self.phase_seconds.items(), key=lambda item: item[1], reverse=True)
+            phase_bytes = dict(self.phase_bytes)
+        busy = sum(seconds for _, seconds in phases) or 1.0
+        
+        lines = [f"Timing summary ({elapsed:.2f} s wall time)"]
+        for phase, seconds in phases:
+            line = f"  {phase:<8} {seconds:10.3f} s  {seconds / busy * 100:5.1f}%"
+            if phase_bytes.get(phase):
+                line += f"  {phase_bytes[phase] / (1024 * 1024):10.1f} MB"
+            lines.append(line)
+        slowest = self.slowest_files()
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} file(s):")
+            for file_path, seconds in slowest:
+                lines.append(f"  {seconds:10.3f} s  {file_path}")
+        return "\n".join(lines)
+    
+    def finish(self):
+        print(self.report(), file=self.stream or sys.stderr)
+
+
+@contextlib.contextmanager
+def timed(observer, phase: str, file_path: str = None, nbytes: int = 0):
+    """
+    Time a block and report it as one phase. Does nothing if observer is None.
+    
+    Example:
+        with timed(timings, PHASE_SHRED, file_path, file_size):
+            _secure_delete(file_path)
+    """
+    if observer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observer.phase(phase, time.perf_counter() - start, nbytes, file_path)
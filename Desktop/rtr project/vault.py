@@ -0,0 +1,639 @@
+"""
+vault.py - Encrypted Vault Container Module
+Packs a whole folder into one encrypted .vault file with an encrypted index
+Supports streaming append, listing without decrypting file data,
+extraction of single entries and compaction of replaced entries
+"""
+
+import bisect
+import io
+import json
+import os
+import struct
+import time
+
+from crypto_utils import (
+    CHUNK_SIZE, FORMAT_VERSION, DEFAULT_ALGORITHM, AEAD_ALGORITHMS, TAG_SIZE, KeyRing,
+    new_file_header, key_from_header, seal_chunk, open_chunk,
+    delete_original, scan_folder
+)
+from durability import Durability, temp_path_for
+from secure_delete import DEFAULT_SHRED_MODE
+
+# Vault file identification and format version
+VAULT_MAGIC = b"SFLV"
+VAULT_VERSION = 1
+VAULT_EXTENSION = ".vault"
+
+# Trailer at the very end of a vault: index record offset (uint64),
+# index chunk counter (uint64) and VAULT_INDEX_MAGIC
+VAULT_INDEX_MAGIC = b"SFLX"
+TRAILER_FORMAT = ">QQ4s"
+TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT)
+
+# Upper bound for a block or index record, to reject corrupt length fields
+MAX_RECORD_SIZE = 256 * 1024 * 1024
+
+# Smallest sealed record on disk: length field and tag of an empty record
+MIN_RECORD_SIZE = 4 + TAG_SIZE
+
+# Bytes read at a time when searching backwards for the last trailer
+TRAILER_SCAN_SIZE = 1024 * 1024
+
+# Rewrite a vault after an append once replaced entries hold more than
+# COMPACT_RATIO of its data stream and at least COMPACT_MIN_BYTES
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class _EntryReader(io.RawIOBase):
+    """Readable stream over the decrypted pieces of one vault entry."""
+    
+    def __init__(self, pieces):
+        self._pieces = pieces
+        self._pending = b""
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            piece = next(self._pieces, None)
+            if piece is None:
+                return 0
+            self._pending = piece
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+class Vault:
+    """
+    A single-file encrypted container for many small files.
+    
+    File contents are concatenated into one logical data stream that is
+    sealed in CHUNK_SIZE blocks with the same per-chunk AEAD as version 3
+    .locked files, so thousands of tiny files share one salt, one header
+    and one file on disk. The index (names, sizes, mtimes, offsets into the
+    data stream and the block table) is sealed as a separate record at the
+    end of the file, followed by a plain trailer pointing at it.
+    
+    Appending writes new blocks after the old trailer and a new index and
+    trailer on close(), after the blocks are synced. The old index stays
+    valid until then, so an interrupted append loses only the new entries:
+    the next open finds the last complete trailer and writes over the
+    partial tail. Every block and index record uses a fresh chunk counter,
+    so no nonce is reused across appends.
+    
+    Use as a context manager, or call close() to write the index.
+    """
+    
+    def __init__(self, vault_path: str, password: str = None, keyring=None,
+                 create: bool = False, algorithm: str = DEFAULT_ALGORITHM):
+        """
+        Open an existing vault or create a new one.
+        
+        Args:
+            vault_path: Path to the .vault file
+            password: Master password (not needed if keyring is given)
+            keyring: Optional KeyRing to reuse derived master keys
+            create: Create a new (empty) vault, replacing any existing file
+            algorithm: ALG_AES_GCM or ALG_CHACHA20_POLY1305 for new vaults
+        
+        Raises:
+            ValueError: If the password is wrong or the vault is damaged
+        """
+        self.path = vault_path
+        self.keyring = keyring or KeyRing(password)
+        self.entries = {}  # name -> {"offset", "size", "mtime"}
+        self.blocks = []   # [record offset, data start, data length, counter]
+        self._block_starts = []
+        self._buffer = bytearray()
+        self._dirty = False
+        
+        if create:
+            if algorithm not in AEAD_ALGORITHMS:
+                raise ValueError(f"Unsupported algorithm: {algorithm}")
+            self._file = open(vault_path, 'w+b')
+            header, self._key = new_file_header(self.keyring, algorithm)
+            header["chunk_size"] = CHUNK_SIZE
+            header_json = json.dumps(header, sort_keys=True).encode('utf-8')
+            self._header_bytes = (VAULT_MAGIC + bytes([VAULT_VERSION]) +
+                                  struct.pack(">I", len(header_json)) + header_json)
+            self._file.write(self._header_bytes)
+            self.algorithm = algorithm
+            self.chunk_size = CHUNK_SIZE
+            self._data_end = self._file.tell()
+            self._next_counter = 0
+            self._dirty = True
+        else:
+            self._file = open(vault_path, 'r+b')
+            try:
+                self._open_existing()
+            except Exception:
+                self._file.close()
+                raise
+    
+    def _open_existing(self):
+        """Read the header, trailer and encrypted index of an existing vault."""
+        f = self._file
+        prefix = f.read(len(VAULT_MAGIC) + 5)
+        if len(prefix) != len(VAULT_MAGIC) + 5 or prefix[:len(VAULT_MAGIC)] != VAULT_MAGIC:
+            raise ValueError("Not a vault file")
+        if prefix[len(VAULT_MAGIC)] != VAULT_VERSION:
+            raise ValueError("Unsupported vault version")
+        header_len = struct.unpack(">I", prefix[len(VAULT_MAGIC) + 1:])[0]
+        if header_len > MAX_RECORD_SIZE:
+            raise ValueError("Header too large")
+        header_json = f.read(header_len)
+        header = json.loads(header_json.decode('utf-8'))
+        # Keys are derived exactly as for version 3 .locked files
+        header["version"] = FORMAT_VERSION
+        
+        self._header_bytes = prefix + header_json
+        self.algorithm = header["alg"]
+        self.chunk_size = header["chunk_size"]
+        if self.algorithm not in AEAD_ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm: {self.algorithm}")
+        
+        # Raises ValueError("Incorrect password") on a key check mismatch
+        self._key = key_from_header(header, self.keyring)
+        
+        # The trailer points at the sealed index record
+        file_size = f.seek(0, os.SEEK_END)
+        if file_size < len(self._header_bytes) + TRAILER_SIZE:
+            raise ValueError("Vault is truncated")
+        index_data = None
+        for trailer_end in self._trailer_candidates(file_size):
+            f.seek(trailer_end - TRAILER_SIZE)
+            index_offset, index_counter, magic = struct.unpack(TRAILER_FORMAT, f.read(TRAILER_SIZE))
+            if magic != VAULT_INDEX_MAGIC or index_offset >= trailer_end - TRAILER_SIZE:
+                continue
+            try:
+                index_data = self._read_record(index_offset, index_counter, final=True)
+                break
+            except ValueError:
+                # Not a trailer, or the index of a torn append
+                continue
+        if index_data is None:
+            raise ValueError("Vault index is missing")
+        
+        index = json.loads(index_data.decode('utf-8'))
+        self.entries = index["entries"]
+        self.blocks = index["blocks"]
+        self._block_starts = [block[1] for block in self.blocks]
+        # Append after the trailer, over the tail of an interrupted append
+        self._data_end = trailer_end
+        self._next_counter = index_counter + 1
+        if trailer_end < file_size:
+            # The lost records used counters after index_counter; skip as
+            # many as could fit, so none is sealed twice with other data
+            self._next_counter += (file_size - trailer_end) // MIN_RECORD_SIZE + 1
+    
+    def _trailer_candidates(self, file_size: int):
+        """
+        Yield possible trailer end offsets, from the end of the file backwards.
+        
+        The trailer is normally at the very end. After an interrupted
+        append the last complete one is earlier, wherever VAULT_INDEX_MAGIC
+        occurs; callers check each candidate by decrypting its index.
+        """
+        yield file_size
+        magic_size = len(VAULT_INDEX_MAGIC)
+        start_limit = len(self._header_bytes) + TRAILER_SIZE - magic_size
+        end = file_size
+        while end > start_limit:
+            start = max(start_limit, end - TRAILER_SCAN_SIZE)
+            self._file.seek(start)
+            # Overlap windows by the magic size so no match is split
+            window = self._file.read(min(end + magic_size - 1, file_size) - start)
+            position = len(window)
+            while True:
+                position = window.rfind(VAULT_INDEX_MAGIC, 0, position)
+                if position < 0:
+                    break
+                trailer_end = start + position + magic_size
+                # Matches starting at end were found in the previous window
+                if start + position < end and trailer_end < file_size:
+                    yield trailer_end
+                position += magic_size - 1
+            end = start
+    
+    def _read_record(self, offset: int, counter: int, final: bool = False) -> bytes:
+        """Read and decrypt the sealed record at offset."""
+        self._file.seek(offset)
+        length_bytes = self._file.read(4)
+        if len(length_bytes) != 4:
+            raise ValueError("Vault is truncated")
+        length = struct.unpack(">I", length_bytes)[0]
+        if length < TAG_SIZE or length > MAX_RECORD_SIZE:
+            raise ValueError("Vault record is corrupt")
+        record = self._file.read(length)
+        if len(record) != length:
+            raise ValueError("Vault is truncated")
+        return open_chunk(self.algorithm, self._key, self._header_bytes, counter, record, final)
+    
+    def _write_record(self, data: bytes, final: bool = False) -> tuple:
+        """Seal data with the next chunk counter and write it at the end of the data."""
+        counter = self._next_counter
+        self._next_counter += 1
+        offset = self._data_end
+        self._file.seek(offset)
+        self._file.write(seal_chunk(self.algorithm, self._key, self._header_bytes, counter, data, final))
+        self._data_end = self._file.tell()
+        return offset, counter
+    
+    @property
+    def data_size(self) -> int:
+        """Length of the logical data stream (all entries, including replaced ones)."""
+        if self.blocks:
+            last = self.blocks[-1]
+            return last[1] + last[2] + len(self._buffer)
+        return len(self._buffer)
+    
+    def _flush_block(self, length: int) -> None:
+        """Seal the first length bytes of the buffer as one block."""
+        data_start = self.data_size - len(self._buffer)
+        # New blocks overwrite the old index; close() writes a new one
+        self._dirty = True
+        offset, counter = self._write_record(bytes(self._buffer[:length]))
+        self.blocks.append([offset, data_start, length, counter])
+        self._block_starts.append(data_start)
+        del self._buffer[:length]
+    
+    def add_stream(self, name: str, src, mtime: float = None) -> int:
+        """
+        Append the contents of a readable binary stream as an entry.
+        
+        An existing entry with the same name is replaced (its data stays in
+        the vault until it is rewritten).
+        
+        Args:
+            name: Entry name (relative path with '/' separators)
+            src: Readable binary file object
+            mtime: Modification time to record (defaults to now)
+        
+        Returns:
+            Number of bytes added
+        """
+        offset = self.data_size
+        size = 0
+        while True:
+            chunk = src.read(self.chunk_size)
+            if not chunk:
+                break
+            self._buffer += chunk
+            size += len(chunk)
+            while len(self._buffer) >= self.chunk_size:
+                self._flush_block(self.chunk_size)
+        
+        self.entries[name] = {
+            "offset": offset,
+            "size": size,
+            "mtime": time.time() if mtime is None else mtime,
+        }
+        self._dirty = True
+        return size
+    
+    def add_file(self, file_path: str, name: str = None) -> int:
+        """
+        Append a file from disk as an entry.
+        
+        Args:
+            file_path: Path to the file
+            name: Entry name (defaults to the file's base name)
+        
+        Returns:
+            Number of bytes added
+        """
+        with open(file_path, 'rb') as f:
+            return self.add_stream(name or os.path.basename(file_path), f,
+                                   os.fstat(f.fileno()).st_mtime)
+    
+    def list(self) -> list:
+        """
+        List the entries without decrypting any file data.
+        
+        Returns:
+            List of (name, size, mtime) tuples sorted by name
+        """
+        return [(name, entry["size"], entry["mtime"]) for name, entry in sorted(self.entries.items())]
+    
+    def _read_range(self, start: int, size: int):
+        """Yield the plaintext of data stream bytes [start, start + size)."""
+        end = start + size
+        buffer_start = self.data_size - len(self._buffer)
+        position = start
+        while position < end:
+            if position >= buffer_start:
+                # Still in the unsealed append buffer
+                yield bytes(self._buffer[position - buffer_start:end - buffer_start])
+                return
+            i = bisect.bisect_right(self._block_starts, position) - 1
+            offset, data_start, length, counter = self.blocks[i]
+            block = self._read_record(offset, counter)
+            if len(block) != length:
+                raise ValueError("Vault block has the wrong length")
+            piece = block[position - data_start:min(end, data_start + length) - data_start]
+            yield piece
+            position += len(piece)
+    
+    def extract_to(self, name: str, dst) -> int:
+        """
+        Decrypt one entry into a writable binary stream.
+        
+        Only the blocks holding the entry are read and decrypted.
+        
+        Raises:
+            KeyError: If there is no entry with that name
+            ValueError: If a block fails authentication
+        """
+        entry = self.entries[name]
+        written = 0
+        for piece in self._read_range(entry["offset"], entry["size"]):
+            dst.write(piece)
+            written += len(piece)
+        return written
+    
+    def read(self, name: str) -> bytes:
+        """Return the contents of one entry."""
+        dst = io.BytesIO()
+        self.extract_to(name, dst)
+        return dst.getvalue()
+    
+    def open_entry(self, name: str):
+        """
+        Open one entry as a readable binary stream.
+        
+        Blocks are decrypted as the stream is read.
+        
+        Raises:
+            KeyError: If there is no entry with that name
+        """
+        entry = self.entries[name]
+        return io.BufferedReader(_EntryReader(self._read_range(entry["offset"], entry["size"])),
+                                 buffer_size=self.chunk_size)
+    
+    @property
+    def dead_bytes(self) -> int:
+        """Bytes of the data stream that only replaced entries still use."""
+        return self.data_size - sum(entry["size"] for entry in self.entries.values())
+    
+    def needs_compaction(self) -> bool:
+        """True once replaced entries pass COMPACT_RATIO and COMPACT_MIN_BYTES."""
+        dead = self.dead_bytes
+        return dead >= COMPACT_MIN_BYTES and dead > self.data_size * COMPACT_RATIO
+    
+    def extract(self, name: str, output_path: str) -> bool:
+        """
+        Extract one entry to a file, restoring its mtime.
+        
+        Args:
+            name: Entry name
+            output_path: Destination file path (parent folders are created)
+        
+        Returns:
+            True on success, False on failure
+        """
+        try:
+            directory = os.path.dirname(output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(output_path, 'wb') as f:
+                self.extract_to(name, f)
+            mtime = self.entries[name]["mtime"]
+            os.utime(output_path, (mtime, mtime))
+            return True
+        except Exception as e:
+            print(f"Error extracting {name}: {e}")
+            return False
+    
+    def close(self) -> None:
+        """
+        Seal the remaining buffer and write the index and trailer.
+        
+        The blocks are synced before the index that points at them is
+        written, and the index before close() returns, so the vault is
+        durable once it is closed.
+        """
+        if self._file.closed:
+            return
+        try:
+            if self._dirty:
+                if self._buffer:
+                    self._flush_block(len(self._buffer))
+                self._file.truncate(self._data_end)
+                self._sync()
+                index = json.dumps({"entries": self.entries, "blocks": self.blocks}).encode('utf-8')
+                index_offset, index_counter = self._write_record(index, final=True)
+                self._file.write(struct.pack(TRAILER_FORMAT, index_offset, index_counter, VAULT_INDEX_MAGIC))
+                self._sync()
+                self._dirty = False
+        finally:
+            self._file.close()
+    
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, name):
+        return name in self.entries
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_vault(vault_path: str, password: str, keyring=None, create: bool = False) -> Vault:
+    """
+    Open (or create) a vault.
+    
+    Raises:
+        ValueError: If the password is wrong or the vault is damaged
+    """
+    return Vault(vault_path, password, keyring=keyring, create=create)
+
+
+def pack_folder(folder_path: str, password: str, vault_path: str = None, callback=None,
+                manifest=None, keyring=None, remove_originals: bool = True,
+                shred_mode: str = DEFAULT_SHRED_MODE, shred_queue=None, durability=None) -> tuple:
+    """
+    Pack every file in a folder into one encrypted vault.
+    
+    Files are streamed into the vault in scan order. When the vault already
+    exists the files are appended to it, and the vault is compacted (see
+    compact_vault) once replaced entries take up too much of it. A new
+    vault is written under a temporary name and published like a locked
+    file; originals are only deleted once the vault is synced.
+    
+    Args:
+        folder_path: Path to the folder
+        password: Master password
+        vault_path: Vault file (defaults to the folder path + VAULT_EXTENSION)
+        callback: Optional progress callback(current, total, filename)
+        manifest: Optional FolderManifest from scan_folder(folder_path, "lock")
+        keyring: Optional KeyRing to reuse derived master keys
+        remove_originals: Securely delete the files once the vault is written
+        shred_mode: How they are deleted, one of secure_delete.SHRED_MODES
+        shred_queue: Optional shred_queue.ShredQueue to delete them in the
+            background
+        durability: Optional durability.Durability that publishes a new
+            vault (default: fsync it before the originals are deleted)
+    
+    Returns:
+        Tuple of (success: bool, message: str, files_packed: int)
+    """
+    try:
+        if not os.path.isdir(folder_path):
+            return False, "Folder not found", 0
+        
+        vault_path = vault_path or folder_path.rstrip(os.sep) + VAULT_EXTENSION
+        if manifest is None:
+            manifest = scan_folder(folder_path, "lock")
+        all_files = manifest.paths
+        if not all_files:
+            return False, "No files found in folder", 0
+        
+        packed_files = []
+        failed_files = []
+        create = not os.path.exists(vault_path)
+        # Appends go to the vault itself: its old index stays valid until close()
+        target_path = temp_path_for(vault_path) if create else vault_path
+        with Vault(target_path, password, keyring=keyring, create=create) as vault:
+            keyring = vault.keyring
+            for i, file_path in enumerate(all_files):
+                name = os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+                try:
+                    vault.add_file(file_path, name)
+                    packed_files.append(file_path)
+                except OSError as e:
+                    print(f"Error packing {file_path}: {e}")
+                    failed_files.append(os.path.basename(file_path))
+                if callback:
+                    callback(i + 1, len(all_files), os.path.basename(file_path))
+            compact = not create and vault.needs_compaction()
+        
+        # Only delete originals once the index is safely written
+        def on_durable():
+            if remove_originals:
+                for file_path in packed_files:
+                    delete_original(file_path, shred_mode, shred_queue=shred_queue)
+        
+        if create:
+            if durability is None:
+                durability = Durability()
+            durability.publish(target_path, vault_path, on_durable)
+        else:
+            # close() synced the appended blocks and the new index
+            on_durable()
+            if compact:
+                success, message, _ = compact_vault(vault_path, password, keyring=keyring)
+                if not success:
+                    print(f"Warning: Could not compact vault: {message}")
+        
+        if failed_files:
+            message = f"Packed {len(packed_files)} file(s). Failed: {len(failed_files)}"
+            return len(packed_files) > 0, message, len(packed_files)
+        return True, f"Successfully packed {len(packed_files)} file(s) into vault", len(packed_files)
+    
+    except ValueError as e:
+        return False, str(e), 0
+    except Exception as e:
+        return False, f"Error packing folder: {str(e)}", 0
+
+
+def compact_vault(vault_path: str, password: str, keyring=None) -> tuple:
+    """
+    Rewrite a vault without the data of replaced entries.
+    
+    The live entries are copied in data stream order into a new vault
+    under a temporary name (new key nonce, chunk counters from zero), which
+    is synced and then renamed over the old one. The old vault stays
+    untouched until then.
+    
+    Args:
+        vault_path: Path to the .vault file
+        password: Master password
+        keyring: Optional KeyRing to reuse derived master keys
+    
+    Returns:
+        Tuple of (success: bool, message: str, bytes_freed: int)
+    """
+    temp_path = temp_path_for(vault_path)
+    try:
+        size_before = os.path.getsize(vault_path)
+        with Vault(vault_path, password, keyring=keyring) as old:
+            with Vault(temp_path, keyring=old.keyring, create=True, algorithm=old.algorithm) as new:
+                by_offset = sorted(old.entries.items(), key=lambda item: item[1]["offset"])
+                for name, entry in by_offset:
+                    new.add_stream(name, old.open_entry(name), entry["mtime"])
+        # The old vault is the only copy, so always sync before replacing it
+        Durability().publish(temp_path, vault_path)
+        freed = size_before - os.path.getsize(vault_path)
+        return True, f"Compacted vault, freed {freed} bytes", freed
+    except ValueError as e:
+        message = str(e)
+    except Exception as e:
+        message = f"Error compacting vault: {str(e)}"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False, message, 0
+
+
+def unpack_vault(vault_path: str, password: str, output_folder: str = None, callback=None,
+                 keyring=None, remove_vault: bool = True) -> tuple:
+    """
+    Extract every entry of a vault into a folder.
+    
+    Args:
+        vault_path: Path to the .vault file
+        password: Master password
+        output_folder: Destination (defaults to the vault path without VAULT_EXTENSION)
+        callback: Optional progress callback(current, total, filename)
+        keyring: Optional KeyRing to reuse derived master keys
+        remove_vault: Delete the vault after all entries were extracted
+    
+    Returns:
+        Tuple of (success: bool, message: str, files_extracted: int)
+    """
+    try:
+        if output_folder is None:
+            if not vault_path.endswith(VAULT_EXTENSION):
+                return False, "Output folder required", 0
+            output_folder = vault_path[:-len(VAULT_EXTENSION)]
+        output_root = os.path.abspath(output_folder)
+        
+        extracted = 0
+        failed_files = []
+        with Vault(vault_path, password, keyring=keyring) as vault:
+            names = [entry[0] for entry in vault.list()]
+            for i, name in enumerate(names):
+                output_path = os.path.abspath(os.path.join(output_root, *name.split('/')))
+                # Never write outside the output folder
+                if os.path.commonpath([output_root, output_path]) != output_root:
+                    failed_files.append(name)
+                elif vault.extract(name, output_path):
+                    extracted += 1
+                else:
+                    failed_files.append(name)
+                if callback:
+                    callback(i + 1, len(names), os.path.basename(name))
+        
+        if failed_files:
+            message = f"Extracted {extracted} file(s). Failed: {len(failed_files)}"
+            return extracted > 0, message, extracted
+        
+        if remove_vault:
+            os.remove(vault_path)
+        return True, f"Successfully extracted {extracted} file(s) from vault", extracted
+    
+    except ValueError as e:
+        return False, str(e), 0
+    except Exception as e:
+        return False, f"Error unpacking vault: {str(e)}", 0